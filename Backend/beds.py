@@ -0,0 +1,146 @@
+"""Ward bed registry: `wards` {_id, capacity, occupied} and `beds` {_id: "ward|bed", state, admissionId, patientId}."""
+import os
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db, admission_collection, appointments_collection
+import early_warning
+
+DEFAULT_WARD_CAPACITY = int(os.getenv("DEFAULT_WARD_CAPACITY", "6"))
+
+wards_collection = db["wards"]
+beds_collection = db["beds"]
+
+
+class WardFull(Exception):
+    pass
+
+
+class BedTaken(Exception):
+    pass
+
+
+def _bed_key(ward, bed):
+    return f"{ward}|{bed}"
+
+
+async def _ensure_ward(ward):
+    await wards_collection.update_one(
+        {"_id": ward},
+        {"$setOnInsert": {"capacity": DEFAULT_WARD_CAPACITY, "occupied": 0}},
+        upsert=True,
+    )
+
+
+async def set_capacity(ward, capacity):
+    await wards_collection.update_one(
+        {"_id": ward},
+        {"$set": {"capacity": capacity}, "$setOnInsert": {"occupied": 0}},
+        upsert=True,
+    )
+
+
+async def allocate(ward, bed, admission_id, patient_id):
+    """Take a bed for an admission: ward slot ($inc under capacity), then the bed. Raises WardFull or BedTaken."""
+    await _ensure_ward(ward)
+    slot = await wards_collection.find_one_and_update(
+        {"_id": ward, "$expr": {"$lt": ["$occupied", "$capacity"]}},
+        {"$inc": {"occupied": 1}},
+    )
+    if slot is None:
+        raise WardFull(ward)
+
+    placed = False
+    try:
+        await beds_collection.update_one(
+            {"_id": _bed_key(ward, bed), "state": {"$ne": "occupied"}},
+            {"$set": {
+                "ward": ward,
+                "bed": bed,
+                "state": "occupied",
+                "admissionId": admission_id,
+                "patientId": patient_id,
+                "since": datetime.now(),
+            }},
+            upsert=True,
+        )
+        placed = True
+    except DuplicateKeyError:
+        # Bed exists and is occupied
+        raise BedTaken(bed)
+    finally:
+        if not placed:
+            # Give the ward slot back whatever stopped the bed write
+            await wards_collection.update_one({"_id": ward}, {"$inc": {"occupied": -1}})
+    await early_warning.set_ward(patient_id, ward, bed)
+
+
+async def release(ward=None, bed=None, patient_id=None):
+    """Free a bed by (ward, bed) or by the patient occupying it. Returns the freed bed or None."""
+    if ward is not None and bed is not None:
+        query = {"_id": _bed_key(ward, bed), "state": "occupied"}
+    elif patient_id is not None:
+        query = {"patientId": patient_id, "state": "occupied"}
+    else:
+        return None
+
+    freed = await beds_collection.find_one_and_update(
+        query,
+        {"$set": {"state": "free", "admissionId": None, "patientId": None, "since": datetime.now()}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if freed is None:
+        return None
+    await wards_collection.update_one({"_id": freed["ward"]}, {"$inc": {"occupied": -1}})
+    await early_warning.set_ward(freed["patientId"], None)
+    if freed.get("admissionId"):
+        await admission_collection.update_one(
+            {"admissionId": freed["admissionId"]},
+            {"$set": {"status": "Discharged", "dischargeDateTime": datetime.now().isoformat()}},
+        )
+    return freed
+
+
+def _occupancy(doc):
+    return {
+        "ward": doc["_id"],
+        "occupiedBeds": doc["occupied"],
+        "availableBeds": max(doc["capacity"] - doc["occupied"], 0),
+        "totalBeds": doc["capacity"],
+    }
+
+
+async def ward_occupancy(ward):
+    doc = await wards_collection.find_one({"_id": ward})
+    if doc is None:
+        doc = {"_id": ward, "capacity": DEFAULT_WARD_CAPACITY, "occupied": 0}
+    return _occupancy(doc)
+
+
+async def all_occupancy():
+    return [_occupancy(doc) async for doc in wards_collection.find({}).sort("_id", 1)]
+
+
+async def rebuild():
+    """Recreate bed and ward state from current admissions (latest one per patient)."""
+    await beds_collection.update_many(
+        {}, {"$set": {"state": "free", "admissionId": None, "patientId": None}}
+    )
+    await wards_collection.update_many({}, {"$set": {"occupied": 0}})
+    # Admissions from before the status field are current only while the
+    # patient still has an open in-patient appointment
+    in_patients = await appointments_collection.distinct("patient_id", {"is_ipd": True, "status": "Admitted"})
+    cursor = admission_collection.find(
+        {"$or": [{"status": "Admitted"}, {"status": None, "patientId": {"$in": in_patients}}]},
+        {"admissionId": 1, "patientId": 1, "ward": 1, "bedNumber": 1},
+    ).sort("_id", -1)
+    placed = set()
+    async for adm in cursor:
+        if adm["patientId"] in placed:
+            continue  # an older admission of a re-admitted patient
+        try:
+            await allocate(adm["ward"], adm["bedNumber"], adm["admissionId"], adm["patientId"])
+            placed.add(adm["patientId"])
+        except (WardFull, BedTaken) as e:
+            print(f"⚠️ {adm['admissionId']}: {type(e).__name__} {e}")
+    return len(placed)
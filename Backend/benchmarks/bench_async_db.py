@@ -0,0 +1,72 @@
+"""
+Concurrent-request throughput: blocking pymongo on a 40-slot threadpool
+(how the old sync handlers ran under Starlette) vs the async client.
+
+Runs against a local mongod:
+    MONGO_BENCH_URI=mongodb://localhost:27017 python benchmarks/bench_async_db.py
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import AsyncMongoClient, MongoClient
+
+URI = os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017")
+DB_NAME = "med360_bench"
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "5000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+THREADPOOL_SIZE = 40  # anyio default used by Starlette for sync endpoints
+POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+
+
+def seed():
+    client = MongoClient(URI)
+    users = client[DB_NAME]["users"]
+    users.drop()
+    users.insert_many(
+        {"user_id": f"PID-{i}", "mobile": f"9{i:09d}", "name": f"Patient {i}", "role": "patient"}
+        for i in range(1000)
+    )
+    users.create_index("user_id")
+    client.close()
+
+
+def bench_sync():
+    client = MongoClient(URI, maxPoolSize=POOL_SIZE)
+    users = client[DB_NAME]["users"]
+
+    def handler(i):
+        return users.find_one({"user_id": f"PID-{i % 1000}"})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        list(pool.map(handler, range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+async def bench_async():
+    client = AsyncMongoClient(URI, maxPoolSize=POOL_SIZE)
+    users = client[DB_NAME]["users"]
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def handler(i):
+        async with sem:
+            return await users.find_one({"user_id": f"PID-{i % 1000}"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    seed()
+    sync_elapsed = bench_sync()
+    async_elapsed = asyncio.run(bench_async())
+    print(f"requests={REQUESTS} concurrency={CONCURRENCY} pool={POOL_SIZE}")
+    print(f"sync  (threadpool {THREADPOOL_SIZE}): {REQUESTS / sync_elapsed:10.0f} req/s")
+    print(f"async (event loop):      {REQUESTS / async_elapsed:10.0f} req/s")
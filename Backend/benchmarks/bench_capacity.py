@@ -0,0 +1,48 @@
+"""
+Hammer one doctor/date with concurrent bookings through the capacity ledger.
+
+Every round starts from an empty day, so the first bookings race to
+create the ledger. Checks that exactly min(clients, limit) tokens are
+issued (MAX_STANDARD for standard rounds, MAX_EMERGENCY for emergency
+rounds) and that they are 1..n with no duplicates:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_capacity.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from capacity import MAX_STANDARD, MAX_EMERGENCY, capacity_collection, reserve_token, _key  # noqa: E402
+from database import close  # noqa: E402
+
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "500"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "20"))
+DOCTOR, DATE = "bench-doctor", "2000-01-01"
+
+
+async def one_round(is_emergency):
+    await capacity_collection.delete_one({"_id": _key(DOCTOR, DATE)})
+    tokens = await asyncio.gather(*(reserve_token(DOCTOR, DATE, is_emergency) for _ in range(CLIENTS)))
+    issued = sorted(t for t in tokens if t is not None)
+    expected = min(CLIENTS, MAX_EMERGENCY if is_emergency else MAX_STANDARD)
+    assert len(issued) == expected, f"issued {len(issued)} tokens, expected {expected}"
+    assert issued == list(range(1, expected + 1)), "duplicate or skipped token"
+    return len(tokens)
+
+
+async def main():
+    start = time.perf_counter()
+    total = 0
+    for i in range(ROUNDS):
+        total += await one_round(is_emergency=bool(i % 2))
+    elapsed = time.perf_counter() - start
+    await capacity_collection.delete_one({"_id": _key(DOCTOR, DATE)})
+    await close()
+    print(f"{total} booking attempts in {elapsed:.2f}s ({total / elapsed:.0f} ops/s)")
+    print("✅ exactly min(clients, limit) tokens per round, all unique")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
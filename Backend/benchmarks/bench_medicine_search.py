@@ -0,0 +1,93 @@
+"""
+Medicine type-ahead on a synthetic catalog (default 100k SKUs).
+
+Builds medicine_search.MedicineIndex in memory and times keystroke-style
+queries; compares against a regex scan of the same catalog, which is what
+a $regex query per keystroke amounts to. Needs no database:
+    python benchmarks/bench_medicine_search.py
+    BENCH_SKUS=20000 python benchmarks/bench_medicine_search.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from medicine_search import MedicineIndex  # noqa: E402
+
+SKUS = int(os.getenv("BENCH_SKUS", "100000"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "2000"))
+
+random.seed(7)
+SYLLABLES = ["pa", "ra", "ce", "ta", "mol", "am", "lo", "di", "pine", "met", "for", "min", "ox", "ci",
+             "lin", "az", "thro", "my", "cin", "ator", "va", "sta", "ome", "pra", "zole", "ib", "u", "pro", "fen"]
+CATEGORIES = ["Analgesic", "Antibiotic", "Antihypertensive", "Antidiabetic", "Antacid", "Statin",
+              "Antihistamine", "Vitamin", "Antiseptic", "Antiviral"]
+FORMS = ["Tablet", "Capsule", "Syrup", "Injection", "Ointment"]
+
+
+def _word():
+    return "".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))).capitalize()
+
+
+def catalog(n):
+    for i in range(n):
+        name = f"{_word()} {random.choice([5, 10, 20, 50, 100, 250, 500, 650])}mg {random.choice(FORMS)}"
+        yield {
+            "medicineId": f"MED-{1000 + i}",
+            "medicineName": name,
+            "composition": " + ".join(_word() for _ in range(random.randint(1, 2))),
+            "category": random.choice(CATEGORIES),
+        }
+
+
+def keystrokes(docs, count):
+    """Prefixes of real names/compositions, as typed one key at a time."""
+    out = []
+    while len(out) < count:
+        doc = random.choice(docs)
+        text = random.choice([doc["medicineName"], doc["composition"]])
+        for end in range(1, min(len(text), 10) + 1):
+            out.append(text[:end])
+    return out[:count]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def main():
+    docs = list(catalog(SKUS))
+
+    start = time.perf_counter()
+    index = MedicineIndex()
+    index.add_many(docs)
+    print(f"Built index over {len(index)} medicines in {time.perf_counter() - start:.2f}s")
+
+    queries = keystrokes(docs, QUERIES)
+    timings = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q)
+        timings.append((time.perf_counter() - t) * 1000)
+    print(f"index search  ({len(queries)} keystrokes): "
+          f"p50 {percentile(timings, 0.5):.3f} ms  p99 {percentile(timings, 0.99):.3f} ms  "
+          f"max {max(timings):.3f} ms")
+
+    t = time.perf_counter()
+    index.add({"medicineId": "MED-NEW", "medicineName": "Zzyzxamol 10mg Tablet", "category": "Analgesic"})
+    print(f"incremental add: {(time.perf_counter() - t) * 1000:.3f} ms -> {index.search('zzyz')[0]['medicineName']}")
+
+    sample = queries[:50]
+    t = time.perf_counter()
+    for q in sample:
+        pattern = re.compile(re.escape(q), re.IGNORECASE)
+        [d for d in docs if pattern.search(d["medicineName"]) or pattern.search(d["composition"])][:20]
+    print(f"regex scan    ({len(sample)} keystrokes): {(time.perf_counter() - t) * 1000 / len(sample):.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
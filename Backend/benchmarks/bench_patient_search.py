@@ -0,0 +1,86 @@
+"""
+Patient search latency (patient_search.search) on a synthetic population,
+default one million patients, in a scratch collection that is dropped
+afterwards.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_patient_search.py
+    BENCH_PATIENTS=100000 python benchmarks/bench_patient_search.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pymongo import ASCENDING  # noqa: E402
+from database import db, close  # noqa: E402
+from patient_search import search, search_terms  # noqa: E402
+
+PATIENTS = int(os.getenv("BENCH_PATIENTS", "1000000"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "1000"))
+INSERT_BATCH = 10000
+
+collection = db["bench_patient_search"]
+
+FIRST = ["Ramesh", "Suresh", "Priya", "Lakshmi", "Arun", "Karthik", "Divya", "Meena", "Ravi", "Anitha",
+         "Vijay", "Deepa", "Ganesh", "Kavya", "Mohan", "Saranya", "Prakash", "Revathi", "Senthil", "Geetha"]
+LAST = ["Kumar", "Raj", "Krishnan", "Subramanian", "Natarajan", "Iyer", "Pillai", "Reddy", "Nair", "Babu"]
+
+
+def patient(i):
+    first = random.choice(FIRST) + random.choice(["", "", "a", "an", "esh", "i"])
+    name = f"{first} {random.choice(LAST)} {random.choice('ABCDEFGHIJKLMNOPRSTV')}"
+    mobile = f"9{random.randint(100000000, 999999999)}"
+    user_id = f"PID-{100000 + i}"
+    return {"user_id": user_id, "name": name, "mobile": mobile, "role": "patient",
+            "search_terms": search_terms(name, mobile, user_id)}
+
+
+def queries(samples):
+    out = []
+    for doc in random.sample(samples, min(QUERIES, len(samples))):
+        first, last, initial = doc["name"].split()
+        out.append(random.choice([
+            f"{first} {initial}",                        # "Ramesh K"
+            f"{first[:4]} {doc['mobile'][-4:]}",         # "Rame 4411"
+            doc["mobile"][-4:],                          # "4411"
+            doc["user_id"][:8],                          # "PID-4829"
+            f"{first[:-1]}i {last[:3]}",                 # misspelt first name
+        ]))
+    return out
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+async def main():
+    await collection.drop()
+    try:
+        samples = []
+        start = time.perf_counter()
+        for offset in range(0, PATIENTS, INSERT_BATCH):
+            docs = [patient(i) for i in range(offset, min(offset + INSERT_BATCH, PATIENTS))]
+            samples.extend(random.sample(docs, min(len(docs), 20)))
+            await collection.insert_many(docs, ordered=False)
+        await collection.create_index([("search_terms", ASCENDING)])
+        print(f"Loaded {PATIENTS} patients in {time.perf_counter() - start:.1f}s")
+
+        qs = queries(samples)
+        timings = []
+        for q in qs:
+            t = time.perf_counter()
+            await search(q, collection=collection)
+            timings.append((time.perf_counter() - t) * 1000)
+        print(f"{len(qs)} queries: p50 {percentile(timings, 0.5):.1f} ms  "
+              f"p99 {percentile(timings, 0.99):.1f} ms  max {max(timings):.1f} ms")
+    finally:
+        await collection.drop()
+        await close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
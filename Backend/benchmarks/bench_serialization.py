@@ -0,0 +1,62 @@
+"""
+Per-endpoint serialization cost: FastAPI's default path
+(response_model validation + jsonable_encoder + stdlib json) vs
+serialization.fast_response (orjson straight from the Mongo-shaped dicts).
+
+Needs no database:
+    python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from models import PrescriptionOut, Doctor  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+N = int(os.getenv("BENCH_ROWS", "2000"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+now = datetime.utcnow()
+
+vitals = [{
+    "id": str(ObjectId()), "heart_rate": 80, "blood_pressure": "120/80", "temperature": 36.8,
+    "spo2": 98, "respiration_rate": 16, "blood_sugar": 110, "created_at": now - timedelta(minutes=i),
+} for i in range(N)]
+
+prescriptions = [{
+    "id": str(ObjectId()), "patientId": "PID-1", "doctorName": "Dr A", "doctorRole": "Consultant",
+    "doctorDepartment": "Cardiology", "disease": "HTN", "status": "Current", "dateIssued": now,
+    "medications": [{"name": "Amlodipine", "dosageMorning": "5mg", "instructions": "after food"}] * 3,
+} for _ in range(N)]
+
+doctors = [{
+    "id": f"DOC-{i}", "name": "Dr B", "specialty": "Ortho", "contact": "9000000000",
+    "status": "Available", "timeSlots": ["09:00", "10:00", "11:00"],
+} for i in range(N)]
+
+CASES = {
+    "vitals/all": (vitals, None),
+    "prescriptions": (prescriptions, TypeAdapter(List[PrescriptionOut])),
+    "doctors": (doctors, TypeAdapter(List[Doctor])),
+}
+
+
+def default_path(content, adapter):
+    if adapter is not None:
+        content = adapter.validate_python(content)
+    return json.dumps(jsonable_encoder(content)).encode()
+
+
+if __name__ == "__main__":
+    print(f"rows={N} repeat={REPEAT}")
+    for name, (content, adapter) in CASES.items():
+        slow = timeit.timeit(lambda: default_path(content, adapter), number=REPEAT) / REPEAT
+        fast = timeit.timeit(lambda: dumps(content), number=REPEAT) / REPEAT
+        print(f"{name:15s} default {slow * 1000:8.2f} ms   orjson {fast * 1000:8.2f} ms   x{slow / fast:5.1f}")
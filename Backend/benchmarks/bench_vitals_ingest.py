@@ -0,0 +1,53 @@
+"""
+Bulk vitals ingest throughput (rows/second) through vitals_ingest.ingest.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_vitals_ingest.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import users_collection, vitals_collection, close  # noqa: E402
+from vitals_ingest import ingest, VITALS_BULK_BATCH_SIZE  # noqa: E402
+from vitals_store import ensure_collection  # noqa: E402
+
+ROWS = int(os.getenv("BENCH_ROWS", "100000"))
+BEDS = int(os.getenv("BENCH_BEDS", "200"))
+PREFIX = "BENCH-BED-"
+
+
+async def records():
+    for row in range(ROWS):
+        yield row, {
+            "patient_id": f"{PREFIX}{row % BEDS}",
+            "heart_rate": random.randint(55, 120),
+            "blood_pressure": f"{random.randint(100, 150)}/{random.randint(60, 95)}",
+            "temperature": round(random.uniform(36.0, 39.0), 1),
+            "spo2": random.randint(88, 100),
+            "respiration_rate": random.randint(10, 28),
+        }
+
+
+async def main():
+    await ensure_collection()
+    await users_collection.insert_many(
+        [{"user_id": f"{PREFIX}{i}", "role": "patient", "name": f"Bed {i}"} for i in range(BEDS)]
+    )
+    try:
+        start = time.perf_counter()
+        summary = await ingest(records())
+        elapsed = time.perf_counter() - start
+        print(f"batch={VITALS_BULK_BATCH_SIZE} rows={ROWS} inserted={summary['inserted']}")
+        print(f"{summary['inserted'] / elapsed:.0f} rows/s")
+    finally:
+        await users_collection.delete_many({"user_id": {"$regex": f"^{PREFIX}"}})
+        await vitals_collection.delete_many({"patient_id": {"$regex": f"^{PREFIX}"}})
+        await close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
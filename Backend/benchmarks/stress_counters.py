@@ -0,0 +1,45 @@
+"""
+Concurrency stress test for counters.Sequence.
+
+Simulates several workers (one Sequence instance each, like separate
+uvicorn processes) drawing IDs concurrently and checks they are unique:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/stress_counters.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from counters import Sequence, counters_collection  # noqa: E402
+from database import close  # noqa: E402
+
+WORKERS = int(os.getenv("BENCH_WORKERS", "8"))
+PER_WORKER = int(os.getenv("BENCH_IDS_PER_WORKER", "5000"))
+NAME = "stress_test"
+
+
+async def main():
+    await counters_collection.delete_one({"_id": NAME})
+    workers = [Sequence(NAME, "T-", 0) for _ in range(WORKERS)]
+
+    async def draw(seq):
+        return await asyncio.gather(*(seq.next_id() for _ in range(PER_WORKER)))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(draw(w) for w in workers))
+    elapsed = time.perf_counter() - start
+
+    ids = [i for batch in results for i in batch]
+    await counters_collection.delete_one({"_id": NAME})
+    await close()
+
+    total = WORKERS * PER_WORKER
+    print(f"{total} ids in {elapsed:.2f}s ({total / elapsed:.0f} ids/s)")
+    assert len(set(ids)) == total, f"duplicates: {total - len(set(ids))}"
+    print("✅ all ids unique")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
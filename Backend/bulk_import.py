@@ -0,0 +1,399 @@
+"""
+Bulk onboarding import for patients, staff, doctors/users and medicines.
+
+Rows are streamed (CSV with a header line, NDJSON, or a JSON array) and
+validated against the same models as the single-row admin endpoints:
+
+    patients   PatientCreate     -> users      (like /admin/patient-register)
+    staff      StaffCreate       -> staff      (like /admin/staff-register)
+    users      UserMasterCreate  -> admins / doctors / users (like /admin/create-user)
+    doctors    UserMasterCreate with userType defaulting to "doctor"
+    medicines  MedicineCreate    -> pharmacy   (like /admin/medicine-add)
+
+Work is done in chunks of IMPORT_BATCH_SIZE rows: one $in query finds
+duplicates already in the database, passwords are hashed in the process
+pool, login handles are claimed with one insert_many on `identities`, and
+the documents go in with one unordered insert_many. Only one chunk is held
+in memory, and at most IMPORT_MAX_ERRORS row errors are kept (the rest are
+only counted).
+
+    POST /admin/import/{kind}      body: text/csv, application/x-ndjson or JSON array
+    GET  /admin/imports            progress of recent imports
+    python manage.py import patients patients.csv
+"""
+import os
+from datetime import datetime
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from database import (
+    users_collection, doctors_collection, admin_collection, staff_collection,
+    pharmacy_collection,
+)
+from models import PatientCreate, StaffCreate, UserMasterCreate, MedicineCreate
+from counters import medicine_ids
+from doctor_photos import store_photo, delete_photo, InvalidPhoto
+from etags import bump
+from identities import claim_many, existing as existing_identities, release_many
+from passwords import hash_passwords
+import medicine_search
+import stock
+from patient_search import search_terms
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+RECENT_IMPORTS = 20
+
+
+class ImportJob:
+    def __init__(self, kind):
+        self.id = str(ObjectId())
+        self.kind = kind
+        self.status = "running"
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.started_at = datetime.now()
+        self.finished_at = None
+
+    def error(self, row, detail):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "detail": detail})
+
+    def summary(self, with_errors=True):
+        out = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if with_errors:
+            out["errors"] = self.errors
+            out["errors_truncated"] = self.failed > len(self.errors)
+        return out
+
+
+jobs = {}
+
+
+def recent_jobs():
+    return [job.summary(with_errors=False) for job in reversed(list(jobs.values()))]
+
+
+def _remember(job):
+    jobs[job.id] = job
+    while len(jobs) > RECENT_IMPORTS:
+        jobs.pop(next(iter(jobs)))
+
+
+# ---- principals (patients, staff, users) ----
+
+def _patient(p, password, ref):
+    doc = {
+        "_id": ref,
+        "user_id": p.patientId,
+        "role": "patient",
+        "dob": p.dob,
+        "password": password,
+        "name": p.name,
+        "age": p.age,
+        "gender": p.gender,
+        "mobile": p.mobile,
+        "address": p.address,
+        "disease": p.disease,
+        "assignedDoctor": p.assignedDoctor,
+        "status": p.status,
+        "search_terms": search_terms(p.name, p.mobile, p.patientId),
+    }
+    return users_collection, doc, "patient", [], [f"patient:{p.patientId}", f"patient:{p.mobile}"]
+
+
+def _staff(s, password, ref):
+    doc = {
+        "_id": ref,
+        "staffId": s.staffId,
+        "name": s.name,
+        "password": password,
+        "role": s.role,
+        "department": s.department,
+        "shift": s.shift,
+        "contactNumber": s.contactNumber,
+        "availability": s.availability,
+    }
+    return staff_collection, doc, "staff", [], []
+
+
+def _user(u, password, ref):
+    user_type = u.userType.lower()
+    if user_type == "admin":
+        doc = {
+            "_id": ref,
+            "adminId": u.userId,
+            "password": password,
+            "name": u.name,
+            "role": u.roleOrSpec or "Admin",
+            "contact": u.contact,
+            "status": u.status,
+        }
+        return admin_collection, doc, "admin", [], []
+    if user_type == "doctor":
+        doc = {
+            "_id": ref,
+            "doctorId": u.userId,
+            "role": "doctor",
+            "password": password,
+            "name": u.name,
+            "roleOrSpec": u.roleOrSpec,
+            "contact": u.contact,
+            "status": u.status,
+            "timeSlots": u.timeSlots,
+        }
+        return doctors_collection, doc, "doctor", [u.contact], ["doctors"]
+    doc = {
+        "_id": ref,
+        "userId": u.userId,
+        "userType": "patient",
+        "password": password,
+        "name": u.name,
+        "roleOrSpec": u.roleOrSpec,
+        "contact": u.contact,
+        "status": u.status,
+        "search_terms": search_terms(u.name, u.contact, u.userId),
+    }
+    return users_collection, doc, "patient", [], []
+
+
+def _check_user(u):
+    user_type = u.userType.lower()
+    if user_type not in ["patient", "doctor", "admin"]:
+        return "Invalid user type"
+    if user_type == "doctor" and not u.timeSlots:
+        return "Doctor timeSlots required"
+    return None
+
+
+def _prepare_user(item, default_type=None):
+    if default_type:
+        item.setdefault("userType", default_type)
+    # CSV: "09:00;10:00;11:00"
+    if isinstance(item.get("timeSlots"), str):
+        item["timeSlots"] = [s.strip() for s in item["timeSlots"].split(";") if s.strip()]
+    return item
+
+
+# kind -> (model, ID handle attributes (principal id first), build, check, prepare)
+# A patient's mobile is a unique login handle, as in /admin/patient-register.
+PRINCIPALS = {
+    "patients": (PatientCreate, ("patientId", "mobile"), _patient, None, None),
+    "staff": (StaffCreate, ("staffId",), _staff, None, None),
+    "users": (UserMasterCreate, ("userId",), _user, _check_user, _prepare_user),
+    "doctors": (UserMasterCreate, ("userId",), _user, _check_user, lambda item: _prepare_user(item, "doctor")),
+}
+
+
+async def _insert_grouped(docs_by_collection):
+    """insert_many per collection. Returns the refs that failed, with their error."""
+    failed = {}
+    for collection, docs in docs_by_collection.items():
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                failed[docs[err["index"]]["_id"]] = err.get("errmsg", "Write failed")
+    return failed
+
+
+def _ids(item, keys):
+    return [(key, getattr(item, key)) for key in keys if getattr(item, key)]
+
+
+async def _write_principals(kind, batch, job):
+    _, keys, build, _, _ = PRINCIPALS[kind]
+
+    # Duplicates inside the chunk, then against everything already claimed
+    unique = []
+    seen = set()
+    for row, item in batch:
+        dup = next(((k, h) for k, h in _ids(item, keys) if h in seen), None)
+        if dup:
+            job.error(row, f"Duplicate {dup[0]} {dup[1]} in import")
+        else:
+            seen.update(h for _, h in _ids(item, keys))
+            unique.append((row, item))
+    taken = await existing_identities(seen)
+    rows = []
+    for row, item in unique:
+        dup = next(((k, h) for k, h in _ids(item, keys) if h in taken), None)
+        if dup:
+            job.error(row, f"{dup[0]} {dup[1]} already exists")
+        else:
+            rows.append((row, item))
+    if not rows:
+        return
+
+    hashed = await hash_passwords([item.password for _, item in rows])
+
+    claims, built = [], []
+    photos = {}
+    for (row, item), password in zip(rows, hashed):
+        ref = ObjectId()
+        collection, doc, role, contacts, bump_keys = build(item, password, ref)
+        if collection is doctors_collection and getattr(item, "profile_pic", None):
+            try:
+                photos[ref] = await store_photo(item.userId, item.profile_pic)
+            except InvalidPhoto as e:
+                job.error(row, str(e))
+                continue
+            doc.update(photos[ref])
+        claims.append(([h for _, h in _ids(item, keys)], contacts, role, collection, ref, getattr(item, keys[0])))
+        built.append((row, ref, collection, doc, bump_keys))
+
+    # Claim login handles; a row whose handle was taken meanwhile is skipped
+    lost = await claim_many(claims)
+    docs_by_collection = {}
+    for row, ref, collection, doc, _ in built:
+        if ref in lost:
+            job.error(row, f"{' or '.join(keys)} already exists")
+        else:
+            docs_by_collection.setdefault(collection, []).append(doc)
+
+    failed = await _insert_grouped(docs_by_collection)
+    if failed:
+        await release_many(failed)
+    for ref in (set(lost) | set(failed)) & set(photos):
+        await delete_photo(photos[ref])
+
+    keys = set()
+    for row, ref, _, _, bump_keys in built:
+        if ref in lost:
+            continue
+        if ref in failed:
+            job.error(row, failed[ref])
+        else:
+            job.inserted += 1
+            keys.update(bump_keys)
+    if keys:
+        await bump(*keys)
+
+
+# ---- medicines ----
+
+async def _write_medicines(batch, job):
+    unique = []
+    seen = set()
+    for row, med in batch:
+        expires_at = stock.parse_expiry(med.expiryDate)
+        if expires_at is None:
+            job.error(row, "Invalid expiryDate, use MM/YYYY or YYYY-MM-DD")
+            continue
+        pair = (med.medicineName, med.batchNumber)
+        if pair in seen:
+            job.error(row, "Duplicate medicine batch in import")
+            continue
+        seen.add(pair)
+        unique.append((row, med, expires_at))
+    if not unique:
+        return
+
+    existing = await pharmacy_collection.find(
+        {"medicineName": {"$in": list({p[0] for p in seen})}, "batchNumber": {"$in": list({p[1] for p in seen})}},
+        {"_id": 0, "medicineName": 1, "batchNumber": 1},
+    ).to_list()
+    taken = {(d["medicineName"], d["batchNumber"]) for d in existing}
+
+    rows, docs = [], []
+    for row, med, expires_at in unique:
+        if (med.medicineName, med.batchNumber) in taken:
+            job.error(row, "Medicine with this batch already exists")
+            continue
+        if not med.medicineId:
+            med.medicineId = await medicine_ids.next_id()
+        doc = med.dict()
+        doc["expiresAt"] = expires_at
+        doc["inTotal"] = stock.in_total(expires_at)
+        rows.append(row)
+        docs.append(doc)
+    if not docs:
+        return
+
+    failed = {}
+    try:
+        await pharmacy_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+    inserted = []
+    for i, (row, doc) in enumerate(zip(rows, docs)):
+        if i in failed:
+            job.error(row, failed[i])
+        else:
+            inserted.append(doc)
+    job.inserted += len(inserted)
+    await stock.record_receipts(inserted)
+    medicine_search.index.add_many(inserted)
+
+
+# ---- driver ----
+
+KINDS = list(PRINCIPALS) + ["medicines"]
+
+
+def _validator(kind):
+    if kind == "medicines":
+        return MedicineCreate, None, None
+    model, _, _, check, prepare = PRINCIPALS[kind]
+    return model, check, prepare
+
+
+async def _write(kind, batch, job):
+    if kind == "medicines":
+        await _write_medicines(batch, job)
+    else:
+        await _write_principals(kind, batch, job)
+
+
+async def run_import(kind, records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """records: async iterable of (row, dict or error message). Returns the finished ImportJob."""
+    model, check, prepare = _validator(kind)
+    job = ImportJob(kind)
+    _remember(job)
+    batch = []
+    try:
+        async for row, item in records:
+            job.processed += 1
+            if isinstance(item, str):
+                job.error(row, item)
+                continue
+            try:
+                if prepare:
+                    item = prepare(item)
+                parsed = model(**item)
+            except (ValidationError, TypeError) as e:
+                job.error(row, str(e))
+                continue
+            problem = check(parsed) if check else None
+            if problem:
+                job.error(row, problem)
+                continue
+            batch.append((row, parsed))
+            if len(batch) >= batch_size:
+                await _write(kind, batch, job)
+                batch = []
+                if progress:
+                    progress(job)
+        if batch:
+            await _write(kind, batch, job)
+        job.status = "done"
+    except Exception:
+        job.status = "failed"
+        raise
+    finally:
+        job.finished_at = datetime.now()
+        if progress:
+            progress(job)
+    return job
@@ -0,0 +1,111 @@
+"""Per-doctor-per-day appointment capacity ledger: one conditional $inc per booking."""
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db, appointments_collection
+
+capacity_collection = db["appointment_capacity"]
+
+MAX_STANDARD = 25
+MAX_EMERGENCY = 30 # Standard 25 + 5 Emergency
+
+
+def _key(doctor_id, date):
+    return f"{doctor_id}|{date}"
+
+
+def _counts(filled, emergency, last_token):
+    # Keep new tokens above every token already handed out
+    return {"filled": filled, "emergency": emergency, "released": max((last_token or 0) - filled, 0)}
+
+
+async def _seed(doctor_id, date):
+    """Ledger counts for a day from its appointments (days booked before the ledger existed)."""
+    rows = await (await appointments_collection.aggregate([
+        {"$match": {"doctor_id": doctor_id, "date": date}},
+        {"$group": {
+            "_id": None,
+            "filled": {"$sum": 1},
+            "emergency": {"$sum": {"$cond": ["$is_emergency", 1, 0]}},
+            "last_token": {"$max": "$token_number"},
+        }},
+    ])).to_list()
+    return _counts(rows[0]["filled"], rows[0]["emergency"], rows[0]["last_token"]) if rows else _counts(0, 0, 0)
+
+
+async def _ensure_ledger(doctor_id, date):
+    # Equality-only upsert: safe under concurrent first bookings of a day
+    if await capacity_collection.find_one({"_id": _key(doctor_id, date)}, {"_id": 1}):
+        return  # the day is full
+    counts = await _seed(doctor_id, date)
+    try:
+        await capacity_collection.update_one(
+            {"_id": _key(doctor_id, date)},
+            {"$setOnInsert": {"doctor_id": doctor_id, "date": date, **counts}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass  # another booking created it first
+
+
+async def _take(doctor_id, date, limit, is_emergency):
+    return await capacity_collection.find_one_and_update(
+        {"_id": _key(doctor_id, date), "filled": {"$lt": limit}},
+        {"$inc": {"filled": 1, "emergency": 1 if is_emergency else 0}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def reserve_token(doctor_id, date, is_emergency=False):
+    """Atomically take the next token. Returns the token number or None if the quota is full."""
+    limit = MAX_EMERGENCY if is_emergency else MAX_STANDARD
+    doc = await _take(doctor_id, date, limit, is_emergency)
+    if doc is None:
+        # Either the day is full or this is its first booking
+        await _ensure_ledger(doctor_id, date)
+        doc = await _take(doctor_id, date, limit, is_emergency)
+    if doc is None:
+        return None
+    return doc["filled"] + doc.get("released", 0)
+
+
+async def release_token(doctor_id, date, is_emergency=False):
+    """Give back a slot taken by reserve_token whose booking was not saved.
+
+    `released` goes up as `filled` goes down, so filled + released (the
+    token number) never repeats.
+    """
+    await capacity_collection.update_one(
+        {"_id": _key(doctor_id, date), "filled": {"$gt": 0}},
+        {"$inc": {"filled": -1, "emergency": -1 if is_emergency else 0, "released": 1}},
+    )
+
+
+async def get_filled(doctor_id, date):
+    doc = await capacity_collection.find_one({"_id": _key(doctor_id, date)}, {"filled": 1})
+    return doc["filled"] if doc else (await _seed(doctor_id, date))["filled"]
+
+
+async def rebuild():
+    """Recompute every ledger document from the appointments collection."""
+    pipeline = [
+        {"$group": {
+            "_id": {"doctor_id": "$doctor_id", "date": "$date"},
+            "filled": {"$sum": 1},
+            "emergency": {"$sum": {"$cond": ["$is_emergency", 1, 0]}},
+            "last_token": {"$max": "$token_number"},
+        }},
+    ]
+    count = 0
+    async for row in await appointments_collection.aggregate(pipeline):
+        doctor_id, date = row["_id"]["doctor_id"], row["_id"]["date"]
+        await capacity_collection.update_one(
+            {"_id": _key(doctor_id, date)},
+            {"$set": {
+                "doctor_id": doctor_id,
+                "date": date,
+                **_counts(row["filled"], row["emergency"], row["last_token"]),
+            }},
+            upsert=True,
+        )
+        count += 1
+    return count
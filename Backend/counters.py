@@ -0,0 +1,72 @@
+"""
+Atomic sequence IDs (ADM-, MED-, LAB-, ...).
+
+Each sequence is one document in `counters` bumped with $inc through
+findOneAndUpdate. A worker leases a block of `block_size` numbers at a
+time and hands them out from memory, so most inserts cost no round trip.
+IDs stay unique across workers; unused numbers in a block are skipped
+when the process restarts (gaps are expected, duplicates are not).
+"""
+import asyncio
+import os
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db
+
+counters_collection = db["counters"]
+
+COUNTER_BLOCK_SIZE = int(os.getenv("COUNTER_BLOCK_SIZE", "20"))
+
+
+class Sequence:
+    def __init__(self, name, prefix, start, seed_collection=None, block_size=COUNTER_BLOCK_SIZE):
+        self.name = name
+        self.prefix = prefix
+        self.start = start
+        self.seed_collection = seed_collection
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0  # exclusive
+        self._lock = asyncio.Lock()
+
+    async def _seed(self):
+        # First use on an existing database: continue after the old count-based IDs
+        seq = 0
+        if self.seed_collection is not None:
+            seq = await self.seed_collection.count_documents({})
+        try:
+            await counters_collection.update_one(
+                {"_id": self.name},
+                {"$setOnInsert": {"seq": seq}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass  # another worker seeded it first
+
+    async def _lease(self):
+        doc = await counters_collection.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"seq": self.block_size}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            await self._seed()
+            return await self._lease()
+        self._end = doc["seq"] + 1
+        self._next = self._end - self.block_size
+
+    async def next_value(self):
+        async with self._lock:
+            if self._next >= self._end:
+                await self._lease()
+            value = self._next
+            self._next += 1
+            return value
+
+    async def next_id(self):
+        return self.prefix + str(self.start + await self.next_value())
+
+
+admission_ids = Sequence("admission", "ADM-", 100000, db["admission"])
+medicine_ids = Sequence("medicine", "MED-", 1000, db["pharmacy"])
+lab_report_ids = Sequence("lab_report", "LAB-", 1000, db["lab_report"])
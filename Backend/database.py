@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from pymongo.errors import ConnectionFailure
 import os
 from dotenv import load_dotenv
@@ -6,14 +6,36 @@ from dotenv import load_dotenv
 load_dotenv()
 # Read Mongo URI from environment
 MONGO_URI = os.getenv("MONGO_URI")
-print(MONGO_URI)
-# Create Mongo client
-try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    client.admin.command("ping")  # Health check
-    print("✅ MongoDB connected successfully")
-except ConnectionFailure:
-    raise RuntimeError("❌ Failed to connect to MongoDB")
+
+# Connection pool tuning (per worker process)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+
+# Create async Mongo client (connects lazily on first operation)
+client = AsyncMongoClient(
+    MONGO_URI,
+    serverSelectionTimeoutMS=5000,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+)
+
+
+async def ping():
+    """Health check, called once from the app lifespan."""
+    try:
+        await client.admin.command("ping")
+        print("✅ MongoDB connected successfully")
+    except ConnectionFailure:
+        raise RuntimeError("❌ Failed to connect to MongoDB")
+
+
+async def close():
+    await client.close()
+
 
 # Database
 db = client["med360"]
@@ -28,4 +50,6 @@ staff_collection = db['staff']
 pharmacy_collection = db['pharmacy']
 lab_report_collection = db['lab_report']
 prescription_collection = db['prescriptions']
-vitals_collection = db['vitals']
+# Time-series collection, see vitals_store.py
+VITALS_COLLECTION = os.getenv("VITALS_COLLECTION", "vitals_ts")
+vitals_collection = db[VITALS_COLLECTION]
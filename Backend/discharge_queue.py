@@ -0,0 +1,176 @@
+"""
+Discharge work queue for the admin dashboard.
+
+`discharge_queue` holds one entry per in-patient the doctor has marked for
+discharge, keyed by the appointment _id:
+
+    {_id, patient_id, patient_name, doctor_id, doctor_name, ward_no, bed_no,
+     discharge_date, state: "pending" | "done", seq, removed_at}
+
+discharge_patient enqueues, finalize_discharge marks the entry done. Every
+write takes the next `seq` from `counters`, so a client can poll with
+?since=<token> and get only what was added or finalized after it. Done
+entries are kept as tombstones for DISCHARGE_TOMBSTONE_TTL seconds (TTL
+index on removed_at) so incremental readers see removals.
+
+A seq is taken before its entry is written, so seq 11 can be visible
+while seq 10 is still in flight. Taking a seq also lists it in the
+counter's `inflight` array, and the write removes it once it has landed.
+Sync tokens stop below the lowest seq still in flight, so they never move
+past an uncommitted write. A writer that dies mid-write holds tokens back
+for at most DISCHARGE_INFLIGHT_TIMEOUT_MS, after which its seq is
+ignored (an entry it did write after that is only seen by full reads).
+
+Rebuild from appointments that have a discharge date but were never
+confirmed by an admin (one-off migration):
+    python manage.py rebuild discharge-queue
+"""
+import os
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from database import db, appointments_collection, doctors_collection
+from counters import counters_collection
+
+DISCHARGE_TOMBSTONE_TTL = int(os.getenv("DISCHARGE_TOMBSTONE_TTL", str(7 * 24 * 3600)))
+DISCHARGE_QUEUE_LIMIT = 500
+DISCHARGE_INFLIGHT_TIMEOUT_MS = int(os.getenv("DISCHARGE_INFLIGHT_TIMEOUT_MS", "60000"))
+
+discharge_queue_collection = db["discharge_queue"]
+
+_SEQ_ID = "discharge_queue"
+
+
+async def _next_seq():
+    """Take the next seq and list it as in flight (call _landed after the write).
+
+    Not a counters.Sequence: leased blocks would break ordering across workers.
+    """
+    doc = await counters_collection.find_one_and_update(
+        {"_id": _SEQ_ID},
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, 1]}}},
+            {"$set": {"inflight": {"$concatArrays": [
+                # Drop seqs of writers that never finished
+                {"$filter": {
+                    "input": {"$ifNull": ["$inflight", []]},
+                    "cond": {"$gt": ["$$this.at", {"$subtract": ["$$NOW", DISCHARGE_INFLIGHT_TIMEOUT_MS]}]},
+                }},
+                [{"seq": "$seq", "at": "$$NOW"}],
+            ]}}},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["seq"]
+
+
+async def _landed(seq):
+    await counters_collection.update_one({"_id": _SEQ_ID}, {"$pull": {"inflight": {"seq": seq}}})
+
+
+async def current_token():
+    """Highest seq with no write still in flight at or below it: a safe starting point for ?since=."""
+    doc = await counters_collection.find_one({"_id": _SEQ_ID})
+    if not doc:
+        return 0
+    expired = datetime.utcnow() - timedelta(milliseconds=DISCHARGE_INFLIGHT_TIMEOUT_MS)
+    inflight = [e["seq"] for e in doc.get("inflight", []) if e["at"] > expired]
+    return min(inflight) - 1 if inflight else doc["seq"]
+
+
+async def _doctor_name(appointment):
+    if appointment.get("doctor_name"):
+        return appointment["doctor_name"]
+    if not appointment.get("doctor_id"):
+        return None
+    doctor = await doctors_collection.find_one({"doctorId": appointment["doctor_id"]}, {"name": 1})
+    return doctor.get("name") if doctor else None
+
+
+async def enqueue(appointment, discharge_date):
+    """Add (or re-date) the queue entry for an appointment document."""
+    fields = {
+        "patient_id": appointment.get("patient_id"),
+        "patient_name": appointment.get("patient_name"),
+        "doctor_id": appointment.get("doctor_id"),
+        "doctor_name": await _doctor_name(appointment),
+        "ward_no": appointment.get("ward_no"),
+        "bed_no": appointment.get("bed_no"),
+        "discharge_date": discharge_date,
+        "state": "pending",
+    }
+    seq = await _next_seq()
+    try:
+        await discharge_queue_collection.update_one(
+            {"_id": appointment["_id"]},
+            {"$set": {**fields, "seq": seq}, "$unset": {"removed_at": ""}},
+            upsert=True,
+        )
+    finally:
+        await _landed(seq)
+
+
+async def remove(appointment_id):
+    """Mark an entry done. Returns False if it was not pending."""
+    seq = await _next_seq()
+    try:
+        result = await discharge_queue_collection.update_one(
+            {"_id": appointment_id, "state": "pending"},
+            {"$set": {"state": "done", "seq": seq, "removed_at": datetime.utcnow()}},
+        )
+    finally:
+        await _landed(seq)
+    return result.modified_count > 0
+
+
+def _entry(doc):
+    entry = {
+        "id": str(doc["_id"]),
+        "patient_id": doc.get("patient_id"),
+        "patient_name": doc.get("patient_name"),
+        "doctor_name": doc.get("doctor_name"),
+        "ward_no": doc.get("ward_no"),
+        "bed_no": doc.get("bed_no"),
+        "discharge_date": doc.get("discharge_date"),
+    }
+    if doc.get("state") == "done":
+        entry["removed"] = True
+    return entry
+
+
+async def pending(ward=None, date=None, limit=DISCHARGE_QUEUE_LIMIT):
+    """Pending entries, soonest discharge first. Returns (entries, sync token)."""
+    token = await current_token()
+    query = {"state": "pending"}
+    if ward:
+        query["ward_no"] = ward
+    if date:
+        query["discharge_date"] = date
+    cursor = discharge_queue_collection.find(query).sort([("discharge_date", 1), ("seq", 1)]).limit(limit)
+    return [_entry(doc) async for doc in cursor], token
+
+
+async def changes(since, ward=None, limit=DISCHARGE_QUEUE_LIMIT):
+    """Entries added, re-dated or finalized after `since`. Returns (entries, sync token)."""
+    safe = await current_token()
+    query = {"seq": {"$gt": since, "$lte": safe}}
+    if ward:
+        query["ward_no"] = ward
+    docs = await discharge_queue_collection.find(query).sort("seq", 1).limit(limit).to_list()
+    # A full page stops at its last entry; otherwise everything up to `safe` was read
+    token = docs[-1]["seq"] if len(docs) == limit else max(safe, since)
+    return [_entry(doc) for doc in docs], token
+
+
+async def rebuild():
+    """Re-enqueue appointments with a discharge date and no admin confirmation."""
+    queued = 0
+    cursor = appointments_collection.find(
+        {"discharge_date": {"$ne": None}, "admin_confirmed_at": {"$exists": False}},
+        {"patient_id": 1, "patient_name": 1, "doctor_id": 1, "doctor_name": 1,
+         "ward_no": 1, "bed_no": 1, "discharge_date": 1},
+    )
+    async for doc in cursor:
+        await enqueue(doc, doc["discharge_date"])
+        queued += 1
+    return queued
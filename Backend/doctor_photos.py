@@ -0,0 +1,114 @@
+"""Doctor profile pictures in GridFS (bucket `doctor_photos`): original plus thumbnail, new ids per upload."""
+import asyncio
+import base64
+import binascii
+import io
+from bson import ObjectId
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import NoFile
+from database import db, doctors_collection
+
+try:
+    from PIL import Image, UnidentifiedImageError
+except ImportError:  # thumbnails fall back to the original image
+    Image = None
+
+THUMBNAIL_SIZE = (128, 128)
+
+photos_bucket = AsyncGridFSBucket(db, bucket_name="doctor_photos")
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+def decode_base64(data):
+    """Accepts raw base64 or a data: URI. Returns (bytes, content_type). Raises InvalidPhoto."""
+    content_type = "image/jpeg"
+    if data.startswith("data:"):
+        header, _, data = data.partition(",")
+        content_type = header[5:].split(";")[0] or content_type
+    if not content_type.startswith("image/"):
+        raise InvalidPhoto(f"Unsupported picture type {content_type}")
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidPhoto("Picture is not valid base64")
+    if not raw:
+        raise InvalidPhoto("Picture is empty")
+    return raw, content_type
+
+
+def make_thumbnail(raw):
+    """JPEG thumbnail, or None without Pillow. Raises InvalidPhoto if raw is not an image."""
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(raw))
+        img.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=80)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        raise InvalidPhoto(f"Picture is not a readable image: {e}")
+    return out.getvalue()
+
+
+async def store_photo(doctor_id, data):
+    """Upload a base64 picture and its thumbnail. Returns the fields to $set on the doctor. Raises InvalidPhoto."""
+    raw, content_type = decode_base64(data)
+    # Resizing is CPU bound, keep it off the event loop. It also validates
+    # the picture before anything is written to GridFS.
+    thumb = await asyncio.to_thread(make_thumbnail, raw)
+    original_id = await photos_bucket.upload_from_stream(
+        doctor_id, raw, metadata={"contentType": content_type, "doctorId": doctor_id}
+    )
+    thumb_id = original_id
+    if thumb is not None:
+        try:
+            thumb_id = await photos_bucket.upload_from_stream(
+                f"{doctor_id}-thumb", thumb, metadata={"contentType": "image/jpeg", "doctorId": doctor_id}
+            )
+        except Exception:
+            await photos_bucket.delete(original_id)
+            raise
+    return {"profile_pic_id": original_id, "profile_thumb_id": thumb_id}
+
+
+async def delete_photo(fields):
+    """Remove the files returned by store_photo (doctor insert failed)."""
+    for file_id in {fields.get("profile_pic_id"), fields.get("profile_thumb_id")} - {None}:
+        try:
+            await photos_bucket.delete(file_id)
+        except NoFile:
+            pass
+
+
+async def open_photo(file_id: ObjectId):
+    """Returns a GridOut stream or None."""
+    try:
+        return await photos_bucket.open_download_stream(file_id)
+    except NoFile:
+        return None
+
+
+async def migrate():
+    """Move base64 `profile_pic` fields into GridFS. Returns (moved, skipped)."""
+    moved = skipped = 0
+    cursor = doctors_collection.find(
+        {"profile_pic": {"$type": "string", "$ne": ""}},
+        {"doctorId": 1, "profile_pic": 1},
+    )
+    async for doc in cursor:
+        try:
+            fields = await store_photo(doc["doctorId"], doc["profile_pic"])
+        except InvalidPhoto as e:
+            # Left in place for a manual fix; re-runs will report it again
+            print(f"⚠️ {doc.get('doctorId')}: {e}")
+            skipped += 1
+            continue
+        await doctors_collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": fields, "$unset": {"profile_pic": ""}},
+        )
+        moved += 1
+    return moved, skipped
@@ -0,0 +1,254 @@
+"""
+Ward early-warning board (NEWS2).
+
+`vitals_latest` holds one snapshot per patient: the most recent value of
+every vital, the ward/bed they occupy, and the NEWS2 score of that
+snapshot:
+
+    {_id: patient_id, ward, bed, heart_rate, respiration_rate, spo2,
+     temperature, bp_systolic, bp_diastolic, ..., created_at,
+     news2, news2_parts, risk, missing}
+
+Each new reading is merged into the snapshot (fields the reading leaves
+out keep their last value; readings older than the snapshot are ignored)
+and the score is recomputed from the merged snapshot. Bed allocation and
+release keep `ward` current, so a ward's board is one read on the
+(ward, news2) index.
+
+Scores follow the RCP NEWS2 chart with SpO2 scale 1, patient on air and
+alert (consciousness and oxygen are not recorded in vitals). When
+NEWS2_BANDS change, rescore every snapshot in one vectorized pass:
+    python manage.py rescore
+Build snapshots from existing vitals history and admissions (one-off):
+    python manage.py rebuild early-warning
+"""
+import math
+from datetime import datetime
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database import db, vitals_collection
+from identities import identities_collection, principal_ids
+
+vitals_latest_collection = db["vitals_latest"]
+
+# snapshot field -> [(upper bound inclusive, points), ...] in ascending order
+NEWS2_BANDS = {
+    "respiration_rate": [(8, 3), (11, 1), (20, 0), (24, 2), (math.inf, 3)],
+    "spo2": [(91, 3), (93, 2), (95, 1), (math.inf, 0)],
+    "bp_systolic": [(90, 3), (100, 2), (110, 1), (219, 0), (math.inf, 3)],
+    "heart_rate": [(40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (math.inf, 3)],
+    "temperature": [(35.0, 3), (36.0, 1), (38.0, 0), (39.0, 1), (math.inf, 2)],
+}
+
+SNAPSHOT_FIELDS = [
+    "heart_rate", "respiration_rate", "spo2", "temperature",
+    "blood_pressure", "bp_systolic", "bp_diastolic", "blood_sugar",
+]
+
+
+def _points(field, value):
+    for bound, points in NEWS2_BANDS[field]:
+        if value <= bound:
+            return points
+    return 0
+
+
+def risk(total, max_part):
+    if total >= 7:
+        return "high"
+    if total >= 5:
+        return "medium"
+    if max_part >= 3:
+        return "low-medium"
+    return "low"
+
+
+def score(snapshot):
+    """NEWS2 fields to $set for one snapshot."""
+    parts = {}
+    missing = []
+    for field in NEWS2_BANDS:
+        value = snapshot.get(field)
+        if value is None:
+            missing.append(field)
+        else:
+            parts[field] = _points(field, value)
+    total = sum(parts.values())
+    return {
+        "news2": total,
+        "news2_parts": parts,
+        "risk": risk(total, max(parts.values(), default=0)),
+        "missing": missing,
+    }
+
+
+def score_arrays(columns):
+    """Vectorized NEWS2 over {field: float array (NaN = missing)}. Returns (total, max part, parts)."""
+    n = len(next(iter(columns.values())))
+    total = np.zeros(n, dtype=np.int64)
+    max_part = np.zeros(n, dtype=np.int64)
+    parts = {}
+    for field, bands in NEWS2_BANDS.items():
+        values = columns[field]
+        bounds = np.array([b for b, _ in bands], dtype=np.float64)
+        points = np.array([p for _, p in bands], dtype=np.int64)
+        idx = np.minimum(np.searchsorted(bounds, values, side="left"), len(bands) - 1)
+        field_points = np.where(np.isnan(values), 0, points[idx])
+        parts[field] = field_points
+        total += field_points
+        max_part = np.maximum(max_part, field_points)
+    return total, max_part, parts
+
+
+async def _canonical(handles):
+    """Snapshots are keyed by patient id; readings and beds may carry the mobile instead."""
+    found = await principal_ids(handles)
+    return {h: found.get(h, h) for h in handles}
+
+
+async def record(reading, patient_id=None):
+    """Merge one vitals document (vitals_store.to_document) into the patient's snapshot and rescore."""
+    if patient_id is None:
+        patient_id = (await _canonical([reading["patient_id"]]))[reading["patient_id"]]
+    fields = {f: reading[f] for f in SNAPSHOT_FIELDS if reading.get(f) is not None}
+    at = reading["created_at"]
+    try:
+        snapshot = await vitals_latest_collection.find_one_and_update(
+            {"_id": patient_id, "$or": [{"created_at": {"$lte": at}}, {"created_at": None}]},
+            {"$set": {**fields, "created_at": at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return None  # older than the snapshot: history only
+    scored = score(snapshot)
+    # Only write the score if no newer reading landed in between
+    await vitals_latest_collection.update_one(
+        {"_id": snapshot["_id"], "created_at": snapshot["created_at"]},
+        {"$set": {**scored, "scored_at": datetime.utcnow()}},
+    )
+    return scored
+
+
+async def record_many(readings):
+    """Bulk ingest: merge each patient's readings in time order, then one bulk_write of scored snapshots."""
+    if not readings:
+        return
+    ids = await _canonical({r["patient_id"] for r in readings})
+    merged = {}
+    for reading in sorted(readings, key=lambda r: r["created_at"]):
+        current = merged.setdefault(ids[reading["patient_id"]], {})
+        current.update({f: reading[f] for f in SNAPSHOT_FIELDS if reading.get(f) is not None})
+        current["created_at"] = reading["created_at"]
+
+    snapshots = await vitals_latest_collection.find({"_id": {"$in": list(merged)}}).to_list()
+    snapshots = {doc["_id"]: doc for doc in snapshots}
+    ops, keys = [], []
+    for patient_id, fields in merged.items():
+        snapshot = snapshots.get(patient_id, {})
+        seen_at = snapshot.get("created_at")
+        if seen_at and seen_at > fields["created_at"]:
+            continue  # older than the snapshot: history only
+        # Scored from the snapshot read above; only written if it is still that snapshot
+        ops.append(UpdateOne(
+            {"_id": patient_id, "created_at": seen_at},
+            {"$set": {**fields, **score({**snapshot, **fields}), "scored_at": datetime.utcnow()}},
+            upsert=True,
+        ))
+        keys.append(patient_id)
+    if not ops:
+        return
+    try:
+        await vitals_latest_collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # The snapshot moved since it was read (the upsert then hits the _id): merge those one by one
+        for err in e.details.get("writeErrors", []):
+            if err.get("code") != 11000:
+                raise
+            patient_id = keys[err["index"]]
+            await record({**merged[patient_id], "patient_id": patient_id}, patient_id)
+
+
+async def set_ward(patient_id, ward, bed=None):
+    """Called by bed allocation / release."""
+    patient_id = (await _canonical([patient_id]))[patient_id]
+    await vitals_latest_collection.update_one(
+        {"_id": patient_id},
+        {"$set": {"ward": ward, "bed": bed}, "$setOnInsert": {"news2": None}},
+        upsert=True,
+    )
+
+
+def _board_entry(doc):
+    return {
+        "patientId": doc["_id"],
+        "bed": doc.get("bed"),
+        "news2": doc.get("news2"),
+        "risk": doc.get("risk"),
+        "parts": doc.get("news2_parts", {}),
+        "missing": doc.get("missing", list(NEWS2_BANDS)),
+        "vitals": {f: doc.get(f) for f in SNAPSHOT_FIELDS},
+        "recordedAt": doc.get("created_at"),
+    }
+
+
+async def ward_board(ward):
+    """Every patient in the ward, highest score first (patients without vitals last)."""
+    cursor = vitals_latest_collection.find({"ward": ward}).sort("news2", -1)
+    return [_board_entry(doc) async for doc in cursor]
+
+
+async def recompute(batch_size=5000):
+    """Rescore every snapshot with the current NEWS2_BANDS. Returns how many changed."""
+    docs = await vitals_latest_collection.find(
+        {"created_at": {"$ne": None}}, {f: 1 for f in list(NEWS2_BANDS) + ["news2", "created_at"]}
+    ).to_list()
+    if not docs:
+        return 0
+    columns = {
+        field: np.array([d.get(field) if d.get(field) is not None else np.nan for d in docs], dtype=np.float64)
+        for field in NEWS2_BANDS
+    }
+    total, max_part, parts = score_arrays(columns)
+    missing = {field: np.isnan(values) for field, values in columns.items()}
+
+    changed = 0
+    ops = []
+    for i, doc in enumerate(docs):
+        ops.append(UpdateOne(
+            {"_id": doc["_id"], "created_at": doc["created_at"]},
+            {"$set": {
+                "news2": int(total[i]),
+                "news2_parts": {f: int(parts[f][i]) for f in NEWS2_BANDS if not missing[f][i]},
+                "risk": risk(int(total[i]), int(max_part[i])),
+                "missing": [f for f in NEWS2_BANDS if missing[f][i]],
+                "scored_at": datetime.utcnow(),
+            }},
+        ))
+        if len(ops) >= batch_size:
+            changed += (await vitals_latest_collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        changed += (await vitals_latest_collection.bulk_write(ops, ordered=False)).modified_count
+    return changed
+
+
+async def rebuild():
+    """Snapshot = last reading per patient from vitals history; ward/bed from occupied beds."""
+    group = {"_id": "$patient_id", "created_at": {"$last": "$created_at"}}
+    for field in SNAPSHOT_FIELDS:
+        group[field] = {"$last": f"${field}"}
+    await vitals_collection.aggregate([
+        {"$sort": {"patient_id": 1, "created_at": 1}},
+        {"$group": group},
+        # Readings filed under a mobile join the patient id's snapshot
+        {"$lookup": {"from": identities_collection.name, "localField": "_id", "foreignField": "_id", "as": "identity"}},
+        {"$set": {"_id": {"$ifNull": [{"$first": "$identity.principal_id"}, "$_id"]}}},
+        {"$sort": {"_id": 1, "created_at": 1}},
+        {"$group": group | {"_id": "$_id"}},
+        {"$merge": {"into": "vitals_latest", "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ])
+    async for bed in db["beds"].find({"state": "occupied"}, {"patientId": 1, "ward": 1, "bed": 1}):
+        await set_ward(bed["patientId"], bed["ward"], bed["bed"])
+    return await recompute()
@@ -0,0 +1,58 @@
+"""
+Conditional GET support (ETag / If-None-Match).
+
+Every cacheable resource has a version stamp in `resource_versions`,
+bumped by the write paths that change it. The ETag is derived from the
+stamp alone, so a revalidation costs one _id point read and a 304 skips
+the real query and serialization entirely.
+
+    @router.get("/{patient_id}", dependencies=[conditional("patient:{patient_id}")])
+"""
+import zlib
+from fastapi import Depends, HTTPException, Request, Response
+from pymongo import UpdateOne
+from database import db
+
+versions_collection = db["resource_versions"]
+
+
+async def bump(*keys):
+    """Mark resources as changed. Call after the write succeeds."""
+    keys = [k for k in keys if k]
+    if not keys:
+        return
+    await versions_collection.bulk_write(
+        [UpdateOne({"_id": k}, {"$inc": {"v": 1}}, upsert=True) for k in keys],
+        ordered=False,
+    )
+
+
+async def current_etag(key, variant=""):
+    doc = await versions_collection.find_one({"_id": key}, {"v": 1})
+    etag = f"{key}:{doc['v'] if doc else 0}"
+    if variant:
+        # different pages / selections of the same resource
+        etag += f":{zlib.crc32(variant.encode()):08x}"
+    return f'W/"{etag}"'
+
+
+def _matches(header, etag):
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+def conditional(key_template):
+    """Route dependency: sets ETag and answers 304 when If-None-Match matches.
+
+    `key_template` is formatted with the route's path params.
+    """
+    async def dependency(request: Request, response: Response):
+        etag = await current_etag(key_template.format(**request.path_params), request.url.query)
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+    return Depends(dependency)
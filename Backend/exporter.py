@@ -0,0 +1,212 @@
+"""Incremental Parquet export of vitals, lab reports, prescriptions and appointments (resumes from `export_state`)."""
+import asyncio
+import json
+import os
+from datetime import datetime
+from bson import ObjectId
+import pyarrow as pa
+import pyarrow.parquet as pq
+from database import (
+    db, vitals_collection, lab_report_collection, prescription_collection,
+    appointments_collection,
+)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+export_state_collection = db["export_state"]
+
+
+def _schema(**columns):
+    return pa.schema([("_id", pa.string()), *columns.items(), ("extra", pa.string())])
+
+
+TIME = pa.timestamp("ms")
+SCHEMAS = {
+    "vitals": _schema(
+        patient_id=pa.string(), created_at=TIME, heart_rate=pa.float64(), blood_pressure=pa.string(),
+        bp_systolic=pa.float64(), bp_diastolic=pa.float64(), temperature=pa.float64(), spo2=pa.float64(),
+        respiration_rate=pa.float64(), blood_sugar=pa.float64(),
+    ),
+    "lab_report": _schema(
+        reportId=pa.string(), patientId=pa.string(), patientName=pa.string(), testName=pa.string(),
+        technician=pa.string(), bp=pa.string(), bloodSugar=pa.string(), temperature=pa.string(),
+        pulse=pa.string(), metrics=pa.string(), remarks=pa.string(), reportUploaded=pa.bool_(),
+        createdAt=TIME, analytes=pa.string(),
+    ),
+    "prescriptions": _schema(
+        patientId=pa.string(), patientName=pa.string(), doctorName=pa.string(), doctorRole=pa.string(),
+        doctorDepartment=pa.string(), disease=pa.string(), medications=pa.string(), timestamp=TIME,
+    ),
+    "appointments": _schema(
+        patient_id=pa.string(), patient_name=pa.string(), doctor_id=pa.string(), doctor_name=pa.string(),
+        date=pa.string(), reason=pa.string(), mobilenumber=pa.string(), status=pa.string(),
+        is_emergency=pa.bool_(), token_number=pa.int64(), created_at=TIME, is_ipd=pa.bool_(),
+        ward_no=pa.string(), bed_no=pa.string(), discharge_date=pa.string(), admin_confirmed_at=pa.string(),
+    ),
+}
+
+# name -> (collection, field holding the row's date)
+EXPORTS = {
+    "vitals": (vitals_collection, "created_at"),
+    "lab_report": (lab_report_collection, "createdAt"),
+    "prescriptions": (prescription_collection, "timestamp"),
+    "appointments": (appointments_collection, "created_at"),
+}
+
+_running = asyncio.Lock()
+
+
+def _flatten(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _cell(value, type_):
+    """Value coerced to the column type. Raises TypeError / ValueError when it does not fit."""
+    if value is None:
+        return None
+    if pa.types.is_timestamp(type_):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if pa.types.is_boolean(type_):
+        if not isinstance(value, bool):
+            raise TypeError(value)
+        return value
+    if pa.types.is_integer(type_):
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(value)
+        return int(value)
+    if pa.types.is_floating(type_):
+        if isinstance(value, bool):
+            raise TypeError(value)
+        return float(value)
+    return str(_flatten(value))
+
+
+def to_row(doc, schema):
+    """Every column of the schema; fields outside it, or values that do not fit, go to `extra` as JSON."""
+    row, extra = {}, {}
+    for key, value in doc.items():
+        if key in schema.names and key != "extra":
+            try:
+                row[key] = _cell(value, schema.field(key).type)
+                continue
+            except (TypeError, ValueError):
+                pass
+        extra[key] = _flatten(value)
+    row["extra"] = json.dumps(extra, default=str) if extra else None
+    return row
+
+
+def _partition(doc, date_field):
+    value = doc.get(date_field)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = None
+    if not isinstance(value, datetime):
+        value = doc["_id"].generation_time if isinstance(doc.get("_id"), ObjectId) else None
+    return value.strftime("%Y-%m-%d") if value else "unknown"
+
+
+def _write_batch(name, rows_by_date, run_id, batch_no):
+    """Runs in a worker thread: Arrow conversion and Parquet encoding are CPU bound."""
+    written = 0
+    for date, rows in rows_by_date.items():
+        folder = os.path.join(EXPORT_DIR, name, f"date={date}")
+        os.makedirs(folder, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=SCHEMAS[name])
+        pq.write_table(table, os.path.join(folder, f"part-{run_id}-{batch_no:05d}.parquet"))
+        written += len(rows)
+    return written
+
+
+def _resume_mark(state):
+    mark = state.get("mark")
+    if isinstance(mark, datetime):
+        # Saved before vitals switched from created_at to _id marks
+        return ObjectId.from_datetime(mark)
+    return mark
+
+
+async def export_collection(name, batch_size=EXPORT_BATCH_SIZE):
+    collection, date_field = EXPORTS[name]
+    schema = SCHEMAS[name]
+    state = await export_state_collection.find_one({"_id": name}) or {}
+    mark = _resume_mark(state)
+    query = {"_id": {"$gt": mark}} if mark is not None else {}
+
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    cursor = collection.find(query).sort("_id", 1).batch_size(batch_size).allow_disk_use(True)
+
+    exported = 0
+    batch_no = 0
+    rows_by_date = {}
+    pending = 0
+
+    async def flush():
+        nonlocal exported, batch_no, rows_by_date, pending
+        exported += await asyncio.to_thread(_write_batch, name, rows_by_date, run_id, batch_no)
+        await export_state_collection.update_one(
+            {"_id": name},
+            {"$set": {"mark": mark, "updated_at": datetime.utcnow()}, "$inc": {"rows": pending}},
+            upsert=True,
+        )
+        batch_no += 1
+        rows_by_date = {}
+        pending = 0
+
+    async for doc in cursor:
+        rows_by_date.setdefault(_partition(doc, date_field), []).append(to_row(doc, schema))
+        mark = doc["_id"]
+        pending += 1
+        if pending >= batch_size:
+            await flush()
+    if pending:
+        await flush()
+    return exported
+
+
+async def _export(names):
+    results = {}
+    for name in names or EXPORTS:
+        results[name] = await export_collection(name)
+    return results
+
+
+async def run_export(names=None):
+    """Export the given collections (default all). Returns rows written per collection."""
+    async with _running:
+        return await _export(names)
+
+
+_tasks = set()
+
+
+async def _run_locked(names):
+    try:
+        await _export(names)
+    except Exception as e:
+        print(f"⚠️ Export failed: {e}")
+    finally:
+        _running.release()
+
+
+async def start_export(names=None):
+    """Start an export in the background. Returns False, without waiting, if one is running."""
+    if _running.locked():
+        return False
+    # A free asyncio.Lock is taken without yielding, so no other request can get in between
+    await _running.acquire()
+    task = asyncio.create_task(_run_locked(names))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+
+def is_running():
+    return _running.locked()
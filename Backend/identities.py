@@ -0,0 +1,152 @@
+"""Login-identity index: `identities` maps every login handle to its principal {_id: handle, role, collection, ref, principal_id}."""
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database import db, users_collection, doctors_collection, admin_collection, staff_collection
+
+identities_collection = db["identities"]
+
+
+def _identity(handle, role, collection, ref, principal_id):
+    return {
+        "_id": handle,
+        "role": role,
+        "collection": collection.name,
+        "ref": ref,
+        "principal_id": principal_id,
+    }
+
+
+async def claim(ids, contacts, role, collection, ref, principal_id):
+    """Claim handles for a principal that is about to be inserted with _id=ref.
+
+    Raises DuplicateKeyError (after undoing its own claims) if any ID handle is
+    taken. Contact handles are first-come and never block a registration.
+    """
+    try:
+        for handle in ids:
+            await identities_collection.insert_one(_identity(handle, role, collection, ref, principal_id))
+    except DuplicateKeyError:
+        await release(ref)
+        raise
+    for handle in contacts:
+        if handle:
+            await identities_collection.update_one(
+                {"_id": handle},
+                {"$setOnInsert": _identity(handle, role, collection, ref, principal_id)},
+                upsert=True,
+            )
+
+
+async def claim_many(claims):
+    """Batch form of claim() for bulk import.
+
+    claims: list of (ids, contacts, role, collection, ref, principal_id).
+    One unordered insert_many for all ID handles, one bulk upsert for the
+    contacts. Returns the set of refs whose ID handle was taken (their other
+    claims are undone).
+    """
+    docs = [
+        _identity(handle, role, collection, ref, principal_id)
+        for ids, _, role, collection, ref, principal_id in claims
+        for handle in ids
+    ]
+    failed = set()
+    if docs:
+        try:
+            await identities_collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                if err.get("code") != 11000:
+                    raise
+                failed.add(docs[err["index"]]["ref"])
+    if failed:
+        await release_many(failed)
+
+    ops = [
+        UpdateOne(
+            {"_id": handle},
+            {"$setOnInsert": _identity(handle, role, collection, ref, principal_id)},
+            upsert=True,
+        )
+        for _, contacts, role, collection, ref, principal_id in claims
+        if ref not in failed
+        for handle in contacts if handle
+    ]
+    if ops:
+        try:
+            await identities_collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent upsert of the same contact: first come wins, as in claim()
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+    return failed
+
+
+async def release(ref):
+    """Drop every handle pointing at a principal (e.g. its insert failed)."""
+    await identities_collection.delete_many({"ref": ref})
+
+
+async def release_many(refs):
+    await identities_collection.delete_many({"ref": {"$in": list(refs)}})
+
+
+async def existing(handles):
+    """The subset of `handles` that are already claimed."""
+    docs = await identities_collection.find({"_id": {"$in": list(handles)}}, {"_id": 1}).to_list()
+    return {doc["_id"] for doc in docs}
+
+
+async def principal_ids(handles):
+    """{handle: principal_id} for the claimed handles among `handles`."""
+    docs = await identities_collection.find({"_id": {"$in": list(handles)}}, {"principal_id": 1}).to_list()
+    return {doc["_id"]: doc["principal_id"] for doc in docs}
+
+
+async def exists(handle):
+    return await identities_collection.find_one({"_id": handle}, {"_id": 1}) is not None
+
+
+async def resolve(handle, projection=None):
+    """Returns (identity, principal document) or (None, None)."""
+    identity = await identities_collection.find_one({"_id": handle})
+    if not identity:
+        return None, None
+    principal = await db[identity["collection"]].find_one({"_id": identity["ref"]}, projection)
+    return identity, principal
+
+
+# (collection, role or None to read it from the doc, id fields, contact fields)
+# Order matters: earlier sources win when a handle is shared.
+_SOURCES = [
+    (users_collection, None, ["user_id", "userId"], ["mobile"]),
+    (doctors_collection, "doctor", ["doctorId"], ["contact"]),
+    (admin_collection, "admin", ["adminId"], []),
+    (staff_collection, "staff", ["staffId"], []),
+]
+
+
+async def backfill(batch_size=1000):
+    """Index every existing principal. Existing handles are left untouched."""
+    indexed = 0
+    for collection, role, id_fields, contact_fields in _SOURCES:
+        projection = {f: 1 for f in id_fields + contact_fields + ["role"]}
+        ops = []
+        async for doc in collection.find({}, projection):
+            principal_id = next((doc[f] for f in id_fields if doc.get(f)), None)
+            if principal_id is None:
+                continue
+            doc_role = role or doc.get("role", "patient")
+            for field in id_fields + contact_fields:
+                if doc.get(field):
+                    ops.append(UpdateOne(
+                        {"_id": doc[field]},
+                        {"$setOnInsert": _identity(doc[field], doc_role, collection, doc["_id"], principal_id)},
+                        upsert=True,
+                    ))
+            if len(ops) >= batch_size:
+                indexed += (await identities_collection.bulk_write(ops, ordered=False)).upserted_count
+                ops = []
+        if ops:
+            indexed += (await identities_collection.bulk_write(ops, ordered=False)).upserted_count
+    return indexed
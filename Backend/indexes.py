@@ -0,0 +1,170 @@
+"""
+Declared indexes for every collection.
+
+Applied idempotently on startup (see main.py lifespan) or from the CLI:
+    python manage.py indexes            # create any missing indexes
+    python manage.py indexes --check    # also explain() the router queries, fail on COLLSCAN
+"""
+import re
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from database import db
+from discharge_queue import DISCHARGE_TOMBSTONE_TTL
+
+INDEXES = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+        IndexModel([("mobile", ASCENDING)], name="mobile_1"),
+        IndexModel([("userId", ASCENDING)], name="userId_1", sparse=True),
+        IndexModel([("phone", ASCENDING)], name="phone_1", sparse=True),
+        # patient_search: multikey over name / phonetic / phone / ID terms
+        IndexModel([("search_terms", ASCENDING)], name="search_terms_1", sparse=True),
+    ],
+    "doctors": [
+        IndexModel([("doctorId", ASCENDING)], name="doctorId_1"),
+        IndexModel([("contact", ASCENDING)], name="contact_1"),
+    ],
+    "admins": [
+        IndexModel([("adminId", ASCENDING)], name="adminId_1"),
+    ],
+    "appointments": [
+        # count per doctor/day + today's queue sorted emergency-first
+        IndexModel(
+            [("doctor_id", ASCENDING), ("date", ASCENDING),
+             ("is_emergency", DESCENDING), ("created_at", ASCENDING)],
+            name="doctor_date_queue",
+        ),
+        IndexModel(
+            [("doctor_id", ASCENDING), ("is_ipd", ASCENDING), ("status", ASCENDING)],
+            name="doctor_ipd_status",
+        ),
+    ],
+    "admission": [
+        IndexModel([("admissionId", ASCENDING)], name="admissionId_1"),
+        IndexModel([("ward", ASCENDING)], name="ward_1"),
+    ],
+    "staff": [
+        IndexModel([("staffId", ASCENDING)], name="staffId_1"),
+    ],
+    "pharmacy": [
+        IndexModel([("medicineName", ASCENDING), ("batchNumber", ASCENDING)], name="medicine_batch"),
+        # FEFO pick and expiry report only look at batches with stock left
+        IndexModel(
+            [("medicineName", ASCENDING), ("expiresAt", ASCENDING)],
+            name="medicine_fefo", partialFilterExpression={"stockQty": {"$gt": 0}},
+        ),
+        IndexModel(
+            [("expiresAt", ASCENDING)],
+            name="expiring_in_stock", partialFilterExpression={"stockQty": {"$gt": 0}},
+        ),
+        # Expiry sweep: batches still counted in medicine_stock totals
+        IndexModel([("expiresAt", ASCENDING)], name="in_total_expiry", partialFilterExpression={"inTotal": True}),
+    ],
+    "medicine_stock": [
+        IndexModel([("belowReorder", ASCENDING), ("totalQty", ASCENDING)], name="below_reorder"),
+    ],
+    "stock_ledger": [
+        IndexModel([("medicineName", ASCENDING), ("at", DESCENDING)], name="medicine_at"),
+    ],
+    "lab_report": [
+        IndexModel([("patientId", ASCENDING)], name="patientId_1"),
+    ],
+    "lab_results": [
+        IndexModel([("code", ASCENDING), ("at", ASCENDING), ("value", ASCENDING)], name="code_at_value"),
+        IndexModel([("patientId", ASCENDING), ("code", ASCENDING), ("at", ASCENDING)], name="patient_code_at"),
+    ],
+    "prescriptions": [
+        IndexModel([("patientId", ASCENDING)], name="patientId_1"),
+    ],
+    "vitals_ts": [
+        IndexModel([("patient_id", ASCENDING), ("created_at", DESCENDING)], name="patient_created_at"),
+        # Time-series collections have no _id index; the exporter resumes on an _id range
+        IndexModel([("_id", ASCENDING)], name="export_id"),
+    ],
+    "vitals_latest": [
+        IndexModel([("ward", ASCENDING), ("news2", DESCENDING)], name="ward_news2"),
+    ],
+    "discharge_queue": [
+        IndexModel(
+            [("state", ASCENDING), ("ward_no", ASCENDING), ("discharge_date", ASCENDING)],
+            name="state_ward_date",
+        ),
+        IndexModel([("seq", ASCENDING)], name="seq_1"),
+        IndexModel([("removed_at", ASCENDING)], name="tombstone_ttl", expireAfterSeconds=DISCHARGE_TOMBSTONE_TTL),
+    ],
+    "beds": [
+        IndexModel([("patientId", ASCENDING), ("state", ASCENDING)], name="patient_state"),
+    ],
+    "identities": [
+        IndexModel([("ref", ASCENDING)], name="ref_1"),
+    ],
+}
+
+# Representative filter/sort for every query the routers issue.
+# (collection, filter, sort) -- count_documents is checked through its filter.
+ROUTER_QUERIES = [
+    ("users", {"userId": "x"}, None),
+    ("users", {"user_id": "x"}, None),
+    ("users", {"phone": "x"}, None),
+    ("users", {"search_terms": {"$in": [re.compile("^n:ram"), re.compile("^m:1144")]}}, None),
+    ("users", {"mobile": "x"}, None),
+    ("users", {"user_id": "x", "role": "patient"}, None),
+    ("users", {"$or": [{"user_id": "x"}, {"mobile": "x"}]}, None),
+    ("doctors", {"doctorId": "x"}, None),
+    ("doctors", {"contact": "x"}, None),
+    ("admins", {"adminId": "x"}, None),
+    ("appointments", {"doctor_id": "x", "date": "2024-01-01"}, None),
+    ("appointments", {"doctor_id": "x", "date": "2024-01-01"}, [("is_emergency", -1), ("created_at", 1)]),
+    ("appointments", {"doctor_id": "x", "is_ipd": True, "status": "Admitted"}, None),
+    ("admission", {"admissionId": "x"}, None),
+    ("admission", {"ward": "x"}, None),
+    ("staff", {"staffId": "x"}, None),
+    ("lab_results", {"code": "x", "at": {"$gte": 0}, "value": {"$gte": 200}}, [("at", -1)]),
+    ("lab_results", {"patientId": "x", "code": {"$in": ["x"]}, "at": {"$gte": 0}}, [("code", 1), ("at", 1)]),
+    ("pharmacy", {"medicineName": "x", "batchNumber": "x"}, None),
+    ("pharmacy", {"medicineName": "x", "stockQty": {"$gt": 0}, "expiresAt": {"$gt": 0}}, [("expiresAt", 1)]),
+    ("pharmacy", {"expiresAt": {"$lte": 0}, "stockQty": {"$gt": 0}}, [("expiresAt", 1)]),
+    ("pharmacy", {"inTotal": True, "expiresAt": {"$lte": 0}}, None),
+    ("medicine_stock", {"belowReorder": True}, [("totalQty", 1)]),
+    ("lab_report", {"patientId": "x"}, None),
+    ("prescriptions", {"patientId": "x"}, None),
+    ("vitals_ts", {"patient_id": "x"}, [("created_at", -1)]),
+    ("vitals_ts", {"_id": {"$gt": ObjectId("000000000000000000000000")}}, [("_id", 1)]),  # POST /admin/exports/run
+    ("vitals_latest", {"ward": "x"}, [("news2", -1)]),
+    ("identities", {"ref": "x"}, None),
+    ("beds", {"patientId": "x", "state": "occupied"}, None),
+    ("discharge_queue", {"state": "pending", "ward_no": "x"}, [("discharge_date", 1), ("seq", 1)]),
+    ("discharge_queue", {"seq": {"$gt": 0}}, [("seq", 1)]),
+]
+
+
+async def sync_indexes():
+    """Create any declared index that is missing. Safe to run repeatedly."""
+    for name, models in INDEXES.items():
+        await db[name].create_indexes(models)
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def find_collscans():
+    """explain() every router query and return the ones whose winning plan scans the collection."""
+    offenders = []
+    for name, filter_, sort in ROUTER_QUERIES:
+        cursor = db[name].find(filter_)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        # Time-series (and other view) queries explain as a pipeline over the underlying collection
+        planner = explain.get("queryPlanner") or explain["stages"][0]["$cursor"]["queryPlanner"]
+        winning = planner["winningPlan"]
+        # SBE plans nest the classic tree under queryPlan
+        winning = winning.get("queryPlan", winning)
+        if "COLLSCAN" in _stages(winning):
+            offenders.append((name, filter_, sort))
+    return offenders
@@ -0,0 +1,171 @@
+"""Lab report free text parsed into numeric analytes (code, canonical value, L/N/H flag) in `lab_results`."""
+import re
+from datetime import datetime
+from pymongo import UpdateOne
+from database import db, lab_report_collection
+from etags import bump
+
+lab_results_collection = db["lab_results"]
+
+# code -> (label, canonical unit, reference low, reference high, aliases)
+ANALYTES = {
+    "bp_systolic": ("Systolic BP", "mmHg", 90, 139, ["systolic", "sbp"]),
+    "bp_diastolic": ("Diastolic BP", "mmHg", 60, 89, ["diastolic", "dbp"]),
+    "blood_sugar": ("Blood glucose (random)", "mg/dL", 70, 140,
+                    ["blood sugar", "sugar", "rbs", "random blood sugar", "glucose", "blood glucose"]),
+    "fasting_glucose": ("Fasting glucose", "mg/dL", 70, 100,
+                        ["fbs", "fasting sugar", "fasting glucose", "fasting blood sugar", "fbg"]),
+    "pp_glucose": ("Post-prandial glucose", "mg/dL", 70, 140, ["ppbs", "pp sugar", "post prandial", "ppbg"]),
+    "hba1c": ("HbA1c", "%", 4.0, 5.6, ["hba1c", "a1c", "glycated hemoglobin"]),
+    "temperature": ("Temperature", "°C", 36.1, 37.2, ["temp", "temperature"]),
+    "pulse": ("Pulse", "bpm", 60, 100, ["pulse", "heart rate", "hr"]),
+    "spo2": ("SpO2", "%", 95, 100, ["spo2", "oxygen saturation", "o2 sat"]),
+    "hemoglobin": ("Hemoglobin", "g/dL", 12.0, 17.5, ["hb", "hgb", "hemoglobin", "haemoglobin"]),
+    "wbc": ("WBC", "10^3/µL", 4.0, 11.0, ["wbc", "tlc", "total leucocyte count", "white blood cells"]),
+    "platelets": ("Platelets", "10^3/µL", 150, 450, ["platelets", "plt", "platelet count"]),
+    "creatinine": ("Creatinine", "mg/dL", 0.6, 1.3, ["creatinine", "s creatinine", "serum creatinine"]),
+    "urea": ("Urea", "mg/dL", 15, 40, ["urea", "blood urea"]),
+    "cholesterol": ("Total cholesterol", "mg/dL", 0, 200, ["cholesterol", "total cholesterol", "tc"]),
+    "ldl": ("LDL", "mg/dL", 0, 100, ["ldl", "ldl cholesterol"]),
+    "hdl": ("HDL", "mg/dL", 40, 200, ["hdl", "hdl cholesterol"]),
+    "triglycerides": ("Triglycerides", "mg/dL", 0, 150, ["triglycerides", "tg", "trigs"]),
+    "tsh": ("TSH", "mIU/L", 0.4, 4.0, ["tsh"]),
+    "sodium": ("Sodium", "mmol/L", 135, 145, ["sodium", "na"]),
+    "potassium": ("Potassium", "mmol/L", 3.5, 5.1, ["potassium", "k"]),
+}
+
+_ALIASES = {alias: code for code, spec in ANALYTES.items() for alias in spec[4]}
+_GLUCOSE = {"blood_sugar", "fasting_glucose", "pp_glucose"}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# Only the unit right after the number: "98.6 F", "98.6°F", "99 fahrenheit" (not "37.5 C (after fever)")
+_FAHRENHEIT = re.compile(r"°?\s*f(ahrenheit)?\b")
+# "Hb: 13.2 g/dL", "FBS=210", "HbA1c 7.2%", "Platelets - 250"
+_METRIC = re.compile(r"^\s*([A-Za-z][A-Za-z0-9 .()]*?)\s*[:=\-]?\s*(-?\d+(?:\.\d+)?)\s*([^\s,;]*)\s*$")
+
+
+def _alias(name):
+    return re.sub(r"[^a-z0-9 ]", "", name.lower()).strip()
+
+
+def flag(code, value):
+    _, _, low, high, _ = ANALYTES[code]
+    if value < low:
+        return "L"
+    if value > high:
+        return "H"
+    return "N"
+
+
+def _normalize(code, value, unit):
+    """Convert to the catalog unit where the input unit (or magnitude) says otherwise."""
+    unit = (unit or "").lower()
+    if code in _GLUCOSE and "mmol" in unit:
+        return round(value * 18.0, 1)
+    if code == "temperature" and (_FAHRENHEIT.match(unit) or value > 45):
+        return round((value - 32) * 5 / 9, 1)
+    return value
+
+
+def _analyte(code, value, unit=None):
+    value = _normalize(code, float(value), unit)
+    return {"code": code, "value": value, "unit": ANALYTES[code][1], "flag": flag(code, value)}
+
+
+def _first_number(text):
+    match = _NUMBER.search(str(text or ""))
+    return (float(match.group()), str(text)[match.end():].strip()) if match else (None, None)
+
+
+def parse_metrics(text):
+    """Free-text metrics -> analytes for every recognised 'name value [unit]' part."""
+    out = []
+    for part in re.split(r"[,;\n]+", text or ""):
+        match = _METRIC.match(part)
+        if not match:
+            continue
+        code = _ALIASES.get(_alias(match.group(1)))
+        if code:
+            out.append(_analyte(code, match.group(2), match.group(3)))
+    return out
+
+
+def extract(report):
+    """Analytes from a lab report document (LabReportCreate fields)."""
+    out = []
+    bp = _NUMBER.findall(str(report.get("bp") or ""))
+    if len(bp) >= 2:
+        out.append(_analyte("bp_systolic", bp[0]))
+        out.append(_analyte("bp_diastolic", bp[1]))
+
+    sugar, unit = _first_number(report.get("bloodSugar"))
+    if sugar is not None:
+        test = (report.get("testName") or "").lower()
+        code = "fasting_glucose" if "fast" in test or "fbs" in test else \
+            "pp_glucose" if "pp" in test or "prandial" in test else "blood_sugar"
+        out.append(_analyte(code, sugar, unit))
+
+    for field, code in (("temperature", "temperature"), ("pulse", "pulse")):
+        value, unit = _first_number(report.get(field))
+        if value is not None:
+            out.append(_analyte(code, value, unit))
+
+    # Metrics win over the fixed fields when both report the same analyte
+    parsed = {a["code"]: a for a in out}
+    for analyte in parse_metrics(report.get("metrics")):
+        parsed[analyte["code"]] = analyte
+    return list(parsed.values())
+
+
+def _reported_at(report):
+    value = report.get("createdAt")
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return report["_id"].generation_time.replace(tzinfo=None)
+
+
+def result_documents(report, analytes):
+    at = _reported_at(report)
+    return [{
+        "patientId": report["patientId"],
+        "reportId": report["reportId"],
+        "at": at,
+        **analyte,
+    } for analyte in analytes]
+
+
+async def record(report):
+    """Parse a freshly inserted report and store its analytes. Returns them."""
+    analytes = extract(report)
+    if analytes:
+        await lab_results_collection.insert_many(result_documents(report, analytes))
+    await lab_report_collection.update_one({"_id": report["_id"]}, {"$set": {"analytes": analytes}})
+    return analytes
+
+
+async def _write_batch(ops, results, patients):
+    if results:
+        await lab_results_collection.insert_many(results, ordered=False)
+    parsed = (await lab_report_collection.bulk_write(ops, ordered=False)).modified_count
+    await bump(*{f"lab_reports:{p}" for p in patients})
+    return parsed
+
+
+async def backfill(batch_size=500):
+    parsed = 0
+    ops, results, patients = [], [], set()
+    cursor = lab_report_collection.find({"analytes": {"$exists": False}})
+    async for report in cursor:
+        analytes = extract(report)
+        results.extend(result_documents(report, analytes))
+        ops.append(UpdateOne({"_id": report["_id"]}, {"$set": {"analytes": analytes}}))
+        patients.add(report.get("patientId"))
+        if len(ops) >= batch_size:
+            parsed += await _write_batch(ops, results, patients)
+            ops, results, patients = [], [], set()
+    if ops:
+        parsed += await _write_batch(ops, results, patients)
+    return parsed
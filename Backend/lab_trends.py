@@ -0,0 +1,119 @@
+"""
+Vectorized trend and reference-range analysis over `lab_results`.
+
+Results are pulled with an indexed query into NumPy arrays once; slopes,
+flags and per-bucket statistics are then computed without Python loops
+over rows.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from lab_analytes import ANALYTES, lab_results_collection
+
+DAY = 86400.0
+BUCKETS = {"day": 1, "week": 7, "month": 30}
+
+
+def _epoch_days(times):
+    return np.array([t.timestamp() for t in times], dtype=np.float64) / DAY
+
+
+def flags(code, values):
+    """Vectorized L/N/H against the catalog reference range."""
+    _, _, low, high, _ = ANALYTES[code]
+    return np.where(values < low, "L", np.where(values > high, "H", "N"))
+
+
+def series_stats(code, times, values):
+    """Summary + least-squares slope (units per day) for one patient's series."""
+    values = np.asarray(values, dtype=np.float64)
+    days = _epoch_days(times)
+    f = flags(code, values)
+    slope = None
+    if len(values) >= 2 and np.ptp(days) > 0:
+        slope = float(np.polyfit(days - days[0], values, 1)[0])
+    label, unit, low, high, _ = ANALYTES[code]
+    return {
+        "code": code,
+        "label": label,
+        "unit": unit,
+        "reference": [low, high],
+        "count": int(len(values)),
+        "last": float(values[-1]),
+        "lastFlag": str(f[-1]),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": round(float(values.mean()), 2),
+        "slopePerDay": round(slope, 4) if slope is not None else None,
+        "abnormal": int(np.count_nonzero(f != "N")),
+        "points": [
+            {"at": t, "value": float(v), "flag": str(fl)} for t, v, fl in zip(times, values, f)
+        ],
+    }
+
+
+async def patient_trend(patient_id, codes=None, days=365):
+    since = datetime.now() - timedelta(days=days)
+    query = {"patientId": patient_id, "at": {"$gte": since}}
+    if codes:
+        query["code"] = {"$in": codes}
+    docs = await lab_results_collection.find(
+        query, {"_id": 0, "code": 1, "value": 1, "at": 1}
+    ).sort([("code", 1), ("at", 1)]).to_list()
+
+    by_code = {}
+    for doc in docs:
+        times, values = by_code.setdefault(doc["code"], ([], []))
+        times.append(doc["at"])
+        values.append(doc["value"])
+    return [series_stats(code, times, values) for code, (times, values) in by_code.items()]
+
+
+async def cohort_trend(code, days=90, bucket="week"):
+    """Per-bucket count / mean / median / p90 and abnormal share across all patients."""
+    since = datetime.now() - timedelta(days=days)
+    docs = await lab_results_collection.find(
+        {"code": code, "at": {"$gte": since}}, {"_id": 0, "patientId": 1, "value": 1, "at": 1}
+    ).to_list()
+    label, unit, low, high, _ = ANALYTES[code]
+    out = {"code": code, "label": label, "unit": unit, "reference": [low, high], "buckets": []}
+    if not docs:
+        out.update(count=0, patients=0, patientsAbnormal=0)
+        return out
+
+    values = np.fromiter((d["value"] for d in docs), dtype=np.float64, count=len(docs))
+    patients = np.array([d["patientId"] for d in docs])
+    width = BUCKETS[bucket]
+    idx = ((_epoch_days([d["at"] for d in docs]) - since.timestamp() / DAY) // width).astype(np.int64)
+    abnormal = flags(code, values) != "N"
+
+    # Sort by bucket then value so each bucket is a contiguous, sorted slice
+    order = np.lexsort((values, idx))
+    idx, sorted_values, sorted_abnormal = idx[order], values[order], abnormal[order]
+    starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    ends = np.r_[starts[1:], len(idx)]
+    for start, end in zip(starts, ends):
+        chunk = sorted_values[start:end]
+        out["buckets"].append({
+            "start": since + timedelta(days=int(idx[start]) * width),
+            "count": int(end - start),
+            "mean": round(float(chunk.mean()), 2),
+            "median": float(np.median(chunk)),
+            "p90": float(np.percentile(chunk, 90)),
+            "abnormalShare": round(float(sorted_abnormal[start:end].mean()), 3),
+        })
+    out["count"] = int(len(values))
+    out["patients"] = int(len(np.unique(patients)))
+    out["patientsAbnormal"] = int(len(np.unique(patients[abnormal])))
+    return out
+
+
+async def find_results(code, min_value=None, max_value=None, since=None, until=None, limit=500):
+    """Indexed range query on one analyte, newest first."""
+    query = {"code": code}
+    if since or until:
+        query["at"] = {k: v for k, v in (("$gte", since), ("$lte", until)) if v}
+    if min_value is not None or max_value is not None:
+        query["value"] = {k: v for k, v in (("$gte", min_value), ("$lte", max_value)) if v is not None}
+    return await lab_results_collection.find(
+        query, {"_id": 0, "patientId": 1, "reportId": 1, "value": 1, "unit": 1, "flag": 1, "at": 1}
+    ).sort("at", -1).limit(limit).to_list()
@@ -1,24 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import auth,doctors,appointments,admin,patient
+from routers import auth,doctors,appointments,admin,patient,pharmacy,labs,wards,analytics
+import database
+import passwords
+from serialization import ORJSONResponse
+from indexes import sync_indexes
+from vitals_store import ensure_collection as ensure_vitals_collection
+from queue_events import bus as queue_events
+import medicine_search
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-app = FastAPI(title="Med360 API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.ping()
+    await ensure_vitals_collection()
+    await sync_indexes()
+    await queue_events.start()
+    await medicine_search.start()
+    yield
+    await medicine_search.stop()
+    await queue_events.stop()
+    passwords.shutdown()
+    await database.close()
+
+
+app = FastAPI(title="Med360 API", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Sync-Token"],
 )
 
+@app.exception_handler(passwords.HashQueueFull)
+async def hash_queue_full(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"})
+
+
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(doctors.router)
 app.include_router(appointments.router)
 app.include_router(admin.router)
 app.include_router(patient.router)
+app.include_router(pharmacy.router)
+app.include_router(labs.router)
+app.include_router(wards.router)
+app.include_router(analytics.router)
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Med360 API running"}
 
 
@@ -0,0 +1,151 @@
+"""
+Maintenance commands: index sync, one-off migrations, rebuilds, exports and imports.
+
+    python manage.py --help
+"""
+import argparse
+import asyncio
+import sys
+import database
+import beds
+import bulk_import
+import capacity
+import discharge_queue
+import doctor_photos
+import early_warning
+import exporter
+import identities
+import indexes
+import lab_analytes
+import passwords
+import patient_search
+import rollups
+import stock
+import vitals_store
+from streams import parse_csv, parse_ndjson
+
+
+async def _migrate_vitals():
+    await vitals_store.ensure_collection()
+    return await vitals_store.migrate()
+
+
+# name -> (job, message formatted with its result)
+MIGRATIONS = {
+    # Copy legacy `vitals` into vitals_ts; re-runs resume after the last legacy _id
+    "vitals": (_migrate_vitals, "Copied {} vitals readings into " + database.VITALS_COLLECTION),
+    # Move base64 profile_pic fields into GridFS
+    "photos": (doctor_photos.migrate, "Moved {0[0]} profile pictures to GridFS ({0[1]} skipped)"),
+}
+
+REBUILDS = {
+    "capacity": (capacity.rebuild, "Rebuilt {} capacity documents"),
+    "beds": (beds.rebuild, "Placed {} current admissions"),
+    # Also needed once so batches received before inTotal existed are swept
+    "stock": (stock.rebuild, "Parsed {} expiry dates, medicine totals rebuilt"),
+    "rollups": (rollups.rebuild, "Rebuilt {} rollup buckets"),
+    "discharge-queue": (discharge_queue.rebuild, "Queued {} pending discharges"),
+    "early-warning": (early_warning.rebuild, "Rescored {} patients"),
+}
+
+BACKFILLS = {
+    "identities": (identities.backfill, "Indexed {} new login handles"),
+    "lab-analytes": (lab_analytes.backfill, "Parsed analytes for {} lab reports"),
+    "patient-search": (patient_search.backfill, "Indexed {} patients for search"),
+}
+
+
+def _job(table):
+    async def run(args):
+        job, message = table[args.target]
+        print(f"✅ {message.format(await job())}")
+    return run
+
+
+async def _rescore(args):
+    # After NEWS2_BANDS change
+    print(f"✅ Rescored {await early_warning.recompute()} patients")
+
+
+async def _indexes(args):
+    await indexes.sync_indexes()
+    print("✅ Indexes in sync")
+    if not args.check:
+        return 0
+    offenders = await indexes.find_collscans()
+    for name, filter_, sort in offenders:
+        print(f"❌ COLLSCAN on {name}: filter={filter_} sort={sort}")
+    return 1 if offenders else 0
+
+
+async def _export(args):
+    unknown = set(args.collections) - set(exporter.EXPORTS)
+    if unknown:
+        print(f"Unknown collection(s): {', '.join(sorted(unknown))}. Choose from {list(exporter.EXPORTS)}")
+        return 2
+    results = await exporter.run_export(args.collections or None)
+    for name, rows in results.items():
+        print(f"✅ {name}: {rows} rows exported")
+
+
+async def _file_lines(path):
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+async def _import(args):
+    lines = _file_lines(args.file)
+    records = parse_csv(lines) if args.file.lower().endswith(".csv") else parse_ndjson(lines)
+
+    def progress(job):
+        print(f"… {job.processed} rows read, {job.inserted} inserted, {job.failed} failed")
+
+    job = await bulk_import.run_import(args.kind, records, progress=progress)
+    for err in job.errors:
+        print(f"⚠️ row {err['row']}: {err['detail']}")
+    print(f"✅ {job.inserted} {args.kind} imported, {job.failed} rows failed")
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="manage.py", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("indexes", help="create missing indexes")
+    cmd.add_argument("--check", action="store_true", help="also explain() the router queries, fail on COLLSCAN")
+    cmd.set_defaults(run=_indexes)
+
+    for name, table, help_ in (
+        ("migrate", MIGRATIONS, "one-off data migrations"),
+        ("rebuild", REBUILDS, "recompute derived state from the source collections"),
+        ("backfill", BACKFILLS, "fill in fields on existing documents (idempotent)"),
+    ):
+        cmd = commands.add_parser(name, help=help_)
+        cmd.add_argument("target", choices=list(table))
+        cmd.set_defaults(run=_job(table))
+
+    cmd = commands.add_parser("rescore", help="rescore early-warning snapshots with the current NEWS2 bands")
+    cmd.set_defaults(run=_rescore)
+
+    cmd = commands.add_parser("export", help="Parquet export (default all collections)")
+    cmd.add_argument("collections", nargs="*", metavar="collection")
+    cmd.set_defaults(run=_export)
+
+    cmd = commands.add_parser("import", help="bulk import a CSV or NDJSON file")
+    cmd.add_argument("kind", choices=bulk_import.KINDS)
+    cmd.add_argument("file")
+    cmd.set_defaults(run=_import)
+    return parser
+
+
+async def _run(args):
+    try:
+        return await args.run(args) or 0
+    finally:
+        passwords.shutdown()
+        await database.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_run(_parser().parse_args())))
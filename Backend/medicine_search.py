@@ -0,0 +1,240 @@
+"""
+In-memory type-ahead index over the pharmacy catalog.
+
+Every medicine (one entry per medicineName, however many batches) is
+tokenized on medicineName, composition and category. Terms are kept in a
+sorted list, so a query word finds every term it is a prefix of with two
+bisects; each term has a posting map {entry: field weight}. Multi-word
+queries expand the most selective word and filter its candidates by the
+others ("para 500" -> paracetamol 500mg).
+
+Ranking: name starts with the query > name word match > composition >
+category, then shorter names first. Short prefixes (up to TOP_PREFIX
+characters) match a large part of the catalog, so their ranked top
+results are kept precomputed and patched as medicines are added.
+
+Built on startup from `pharmacy`; medicine-add updates it directly and a
+background refresh picks up inserts made by other workers. _ids come
+from the inserting worker's clock and commit out of order, so each refresh
+re-reads the last MEDICINE_INDEX_OVERLAP seconds of _ids before the
+highest one seen and skips those already indexed.
+"""
+import asyncio
+import heapq
+import os
+import re
+from bisect import bisect_left, insort
+from datetime import timedelta
+from bson import ObjectId
+from database import pharmacy_collection
+
+MEDICINE_INDEX_REFRESH = float(os.getenv("MEDICINE_INDEX_REFRESH", "30"))
+MEDICINE_INDEX_OVERLAP = float(os.getenv("MEDICINE_INDEX_OVERLAP", "120"))
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+# Prefixes up to this length keep a precomputed top list
+TOP_PREFIX = 5
+# Batches larger than this recompute touched top lists instead of patching them
+BULK_THRESHOLD = 200
+
+# field -> weight of a term found in it
+FIELD_WEIGHTS = {"medicineName": 3, "composition": 2, "category": 1}
+PROJECTION = {"medicineId": 1, "medicineName": 1, "composition": 1, "category": 1}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class MedicineIndex:
+    def __init__(self):
+        self.entries = []      # entry id -> output dict
+        self._keys = {}        # lowercased name -> entry id
+        self._names = []       # entry id -> lowercased name
+        self._entry_terms = [] # entry id -> {term: weight}
+        self._postings = {}    # term -> {entry id: weight}
+        self._terms = []       # sorted terms
+        self._new_terms = []   # added since the last merge into _terms
+        self._top = {}         # prefix (<= TOP_PREFIX chars) -> ranked entry ids
+        self._prefix_size = {} # prefix (<= TOP_PREFIX chars) -> postings under it
+        self.last_id = None    # highest pharmacy _id read by refresh()
+        self.recent_ids = set() # _ids read inside the current overlap window
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, doc):
+        self.add_many([doc])
+
+    def add_many(self, docs):
+        touched = {}
+        for doc in docs:
+            self._add(doc, touched)
+        if len(self._new_terms) > BULK_THRESHOLD:
+            self._terms = sorted(self._terms + self._new_terms)
+        else:
+            for term in self._new_terms:
+                insort(self._terms, term)
+        self._new_terms = []
+        if len(docs) > BULK_THRESHOLD:
+            for prefix in touched:
+                self._top[prefix] = self._rank(prefix, self._matches(prefix), MAX_SEARCH_LIMIT)
+        else:
+            for prefix, entry_ids in touched.items():
+                self._patch_top(prefix, entry_ids)
+
+    def _add(self, doc, touched):
+        name = (doc.get("medicineName") or "").strip()
+        if not name:
+            return
+        key = name.lower()
+        entry_id = self._keys.get(key)
+        if entry_id is None:
+            entry_id = len(self.entries)
+            self._keys[key] = entry_id
+            self._names.append(key)
+            self._entry_terms.append({})
+            self.entries.append({
+                "medicineId": doc.get("medicineId"),
+                "medicineName": name,
+                "composition": doc.get("composition"),
+                "category": doc.get("category"),
+            })
+        else:
+            # Another batch of a known medicine: fill in anything missing
+            entry = self.entries[entry_id]
+            for field in ("composition", "category"):
+                if not entry[field] and doc.get(field):
+                    entry[field] = doc[field]
+
+        entry_terms = self._entry_terms[entry_id]
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field)):
+                if entry_terms.get(term, 0) >= weight:
+                    continue
+                entry_terms[term] = weight
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._new_terms.append(term)
+                postings[entry_id] = weight
+                for n in range(1, min(len(term), TOP_PREFIX) + 1):
+                    prefix = term[:n]
+                    touched.setdefault(prefix, set()).add(entry_id)
+                    self._prefix_size[prefix] = self._prefix_size.get(prefix, 0) + 1
+
+    def _score(self, entry_id, word):
+        best = 0
+        for term, weight in self._entry_terms[entry_id].items():
+            if term.startswith(word):
+                best = max(best, weight + (1 if term == word else 0))
+        return best
+
+    def _sort_key(self, entry_id, score, query):
+        name = self._names[entry_id]
+        return (-(score + (3 if name.startswith(query) else 0)), len(name), name)
+
+    def _patch_top(self, prefix, entry_ids):
+        ranked = {e: self._sort_key(e, self._score(e, prefix), prefix) for e in self._top.get(prefix, [])}
+        for e in entry_ids:
+            ranked[e] = self._sort_key(e, self._score(e, prefix), prefix)
+        self._top[prefix] = sorted(ranked, key=ranked.get)[:MAX_SEARCH_LIMIT]
+
+    def _range(self, word):
+        """Slice of _terms that start with `word`."""
+        return bisect_left(self._terms, word), bisect_left(self._terms, word + "\uffff")
+
+    def _postings_size(self, word):
+        if len(word) <= TOP_PREFIX:
+            return self._prefix_size.get(word, 0)
+        lo, hi = self._range(word)
+        return sum(len(self._postings[self._terms[i]]) for i in range(lo, hi))
+
+    def _matches(self, word):
+        """{entry id: score} for every term starting with `word`."""
+        scores = {}
+        lo, hi = self._range(word)
+        for i in range(lo, hi):
+            term = self._terms[i]
+            exact = 1 if term == word else 0
+            for entry_id, weight in self._postings[term].items():
+                score = weight + exact
+                if scores.get(entry_id, 0) < score:
+                    scores[entry_id] = score
+        return scores
+
+    def _rank(self, query, scores, limit):
+        return heapq.nsmallest(limit, scores, key=lambda e: self._sort_key(e, scores[e], query))
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        words = tokenize(query)
+        if not words:
+            return []
+        if len(words) == 1 and len(words[0]) <= TOP_PREFIX:
+            return [self.entries[e] for e in self._top.get(words[0], [])[:limit]]
+
+        # Expand the most selective word, then filter its candidates by the rest
+        words.sort(key=self._postings_size)
+        scores = self._matches(words[0])
+        for word in words[1:]:
+            narrowed = {}
+            for e, s in scores.items():
+                extra = self._score(e, word)
+                if extra:
+                    narrowed[e] = s + extra
+            scores = narrowed
+            if not scores:
+                return []
+        top = self._rank(" ".join(tokenize(query)), scores, limit)
+        return [self.entries[e] for e in top]
+
+
+index = MedicineIndex()
+_refresher = None
+
+
+def _window_start(last_id):
+    return ObjectId.from_datetime(last_id.generation_time - timedelta(seconds=MEDICINE_INDEX_OVERLAP))
+
+
+async def refresh():
+    """Add pharmacy documents inserted since the last build/refresh. Returns how many were new."""
+    query = {"_id": {"$gt": _window_start(index.last_id)}} if index.last_id is not None else {}
+    docs = await pharmacy_collection.find(query, PROJECTION).sort("_id", 1).to_list()
+    fresh = [d for d in docs if d["_id"] not in index.recent_ids]
+    if fresh:
+        index.add_many(fresh)
+    if docs:
+        index.last_id = max(docs[-1]["_id"], index.last_id or docs[-1]["_id"])
+        start = _window_start(index.last_id)
+        index.recent_ids = {d["_id"] for d in docs if d["_id"] > start}
+    return len(fresh)
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(MEDICINE_INDEX_REFRESH)
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"⚠️ Medicine index refresh failed: {e}")
+
+
+async def start():
+    await refresh()
+    print(f"✅ Medicine search index: {len(index)} medicines")
+    global _refresher
+    _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop():
+    global _refresher
+    if _refresher:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
@@ -112,6 +112,14 @@ class MedicineResponse(BaseModel):
     medicineId: str
     message: str
 
+class DispenseRequest(BaseModel):
+    medicineName: str
+    quantity: int
+    reference: Optional[str] = None  # prescription / patient the units were issued against
+
+class ReorderLevelUpdate(BaseModel):
+    reorderLevel: int
+
 class LabReportCreate(BaseModel):
     patientId: str
     patientName: str
@@ -176,6 +184,11 @@ class VitalsCreate(BaseModel):
     spo2: Optional[int] = None
     respiration_rate: Optional[int] = None
     blood_sugar: Optional[int] = None
+    recorded_at: Optional[datetime] = None  # bedside monitors send their own clock
+
+
+class WardCapacityUpdate(BaseModel):
+    capacity: int
 
 
 class DischargeUpdate(BaseModel):
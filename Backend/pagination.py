@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are ordered by the endpoint's sort keys plus _id as a tie-breaker,
+and the opaque cursor carries the last row's key values. The next page is
+a range query from that position, so cost per page stays flat however
+deep the client scrolls and rows inserted meanwhile never shift a page.
+
+List endpoints keep returning a plain array (the screens expect one) and
+hand the next page's cursor back in the X-Next-Cursor header; endpoints
+that already return an object also carry it as `next_cursor`.
+"""
+import base64
+import bson
+from bson.errors import BSONError
+from fastapi import HTTPException, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _keys(sort):
+    sort = list(sort or [])
+    if not sort or sort[-1][0] != "_id":
+        sort.append(("_id", sort[-1][1] if sort else 1))
+    return sort
+
+
+def encode_cursor(doc, sort):
+    values = [doc.get(field) for field, _ in _keys(sort)]
+    return base64.urlsafe_b64encode(bson.encode({"k": values})).decode().rstrip("=")
+
+
+def decode_cursor(token, sort):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = bson.decode(raw)["k"]
+    except (ValueError, KeyError, BSONError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != len(_keys(sort)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(sort, values):
+    """Rows strictly after `values` in `sort` order."""
+    keys = _keys(sort)
+    clauses = []
+    for i, (field, direction) in enumerate(keys):
+        clause = {keys[j][0]: values[j] for j in range(i)}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+async def paginate(collection, query, sort, limit, cursor=None, projection=None):
+    """Fetch one page. Returns (docs, next_cursor or None)."""
+    keys = _keys(sort)
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+    if projection is not None:
+        # cursor values must come back with the page
+        projection = dict(projection)
+        inclusive = any(v for f, v in projection.items() if f != "_id")
+        for field, _ in keys:
+            if inclusive:
+                projection[field] = 1
+            else:
+                projection.pop(field, None)
+    docs = await collection.find(query, projection).sort(keys).limit(limit + 1).to_list()
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort)
+    return docs, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,166 @@
+"""
+Password hashing (argon2id) off the event loop.
+
+Hashing and verification run in a dedicated process pool so a burst of
+logins at shift change cannot stall request handling. At most
+PASSWORD_HASH_QUEUE_SIZE operations may be queued or running; beyond that
+callers get HashQueueFull (surfaced as 503) instead of piling up.
+
+Legacy plaintext passwords and hashes made with older cost parameters
+verify normally and report needs_rehash, so login can upgrade them.
+"""
+import asyncio
+import hmac
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "256"))
+
+_PARAMS = (ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+# ---- runs inside the worker processes ----
+
+def _hasher(params):
+    time_cost, memory_cost, parallelism = params
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def _hash(password, params):
+    start = time.perf_counter()
+    hashed = _hasher(params).hash(password)
+    return hashed, time.perf_counter() - start
+
+
+def _verify(stored, password, params):
+    start = time.perf_counter()
+    hasher = _hasher(params)
+    try:
+        ok = hasher.verify(stored, password)
+    except (VerificationError, InvalidHashError):
+        ok = False
+    needs_rehash = ok and hasher.check_needs_rehash(stored)
+    return ok, needs_rehash, time.perf_counter() - start
+
+
+# ---- event loop side ----
+
+_pool = None
+_pending = 0
+_dummy_hash = None  # verified against for unknown users, made on first use with the current params
+metrics = {
+    "hashes": 0,
+    "verifications": 0,
+    "rejected": 0,
+    "hash_seconds_total": 0.0,
+    "hash_seconds_max": 0.0,
+}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_QUEUE_SIZE:
+        metrics["rejected"] += 1
+        raise HashQueueFull()
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+def _record(elapsed):
+    metrics["hash_seconds_total"] += elapsed
+    metrics["hash_seconds_max"] = max(metrics["hash_seconds_max"], elapsed)
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith("$argon2")
+
+
+async def hash_password(password):
+    hashed, elapsed = await _submit(_hash, password, _PARAMS)
+    metrics["hashes"] += 1
+    _record(elapsed)
+    return hashed
+
+
+async def hash_passwords(passwords):
+    """Hash many passwords (bulk import) without taking the whole queue from logins."""
+    limit = asyncio.Semaphore(max(1, min(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE // 2)))
+
+    async def one(password):
+        async with limit:
+            while True:
+                try:
+                    return await hash_password(password)
+                except HashQueueFull:
+                    await asyncio.sleep(0.05)
+
+    return await asyncio.gather(*(one(p) for p in passwords))
+
+
+async def _dummy():
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash, _ = await _submit(_hash, os.urandom(16).hex(), _PARAMS)
+    return _dummy_hash
+
+
+async def verify_password(stored, password):
+    """Returns (ok, needs_rehash)."""
+    if not stored:
+        # Unknown user: do the same argon2 work so response time does not reveal which handles exist
+        await _submit(_verify, await _dummy(), password, _PARAMS)
+        metrics["verifications"] += 1
+        return False, False
+    if not is_hashed(stored):
+        # Legacy plaintext: cheap constant-time compare, upgrade on success
+        ok = hmac.compare_digest(stored.encode(), password.encode())
+        return ok, ok
+    ok, needs_rehash, elapsed = await _submit(_verify, stored, password, _PARAMS)
+    metrics["verifications"] += 1
+    _record(elapsed)
+    return ok, needs_rehash
+
+
+def get_metrics():
+    ops = metrics["hashes"] + metrics["verifications"]
+    return {
+        **metrics,
+        "queue_depth": _pending,
+        "queue_capacity": PASSWORD_HASH_QUEUE_SIZE,
+        "workers": PASSWORD_HASH_WORKERS,
+        "hash_seconds_avg": metrics["hash_seconds_total"] / ops if ops else 0.0,
+        "params": {
+            "time_cost": ARGON2_TIME_COST,
+            "memory_cost": ARGON2_MEMORY_COST,
+            "parallelism": ARGON2_PARALLELISM,
+        },
+    }
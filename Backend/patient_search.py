@@ -0,0 +1,166 @@
+"""
+Fuzzy patient search: name, phonetic name, phone fragment, ID prefix.
+
+Every patient document in `users` carries `search_terms`, a small array
+with a multikey index:
+
+    n:<name word>          "ramesh", "k"
+    p:<soundex of word>    so "Rames" / "Ramesh" / "Ramish" meet
+    i:<user_id>            "pid-482913"
+    d:<digits of user_id>  "482913"
+    M:<mobile>             phone prefix
+    m:<mobile reversed>    phone suffix ("ends 4411")
+
+Each query word becomes anchored regexes over those terms (index range
+scans, never a collection scan), ANDed across words. Whole-term matches
+(full name word, ID or phone) are fetched first with an equality query,
+so a broad prefix cannot push them out of the SEARCH_CANDIDATES that are
+ranked in Python by match quality.
+
+search_terms is set by every registration path (auth/register,
+admin/patient-register, admin/create-user, bulk import). Index existing
+patients:
+    python manage.py backfill patient-search
+"""
+import re
+from pymongo import UpdateOne
+from database import users_collection
+
+SEARCH_LIMIT = 20
+SEARCH_CANDIDATES = 200
+
+_WORD = re.compile(r"[a-z0-9-]+")
+_SOUNDEX = str.maketrans("bfpvcgjkqsxzdtlmnr", "111122222222334556")
+
+
+def soundex(word):
+    letters = [c for c in word.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    last = letters[0].translate(_SOUNDEX)
+    for c in letters[1:]:
+        digit = c.translate(_SOUNDEX)
+        if digit.isdigit() and digit != last:
+            code += digit
+        if c not in "hw":
+            last = digit
+    return (code + "000")[:4]
+
+
+def _digits(value):
+    return "".join(c for c in value or "" if c.isdigit())
+
+
+def search_terms(name=None, mobile=None, user_id=None):
+    """The `search_terms` array to store on a patient document."""
+    terms = set()
+    for word in _WORD.findall((name or "").lower()):
+        terms.add(f"n:{word}")
+        code = soundex(word)
+        if code:
+            terms.add(f"p:{code}")
+    phone = _digits(mobile)
+    if phone:
+        terms.add(f"M:{phone}")
+        terms.add(f"M:{phone[-10:]}")  # without a country code
+        terms.add(f"m:{phone[::-1]}")
+    if user_id:
+        terms.add(f"i:{user_id.lower()}")
+        digits = _digits(user_id)
+        if digits:
+            terms.add(f"d:{digits}")
+    return sorted(terms)
+
+
+def _word_filter(word):
+    """Anchored regexes (index prefix ranges) a document must match for one query word."""
+    esc = re.escape(word)
+    patterns = [f"^n:{esc}", f"^i:{esc}"]
+    digits = _digits(word)
+    if digits and digits == word:
+        patterns += [f"^M:{digits}", f"^m:{digits[::-1]}", f"^d:{digits}"]
+    elif word.isalpha() and len(word) >= 3:
+        patterns.append(f"^p:{soundex(word)}$")
+    return {"search_terms": {"$in": [re.compile(p) for p in patterns]}}
+
+
+def _exact_filter(word):
+    """Equality terms (whole name word, full ID or phone) for one query word."""
+    terms = [f"n:{word}", f"i:{word}"]
+    digits = _digits(word)
+    if digits and digits == word:
+        terms += [f"M:{digits}", f"d:{digits}"]
+    return {"search_terms": {"$in": terms}}
+
+
+def _score(doc, words):
+    name_words = _WORD.findall((doc.get("name") or "").lower())
+    phone = _digits(doc.get("mobile") or doc.get("contact"))
+    user_id = (doc.get("user_id") or doc.get("userId") or "").lower()
+    total = 0
+    for word in words:
+        best = 0
+        if word == user_id:
+            best = 6
+        elif user_id.startswith(word) or (word.isdigit() and _digits(user_id).startswith(word)):
+            best = 4
+        if word.isdigit() and phone:
+            if phone == word:
+                best = max(best, 6)
+            elif phone.endswith(word):
+                best = max(best, 4)
+            elif phone.startswith(word):
+                best = max(best, 3)
+        for i, nw in enumerate(name_words):
+            if nw == word:
+                best = max(best, 5 if i == 0 else 4)
+            elif nw.startswith(word):
+                best = max(best, 3)
+            elif word.isalpha() and len(word) >= 3 and soundex(nw) == soundex(word):
+                best = max(best, 2)
+        total += best
+    return total
+
+
+# Admin-created patients store userId / contact instead of user_id / mobile
+PROJECTION = {"_id": 1, "user_id": 1, "userId": 1, "name": 1, "mobile": 1, "contact": 1, "age": 1, "gender": 1}
+
+
+async def search(query, limit=SEARCH_LIMIT, collection=users_collection):
+    words = _WORD.findall((query or "").lower())
+    if not words:
+        return []
+    # Longest words first: usually the most selective index range
+    words.sort(key=len, reverse=True)
+    candidates = {}
+    for filter_ in (_exact_filter, _word_filter):
+        cursor = collection.find({"$and": [filter_(w) for w in words]}, PROJECTION).limit(SEARCH_CANDIDATES)
+        async for doc in cursor:
+            candidates.setdefault(doc.pop("_id"), doc)
+    docs = list(candidates.values())
+    for doc in docs:
+        doc["score"] = _score(doc, words)
+    docs.sort(key=lambda d: (-d["score"], d.get("name") or ""))
+    return docs[:limit]
+
+
+async def backfill(batch_size=1000, collection=users_collection):
+    """Set search_terms on every patient that lacks it."""
+    updated = 0
+    ops = []
+    cursor = collection.find(
+        {"search_terms": {"$exists": False}, "$or": [{"role": "patient"}, {"userType": "patient"}]},
+        {"name": 1, "mobile": 1, "contact": 1, "user_id": 1, "userId": 1},
+    )
+    async for doc in cursor:
+        terms = search_terms(
+            doc.get("name"), doc.get("mobile") or doc.get("contact"), doc.get("user_id") or doc.get("userId")
+        )
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_terms": terms}}))
+        if len(ops) >= batch_size:
+            updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+    return updated
@@ -0,0 +1,136 @@
+"""
+Live doctor queues.
+
+Doctors subscribe over WebSocket (/appointments/doctor/{id}/live) and get
+a snapshot of today's queue followed by one event per booking or status
+change, instead of re-polling /today:
+
+    {"type": "snapshot", "date": ..., "appointments": [...]}
+    {"type": "upsert", "appointment": {...}}
+
+Events come from one of two sources:
+  - changestream: a watch() on `appointments`, so every worker sees writes
+    made by any worker. Needs a replica set.
+  - local: create_appointment / update_status publish in-process. Only
+    subscribers on the same worker see them (fine for a single uvicorn
+    process / local testing).
+QUEUE_EVENTS_MODE=auto picks changestream when the server is a replica set.
+"""
+import asyncio
+import os
+from pymongo.errors import PyMongoError
+from database import client, appointments_collection
+from repositories import appointments as appointments_repo
+
+QUEUE_EVENTS_MODE = os.getenv("QUEUE_EVENTS_MODE", "auto")
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "100"))
+
+# Fields an event needs besides the TODAY view
+_ROUTING_FIELDS = {"doctor_id": 1, "date": 1}
+PROJECTION = {**appointments_repo.TODAY.projection(), **_ROUTING_FIELDS}
+
+
+class Resync(Exception):
+    """The subscriber fell behind and its events were dropped."""
+
+
+class Subscription:
+    def __init__(self, bus, doctor_id):
+        self.bus = bus
+        self.doctor_id = doctor_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        if self.overflowed:
+            self.overflowed = False
+            self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            raise Resync()
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self):
+        self.mode = "local"
+        self._subscribers = {}  # doctor_id -> set of Subscription
+        self._watcher = None
+
+    def subscribe(self, doctor_id):
+        sub = Subscription(self, doctor_id)
+        self._subscribers.setdefault(doctor_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        subs = self._subscribers.get(sub.doctor_id)
+        if subs:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.doctor_id]
+
+    def dispatch(self, doc):
+        subs = self._subscribers.get(doc.get("doctor_id"))
+        if not subs:
+            return
+        event = {
+            "type": "upsert",
+            "date": doc.get("date"),
+            "appointment": appointments_repo.TODAY.shape(doc),
+        }
+        for sub in list(subs):
+            sub.push(event)
+
+    def publish(self, doc):
+        """Called by the routers after a write. No-op when the change stream feeds the bus."""
+        if self.mode == "local" and doc is not None:
+            self.dispatch(doc)
+
+    async def start(self):
+        mode = QUEUE_EVENTS_MODE
+        if mode == "auto":
+            hello = await client.admin.command("hello")
+            mode = "changestream" if hello.get("setName") else "local"
+        self.mode = mode
+        if mode == "changestream":
+            self._watcher = asyncio.create_task(self._watch())
+        print(f"✅ Queue events: {mode}")
+
+    async def stop(self):
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _watch(self):
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+            {"$project": {"fullDocument": PROJECTION}},
+        ]
+        resume_token = None
+        while True:
+            try:
+                stream = await appointments_collection.watch(
+                    pipeline, full_document="updateLookup", resume_after=resume_token
+                )
+                async with stream:
+                    async for change in stream:
+                        resume_token = change["_id"]
+                        if change.get("fullDocument"):
+                            self.dispatch(change["fullDocument"])
+            except PyMongoError as e:
+                print(f"⚠️ Appointment change stream interrupted: {e}")
+                await asyncio.sleep(1)
+
+
+bus = EventBus()
@@ -0,0 +1,49 @@
+"""Appointment queues."""
+from typing import List, Optional, Tuple
+from database import appointments_collection
+from pagination import paginate
+from .base import View
+
+# GET /appointments/doctor/{id}/today
+TODAY = View({
+    "id": "_id",
+    "patientId": "patient_id",
+    "phone": "mobilenumber",
+    "reason": "reason",
+    "date": "date",
+    "status": "status",
+    "is_emergency": "is_emergency",
+}, defaults={"is_emergency": False})
+
+# GET /appointments/doctor/{id}/ipd
+IPD = View({
+    "id": "_id",
+    "patient_name": "patient_name",
+    "age": "age",
+    "gender": "gender",
+    "ward_no": "ward_no",
+    "bed_no": "bed_no",
+    "admission_date": "admission_date",
+    "reason": "reason",
+})
+
+
+async def today_page(doctor_id: str, date: str, limit: int, cursor: Optional[str],
+                     projection: dict) -> Tuple[List[dict], Optional[str]]:
+    # Emergency first (True before False), then by time of booking
+    return await paginate(
+        appointments_collection,
+        {"doctor_id": doctor_id, "date": date},
+        [("is_emergency", -1), ("created_at", 1)],
+        limit, cursor, projection,
+    )
+
+
+async def ipd_page(doctor_id: str, limit: int, cursor: Optional[str],
+                   projection: dict) -> Tuple[List[dict], Optional[str]]:
+    return await paginate(
+        appointments_collection,
+        {"doctor_id": doctor_id, "is_ipd": True, "status": "Admitted"},
+        [("_id", 1)],
+        limit, cursor, projection,
+    )
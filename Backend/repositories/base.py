@@ -0,0 +1,52 @@
+"""
+Declared response views shared by the repositories.
+
+A View maps each output field to the document field it comes from (and an
+optional transform). The view produces both the Mongo projection and the
+shaped output, so a query only reads what the endpoint returns, and
+`fields=` can narrow that further per request.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from fastapi import HTTPException
+
+FieldSpec = Union[str, Tuple[str, Callable[[Any], Any]]]
+
+
+class View:
+    def __init__(self, fields: Dict[str, FieldSpec], defaults: Optional[Dict[str, Any]] = None):
+        self.fields = {
+            name: spec if isinstance(spec, tuple) else (spec, str if spec == "_id" else None)
+            for name, spec in fields.items()
+        }
+        self.defaults = defaults or {}
+
+    def select(self, fields: Optional[str] = None) -> List[str]:
+        """Parse a `fields=a,b,c` query value into output names (all when empty)."""
+        if not fields:
+            return list(self.fields)
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [n for n in names if n not in self.fields]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {unknown}. Available: {list(self.fields)}",
+            )
+        return names
+
+    def projection(self, names: Optional[List[str]] = None) -> Dict[str, int]:
+        names = names if names is not None else list(self.fields)
+        projection = {self.fields[n][0]: 1 for n in names}
+        projection.setdefault("_id", 0)
+        return projection
+
+    def shape(self, doc: dict, names: Optional[List[str]] = None) -> dict:
+        out = {}
+        for name in names if names is not None else self.fields:
+            source, transform = self.fields[name]
+            value = doc.get(source)
+            if value is None:
+                value = self.defaults.get(name)
+            elif transform is not None:
+                value = transform(value)
+            out[name] = value
+        return out
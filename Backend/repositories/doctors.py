@@ -0,0 +1,26 @@
+"""Doctor directory and profiles."""
+from typing import List, Optional, Tuple
+from database import doctors_collection
+from pagination import paginate
+from .base import View
+
+# GET /doctors/ -- same shape as models.Doctor
+DIRECTORY = View({
+    "id": ("doctorId", str),
+    "name": ("name", str),
+    "specialty": ("roleOrSpec", lambda v: str(v).strip()),
+    "contact": ("contact", str),
+    "status": ("status", lambda v: str(v).strip()),
+    "timeSlots": "timeSlots",
+}, defaults={"timeSlots": []})
+
+# GET /doctors/{id}: everything except credentials and GridFS bookkeeping
+PROFILE_PROJECTION = {"_id": 0, "password": 0, "profile_thumb_id": 0}
+
+
+async def page(limit: int, cursor: Optional[str], projection: dict) -> Tuple[List[dict], Optional[str]]:
+    return await paginate(doctors_collection, {}, [("_id", 1)], limit, cursor, projection)
+
+
+async def find_profile(doctor_id: str) -> Optional[dict]:
+    return await doctors_collection.find_one({"doctorId": doctor_id}, PROFILE_PROJECTION)
@@ -0,0 +1,36 @@
+"""Lab reports per patient."""
+from typing import List, Optional, Tuple
+from database import lab_report_collection
+from pagination import paginate
+from .base import View
+
+VIEW = View({
+    "_id": "_id",
+    "reportId": "reportId",
+    "patientId": "patientId",
+    "patientName": "patientName",
+    "testName": "testName",
+    "technician": "technician",
+    "bp": "bp",
+    "bloodSugar": "bloodSugar",
+    "temperature": "temperature",
+    "pulse": "pulse",
+    "metrics": "metrics",
+    "analytes": "analytes",
+    "remarks": "remarks",
+    "reportUploaded": "reportUploaded",
+    "createdAt": "createdAt",
+})
+
+
+async def page(patient_id: str, limit: int, cursor: Optional[str],
+               projection: dict) -> Tuple[List[dict], Optional[str]]:
+    return await paginate(
+        lab_report_collection, {"patientId": patient_id}, [("_id", 1)], limit, cursor, projection
+    )
+
+
+async def recent(patient_ids: List[str], n: int, projection: dict) -> List[dict]:
+    return await lab_report_collection.find(
+        {"patientId": {"$in": patient_ids}}, projection
+    ).sort("_id", -1).limit(n).to_list()
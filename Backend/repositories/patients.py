@@ -0,0 +1,38 @@
+"""Patient records in the users collection."""
+from typing import Optional
+from database import users_collection
+from .base import View
+
+# GET /patient/{id} and the summary profile section
+PROFILE = View({
+    "id": "_id",
+    "user_id": "user_id",
+    "role": "role",
+    "name": "name",
+    "dob": "dob",
+    "mobile": "mobile",
+})
+
+# GET /admin/{patient_id}
+ADMIN_DETAIL = View({
+    "patientId": "user_id",
+    "name": "name",
+    "age": "age",
+    "gender": "gender",
+    "mobile": "mobile",
+    "address": "address",
+    "disease": "disease",
+    "assignedDoctor": "assignedDoctor",
+    "status": "status",
+})
+
+
+async def find_by_handle(handle: str, projection: dict) -> Optional[dict]:
+    """Patient by user_id or mobile number."""
+    return await users_collection.find_one(
+        {"$or": [{"user_id": handle}, {"mobile": handle}]}, projection
+    )
+
+
+async def find_patient(user_id: str, projection: dict) -> Optional[dict]:
+    return await users_collection.find_one({"user_id": user_id, "role": "patient"}, projection)
@@ -0,0 +1,34 @@
+"""Prescriptions per patient."""
+from typing import List, Optional, Tuple
+from database import prescription_collection
+from pagination import paginate
+from .base import View
+
+ACTIVE_STATUSES = [None, "Current", "Active"]
+
+# Same shape as models.PrescriptionOut
+VIEW = View({
+    "id": "_id",
+    "patientId": "patientId",
+    "doctorName": "doctorName",
+    "doctorRole": "doctorRole",
+    "doctorDepartment": "doctorDepartment",
+    "disease": "disease",
+    "status": "status",
+    "dateIssued": "timestamp",
+    "medications": "medications",
+}, defaults={"status": "Current", "medications": []})
+
+
+async def page(patient_id: str, limit: int, cursor: Optional[str],
+               projection: dict) -> Tuple[List[dict], Optional[str]]:
+    return await paginate(
+        prescription_collection, {"patientId": patient_id}, [("_id", 1)], limit, cursor, projection
+    )
+
+
+async def recent_active(patient_ids: List[str], n: int, projection: dict) -> List[dict]:
+    return await prescription_collection.find(
+        {"patientId": {"$in": patient_ids}, "status": {"$in": ACTIVE_STATUSES}},
+        projection,
+    ).sort("_id", -1).limit(n).to_list()
@@ -0,0 +1,45 @@
+"""Vitals readings (time-series collection)."""
+from typing import List, Optional, Tuple, Union
+from database import vitals_collection
+from pagination import paginate
+from .base import View
+
+_READING_FIELDS = {
+    "heart_rate": "heart_rate",
+    "blood_pressure": "blood_pressure",
+    "temperature": "temperature",
+    "spo2": "spo2",
+    "respiration_rate": "respiration_rate",
+    "blood_sugar": "blood_sugar",
+    "created_at": "created_at",
+}
+
+# GET /patient/vitals/{id}
+LATEST = View(_READING_FIELDS)
+
+# GET /patient/vitals/all/{id}
+READING = View({"id": "_id", **_READING_FIELDS})
+
+
+def _patient_filter(patient_ids: Union[str, List[str]]) -> dict:
+    if isinstance(patient_ids, str):
+        return {"patient_id": patient_ids}
+    return {"patient_id": {"$in": patient_ids}}
+
+
+async def latest(patient_ids: Union[str, List[str]], projection: dict) -> Optional[dict]:
+    return await vitals_collection.find_one(
+        _patient_filter(patient_ids), projection, sort=[("created_at", -1)]
+    )
+
+
+async def recent(patient_ids: Union[str, List[str]], n: int, projection: dict) -> List[dict]:
+    return await vitals_collection.find(_patient_filter(patient_ids), projection) \
+        .sort("created_at", -1).limit(n).to_list()
+
+
+async def page(patient_id: str, limit: int, cursor: Optional[str],
+               projection: dict) -> Tuple[List[dict], Optional[str]]:
+    return await paginate(
+        vitals_collection, {"patient_id": patient_id}, [("created_at", -1)], limit, cursor, projection
+    )
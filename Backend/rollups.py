@@ -0,0 +1,194 @@
+"""Hourly and daily dashboard counters in `rollups` (_id "day|YYYY-MM-DD" / "hour|YYYY-MM-DDTHH")."""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import PyMongoError
+from database import db, appointments_collection, admission_collection, prescription_collection
+
+rollups_collection = db["rollups"]
+
+MAX_RANGE_DAYS = 366
+
+# Hospital-wide counters every bucket carries
+TOTALS = ["appointments", "emergency", "admissions", "discharges", "prescriptions"]
+
+
+def key(value):
+    """Dimension values are stored as field names: no dots, no leading $."""
+    text = str(value or "unknown").replace(".", "_")
+    return "_" + text[1:] if text.startswith("$") else text
+
+
+def hour_id(at):
+    return f"hour|{at:%Y-%m-%dT%H}"
+
+
+def day_id(at):
+    return f"day|{at:%Y-%m-%d}"
+
+
+def _bucket_ops(at, counts):
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    day = hour.replace(hour=0)
+    return [
+        UpdateOne(
+            {"_id": _id},
+            {"$inc": counts, "$setOnInsert": {"grain": grain, "start": start}},
+            upsert=True,
+        )
+        for _id, grain, start in ((hour_id(at), "hour", hour), (day_id(at), "day", day))
+    ]
+
+
+async def add(at, counts):
+    """$inc dotted counter paths in the hour and day buckets of `at`."""
+    try:
+        await rollups_collection.bulk_write(_bucket_ops(at, counts), ordered=False)
+    except PyMongoError as e:
+        # The record itself is written; `manage.py rebuild rollups` recovers the count
+        print(f"⚠️ Rollup update failed: {e}")
+
+
+async def appointment_booked(appointment):
+    doctor = f"doctors.{key(appointment.get('doctor_id'))}"
+    emergency = 1 if appointment.get("is_emergency") else 0
+    await add(appointment["created_at"], {
+        "appointments": 1,
+        "emergency": emergency,
+        f"{doctor}.appointments": 1,
+        f"{doctor}.emergency": emergency,
+    })
+
+
+async def patient_admitted(ward, at):
+    await add(at, {"admissions": 1, f"wards.{key(ward)}.admissions": 1})
+
+
+async def patient_discharged(ward, at):
+    await add(at, {"discharges": 1, f"wards.{key(ward)}.discharges": 1})
+
+
+async def prescription_saved(department, at):
+    await add(at, {"prescriptions": 1, f"departments.{key(department)}.prescriptions": 1})
+
+
+# --- READS ---
+
+def day_range(start=None, end=None, default_days=7):
+    """Inclusive local-date range, clamped to MAX_RANGE_DAYS."""
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=default_days - 1)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        start = end - timedelta(days=MAX_RANGE_DAYS - 1)
+    return start, end
+
+
+async def days(start, end, projection=None):
+    """Day buckets in [start, end], one per date (empty buckets filled with zeros)."""
+    docs = await rollups_collection.find(
+        {"_id": {"$gte": day_id(start), "$lte": day_id(end)}}, projection
+    ).sort("_id", 1).to_list()
+    found = {doc["_id"]: doc for doc in docs}
+    out = []
+    for i in range((end - start).days + 1):
+        date = start + timedelta(days=i)
+        out.append((date, found.get(day_id(date), {})))
+    return out
+
+
+async def hours(date):
+    docs = await rollups_collection.find(
+        {"_id": {"$gte": f"hour|{date:%Y-%m-%d}T00", "$lte": f"hour|{date:%Y-%m-%d}T23"}}
+    ).to_list()
+    found = {doc["_id"]: doc for doc in docs}
+    return [(h, found.get(f"hour|{date:%Y-%m-%d}T{h:02d}", {})) for h in range(24)]
+
+
+def totals(doc):
+    out = {name: doc.get(name, 0) for name in TOTALS}
+    out["emergencyShare"] = round(out["emergency"] / out["appointments"], 3) if out["appointments"] else 0.0
+    return out
+
+
+def merge(docs, dimension):
+    """Sum one dimension ({key: {counter: n}}) across bucket documents."""
+    merged = defaultdict(lambda: defaultdict(int))
+    for doc in docs:
+        for name, counters in doc.get(dimension, {}).items():
+            for counter, n in counters.items():
+                merged[name][counter] += n
+    return {name: dict(counters) for name, counters in merged.items()}
+
+
+# --- REBUILD ---
+
+def _parsed(field, fmt):
+    # Stored strings -> dates (microseconds dropped); unparseable or missing falls back to the insert time
+    return {"$dateFromString": {
+        "dateString": {"$substrCP": [f"${field}", 0, len(datetime(2000, 1, 1).strftime(fmt))]},
+        "format": fmt,
+        "onError": {"$toDate": "$_id"},
+        "onNull": {"$toDate": "$_id"},
+    }}
+
+
+def _hourly(at, field, counters):
+    """Pipeline: {_id: {hour, key}, <counter>: n} per hour and value of `field`."""
+    return [
+        {"$project": {"at": at, "key": field, **counters}},
+        {"$group": {
+            "_id": {"hour": {"$dateTrunc": {"date": "$at", "unit": "hour"}}, "key": "$key"},
+            **{name: {"$sum": f"${name}"} for name in counters},
+        }},
+    ]
+
+
+# Bucketed on the stored timestamp, like the write paths (prescriptions in UTC, the rest server local time)
+SOURCES = [
+    # (collection, filter, timestamp, dimension, {counter: per-record expression})
+    (appointments_collection, {}, {"$ifNull": ["$created_at", {"$toDate": "$_id"}]}, "doctors", "$doctor_id",
+     {"appointments": {"$literal": 1}, "emergency": {"$cond": [{"$eq": ["$is_emergency", True]}, 1, 0]}}),
+    (admission_collection, {}, _parsed("admissionDateTime", "%Y-%m-%dT%H:%M:%S"), "wards", "$ward",
+     {"admissions": {"$literal": 1}}),
+    (appointments_collection, {"admin_confirmed_at": {"$type": "string"}}, _parsed("admin_confirmed_at", "%Y-%m-%d %H:%M"),
+     "wards", "$ward_no", {"discharges": {"$literal": 1}}),
+    (prescription_collection, {}, {"$ifNull": ["$timestamp", {"$toDate": "$_id"}]}, "departments", "$doctorDepartment",
+     {"prescriptions": {"$literal": 1}}),
+]
+
+
+async def rebuild(batch_size=1000):
+    """Recount every bucket into `rollups_rebuild`, then swap it in. Returns the bucket count."""
+    buckets = {}
+
+    def bucket(_id, grain, start):
+        return buckets.setdefault(_id, {"_id": _id, "grain": grain, "start": start})
+
+    for collection, filter_, at, dimension, field, counters in SOURCES:
+        pipeline = ([{"$match": filter_}] if filter_ else []) + _hourly(at, field, counters)
+        cursor = await collection.aggregate(pipeline, allowDiskUse=True)
+        async for row in cursor:
+            hour = row["_id"]["hour"]
+            name = key(row["_id"]["key"])
+            for doc in (bucket(hour_id(hour), "hour", hour),
+                        bucket(day_id(hour), "day", hour.replace(hour=0))):
+                slot = doc.setdefault(dimension, {}).setdefault(name, {})
+                for counter in counters:
+                    doc[counter] = doc.get(counter, 0) + row[counter]
+                    slot[counter] = slot.get(counter, 0) + row[counter]
+
+    staging = db["rollups_rebuild"]
+    await staging.drop()
+    ops = []
+    for doc in buckets.values():
+        ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(ops) >= batch_size:
+            await staging.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await staging.bulk_write(ops, ordered=False)
+    if buckets:
+        await staging.rename(rollups_collection.name, dropTarget=True)
+    else:
+        await rollups_collection.drop()
+    return len(buckets)
@@ -1,62 +1,110 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from models import *
 from database import users_collection, doctors_collection, admin_collection,admission_collection,staff_collection,pharmacy_collection,lab_report_collection,vitals_collection
+from counters import admission_ids, medicine_ids, lab_report_ids
 from datetime import datetime
+from etags import bump
+from doctor_photos import store_photo, delete_photo, InvalidPhoto
+from identities import claim as claim_identity, release as release_identity, resolve as resolve_identity, exists as identity_exists
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from passwords import hash_password, get_metrics as hash_metrics
+from vitals_store import to_document as vitals_to_document
+import exporter
+import beds
+import discharge_queue
+import medicine_search
+import stock
+import bulk_import
+import lab_analytes
+import early_warning
+import rollups
+from patient_search import search_terms
+from repositories import patients as patients_repo
+from serialization import fast_response
+from streams import iter_records
+from vitals_ingest import ingest as ingest_vitals
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
 @router.post("/create-user", response_model=UserMasterResponse)
-def create_user(user: UserMasterCreate):
+async def create_user(user: UserMasterCreate):
     user_type = user.userType.lower()
 
     if user_type not in ["patient", "doctor", "admin"]:
         raise HTTPException(status_code=400, detail="Invalid user type")
 
-    if (
-        users_collection.find_one({"userId": user.userId})
-        or doctors_collection.find_one({"doctorId": user.userId})
-        or admin_collection.find_one({"adminId": user.userId})
-    ):
-        raise HTTPException(status_code=400, detail="User ID already exists")
+    if user_type == "doctor" and not user.timeSlots:
+        raise HTTPException(status_code=400, detail="Doctor timeSlots required")
 
-    if user_type == "admin":
-        admin_collection.insert_one({
-            "adminId": user.userId,
-            "password": user.password,
-            "name": user.name,
-            "role": user.roleOrSpec or "Admin",
-            "contact": user.contact,
-            "status": user.status,
-        })
-
-    elif user_type == "doctor":
-        if not user.timeSlots:
-            raise HTTPException(status_code=400, detail="Doctor timeSlots required")
-
-        doctors_collection.insert_one({
-            "doctorId": user.userId,
-            "role": "doctor",
-            "password": user.password,
-            "name": user.name,
-            "roleOrSpec": user.roleOrSpec,
-            "contact": user.contact,
-            "status": user.status,
-            "timeSlots": user.timeSlots,
-            "profile_pic": user.profile_pic,  # ✅ Base64 stored here
-        })
+    password = await hash_password(user.password)
 
-    else:
-        users_collection.insert_one({
-            "userId": user.userId,
-            "userType": "patient",
-            "password": user.password,
-            "name": user.name,
-            "roleOrSpec": user.roleOrSpec,
-            "contact": user.contact,
-            "status": user.status,
-        })
+    # Claim the login handle first: one indexed insert is the duplicate check
+    ref = ObjectId()
+    collection = {"admin": admin_collection, "doctor": doctors_collection, "patient": users_collection}[user_type]
+    contacts = [user.contact] if user_type == "doctor" else []
+    try:
+        await claim_identity([user.userId], contacts, user_type, collection, ref, user.userId)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="User ID already exists")
+
+    try:
+        if user_type == "admin":
+            await admin_collection.insert_one({
+                "_id": ref,
+                "adminId": user.userId,
+                "password": password,
+                "name": user.name,
+                "role": user.roleOrSpec or "Admin",
+                "contact": user.contact,
+                "status": user.status,
+            })
+
+        elif user_type == "doctor":
+            doctor_doc = {
+                "_id": ref,
+                "doctorId": user.userId,
+                "role": "doctor",
+                "password": password,
+                "name": user.name,
+                "roleOrSpec": user.roleOrSpec,
+                "contact": user.contact,
+                "status": user.status,
+                "timeSlots": user.timeSlots,
+            }
+            # Picture goes to GridFS, the doctor document only keeps the ids
+            photo = {}
+            if user.profile_pic:
+                try:
+                    photo = await store_photo(user.userId, user.profile_pic)
+                except InvalidPhoto as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                doctor_doc.update(photo)
+
+            try:
+                await doctors_collection.insert_one(doctor_doc)
+            except Exception:
+                await delete_photo(photo)
+                raise
+            await bump("doctors")
+
+        else:
+            await users_collection.insert_one({
+                "_id": ref,
+                "userId": user.userId,
+                "userType": "patient",
+                "password": password,
+                "name": user.name,
+                "roleOrSpec": user.roleOrSpec,
+                "contact": user.contact,
+                "status": user.status,
+                "search_terms": search_terms(user.name, user.contact, user.userId),
+            })
+    except Exception:
+        await release_identity(ref)
+        raise
 
     return {
         "message": f"{user.userType} created successfully",
@@ -65,20 +113,29 @@ def create_user(user: UserMasterCreate):
 
 
 @router.post("/patient-register", response_model=PatientResponse)
-def register_patient(patient: PatientCreate):
+async def register_patient(patient: PatientCreate):
 
-    # Check duplicate patient
-    if users_collection.find_one({"user_id": patient.patientId}):
-        raise HTTPException(
-            status_code=400,
-            detail="Patient already exists"
-        )
+    password = await hash_password(patient.password)
+
+    # Check duplicate patient (claims the login handles atomically).
+    # The mobile is a login handle, unique as in /auth/register.
+    ref = ObjectId()
+    try:
+        await claim_identity([patient.patientId, patient.mobile], [], "patient", users_collection, ref, patient.patientId)
+    except DuplicateKeyError:
+        if await identity_exists(patient.patientId):
+            raise HTTPException(
+                status_code=400,
+                detail="Patient already exists"
+            )
+        raise HTTPException(status_code=409, detail="Mobile already registered")
 
     patient_doc = {
+        "_id": ref,
         "user_id": patient.patientId,
         "role": "patient",
         "dob": patient.dob,
-        "password": patient.password,
+        "password": password,
         "name": patient.name,
         "age": patient.age,
         "gender": patient.gender,
@@ -87,9 +144,15 @@ def register_patient(patient: PatientCreate):
         "disease": patient.disease,
         "assignedDoctor": patient.assignedDoctor,
         "status": patient.status,
+        "search_terms": search_terms(patient.name, patient.mobile, patient.patientId),
     }
 
-    users_collection.insert_one(patient_doc)
+    try:
+        await users_collection.insert_one(patient_doc)
+    except Exception:
+        await release_identity(ref)
+        raise
+    await bump(f"patient:{patient.patientId}", f"patient:{patient.mobile}")
 
     return {
         "message": "Patient registered successfully",
@@ -97,37 +160,50 @@ def register_patient(patient: PatientCreate):
     }
 
 
+# Declared before /{patient_id} so these paths are not captured by it
+@router.get("/imports")
+async def list_imports():
+    return fast_response(bulk_import.recent_jobs())
+
+
+@router.get("/pending-discharges")
+async def admin_get_pending_discharges(
+    response: Response,
+    ward: Optional[str] = None,
+    date: Optional[str] = None,
+    since: Optional[int] = None,
+):
+    # Materialized queue: full list, or only changes after the last X-Sync-Token
+    if since is not None:
+        entries, token = await discharge_queue.changes(since, ward)
+    else:
+        entries, token = await discharge_queue.pending(ward, date)
+    response.headers["X-Sync-Token"] = str(token)
+    return fast_response(entries, response)
+
+
+@router.get("/hash-metrics")
+async def password_hash_metrics():
+    # Hashing pool load; admin-only like the other operational endpoints
+    return hash_metrics()
+
+
 @router.get("/{patient_id}")
-def get_patient_by_id(patient_id: str):
+async def get_patient_by_id(patient_id: str, fields: Optional[str] = None):
+    view = patients_repo.ADMIN_DETAIL
+    names = view.select(fields)
 
-    patient = users_collection.find_one({
-        "$or": [
-            {"user_id": patient_id},
-            {"mobile": patient_id}
-        ]
-    })
+    patient = await patients_repo.find_by_handle(patient_id, view.projection(names))
 
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    return {
-        "patientId": patient.get("userId"),
-        "name": patient.get("name"),
-        "age": patient.get("age"),
-        "gender": patient.get("gender"),
-        "mobile": patient.get("mobile"),
-        "address": patient.get("address"),
-        "disease": patient.get("disease"),
-        "assignedDoctor": patient.get("assignedDoctor"),
-        "status": patient.get("status"),
-    }
+    return fast_response(view.shape(patient, names))
 
 @router.post("/admission-create")
-def create_admission(admission: AdmissionCreate):
+async def create_admission(admission: AdmissionCreate):
 
-    MAX_BEDS = 6
-
-    patient = users_collection.find_one({
+    patient = await users_collection.find_one({
         "$or": [
             {"user_id": admission.patientId},
             {"mobile": admission.patientId}
@@ -137,30 +213,40 @@ def create_admission(admission: AdmissionCreate):
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    # 🔍 Check ward capacity
-    occupied_beds = admission_collection.count_documents({
-        "ward": admission.ward
-    })
+    # Generate Admission ID
+    admission_id = await admission_ids.next_id()
 
-    if occupied_beds >= MAX_BEDS:
+    # 🔍 Atomically take a ward slot and the requested bed
+    try:
+        await beds.allocate(admission.ward, admission.bedNumber, admission_id, admission.patientId)
+    except beds.WardFull:
         raise HTTPException(
             status_code=400,
             detail=f"No beds available in ward {admission.ward}"
         )
+    except beds.BedTaken:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Bed {admission.bedNumber} in ward {admission.ward} is already occupied"
+        )
 
-    # Generate Admission ID
-    admission_id = "ADM-" + str(100000 + admission_collection.count_documents({}) + 1)
-
+    admitted_at = datetime.now()
     admission_doc = {
         "admissionId": admission_id,
         "patientId": admission.patientId,
         "patientName": patient.get("name"),
         "ward": admission.ward,
         "bedNumber": admission.bedNumber,
-        "admissionDateTime": datetime.now().isoformat()
+        "status": "Admitted",
+        "admissionDateTime": admitted_at.isoformat()
     }
 
-    admission_collection.insert_one(admission_doc)
+    try:
+        await admission_collection.insert_one(admission_doc)
+    except Exception:
+        await beds.release(admission.ward, admission.bedNumber)
+        raise
+    await rollups.patient_admitted(admission.ward, admitted_at)
 
     return {
         "message": "Admission created successfully",
@@ -168,9 +254,9 @@ def create_admission(admission: AdmissionCreate):
     }
 
 @router.post("/doctor-department-assign")
-def assign_doctor(assignment: DoctorAssignment):
+async def assign_doctor(assignment: DoctorAssignment):
     # 1️⃣ Validate admission exists
-    admission = admission_collection.find_one({"admissionId": assignment.admissionId})
+    admission = await admission_collection.find_one({"admissionId": assignment.admissionId})
     if not admission:
         raise HTTPException(status_code=404, detail="Admission not found")
 
@@ -179,7 +265,7 @@ def assign_doctor(assignment: DoctorAssignment):
         raise HTTPException(status_code=400, detail="Patient ID does not match admission")
 
     # 3️⃣ Append doctor assignment to the admission document
-    update_result = admission_collection.update_one(
+    update_result = await admission_collection.update_one(
         {"admissionId": assignment.admissionId},
         {"$set": {
             "doctorName": assignment.doctorName,
@@ -198,33 +284,37 @@ def assign_doctor(assignment: DoctorAssignment):
     }
 
 @router.get("/get-user/{userId}")
-def get_user(userId: str):
-    user = users_collection.find_one({"user_id": userId}) \
-           or doctors_collection.find_one({"doctorId": userId}) \
-           or admin_collection.find_one({"adminId": userId})
+async def get_user(userId: str):
+    # Never hand credentials back
+    _, user = await resolve_identity(userId, {"password": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user["_id"] = str(user["_id"])
-    return user
+    return fast_response(user)
 
 @router.get("/admissions/{admissionId}")
-def get_admission(admissionId: str):
-    admission = admission_collection.find_one({"admissionId": admissionId})
+async def get_admission(admissionId: str):
+    admission = await admission_collection.find_one({"admissionId": admissionId})
     if not admission:
         raise HTTPException(status_code=404, detail="Admission not found")
     admission["_id"] = str(admission["_id"])
     return admission
 
 @router.post("/staff-register", response_model=StaffResponse)
-def register_staff(staff: StaffCreate):
-    # Check if staff already exists
-    if staff_collection.find_one({"staffId": staff.staffId}):
+async def register_staff(staff: StaffCreate):
+    password = await hash_password(staff.password)
+
+    # Check if staff already exists (claims the login handle atomically)
+    ref = ObjectId()
+    try:
+        await claim_identity([staff.staffId], [], "staff", staff_collection, ref, staff.staffId)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Staff ID already exists")
 
     staff_doc = {
+        "_id": ref,
         "staffId": staff.staffId,
         "name": staff.name,
-        "password": staff.password,  # Ideally hashed!
+        "password": password,
         "role": staff.role,
         "department": staff.department,
         "shift": staff.shift,
@@ -232,75 +322,81 @@ def register_staff(staff: StaffCreate):
         "availability": staff.availability,
     }
 
-    staff_collection.insert_one(staff_doc)
+    try:
+        await staff_collection.insert_one(staff_doc)
+    except Exception:
+        await release_identity(ref)
+        raise
 
     return {"message": "Staff registered successfully", "staffId": staff.staffId}
 
 @router.post("/medicine-add", response_model=MedicineResponse)
-def add_medicine(med: MedicineCreate):
+async def add_medicine(med: MedicineCreate):
     # Auto-generate medicineId if not provided
     if not med.medicineId:
-        med.medicineId = "MED-" + str(1000 + pharmacy_collection.count_documents({}) + 1)
+        med.medicineId = await medicine_ids.next_id()
 
     # Check duplicate batch number for same medicine
-    existing = pharmacy_collection.find_one({
+    existing = await pharmacy_collection.find_one({
         "medicineName": med.medicineName,
         "batchNumber": med.batchNumber
     })
     if existing:
         raise HTTPException(status_code=400, detail="Medicine with this batch already exists")
 
+    expires_at = stock.parse_expiry(med.expiryDate)
+    if expires_at is None:
+        raise HTTPException(status_code=400, detail="Invalid expiryDate, use MM/YYYY or YYYY-MM-DD")
+
     med_doc = med.dict()
-    pharmacy_collection.insert_one(med_doc)
+    med_doc["expiresAt"] = expires_at
+    med_doc["inTotal"] = stock.in_total(expires_at)
+    await pharmacy_collection.insert_one(med_doc)
+    await stock.record_receipt(med_doc)
+    medicine_search.index.add(med_doc)
 
     return {"medicineId": med.medicineId, "message": "Medicine added successfully"}
 
 @router.post("/lab-report-add", response_model=LabReportResponse)
-def add_lab_report(report: LabReportCreate):
+async def add_lab_report(report: LabReportCreate):
     # Check if patient exists
-    patient = users_collection.find_one({"user_id": report.patientId, "role": "patient"})
+    patient = await users_collection.find_one({"user_id": report.patientId, "role": "patient"})
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
     # Generate report ID
-    report_id = "LAB-" + str(1000 + lab_report_collection.count_documents({}) + 1)
+    report_id = await lab_report_ids.next_id()
 
     report_doc = report.dict()
     report_doc["reportId"] = report_id
     report_doc["createdAt"] = datetime.now().isoformat()
 
-    lab_report_collection.insert_one(report_doc)
+    await lab_report_collection.insert_one(report_doc)
+    # Typed, unit-tagged analytes for range and trend queries
+    await lab_analytes.record(report_doc)
+    await bump(f"lab_reports:{report.patientId}")
 
     return {"reportId": report_id, "message": "Lab report saved successfully"}
 
 
 @router.post("/vitals/update")
-def update_patient_vitals(vitals: VitalsCreate):
+async def update_patient_vitals(vitals: VitalsCreate):
     try:
-        print("Id:",vitals.patient_id)
         # 🔍 Verify patient exists
-        patient = users_collection.find_one({
+        patient = await users_collection.find_one({
             "$or": [
                 {"user_id": vitals.patient_id},
                 {"mobile": vitals.patient_id}
             ]
-        })
-        print(patient)
+        }, {"_id": 1})
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
 
-        vitals_doc = {
-            "patient_id": vitals.patient_id,
-            "heart_rate": vitals.heart_rate,
-            "blood_pressure": vitals.blood_pressure,
-            "temperature": vitals.temperature,
-            "spo2": vitals.spo2,
-            "respiration_rate": vitals.respiration_rate,
-            "blood_sugar": vitals.blood_sugar,
-            "created_at": datetime.utcnow(),
-        }
+        vitals_doc = vitals_to_document(vitals)
 
-        vitals_collection.insert_one(vitals_doc)
+        await vitals_collection.insert_one(vitals_doc)
+        await early_warning.record(vitals_doc)
+        await bump(f"vitals:{vitals.patient_id}")
 
         return {
             "message": "Vitals updated successfully",
@@ -312,38 +408,58 @@ def update_patient_vitals(vitals: VitalsCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to update vitals")
 
-@router.get("/ward-bed-status/{ward}")
-def ward_bed_status(ward: str):
 
-    MAX_BEDS = 6
+@router.post("/vitals/bulk")
+async def bulk_ingest_vitals(request: Request):
+    """
+    Batch of VitalsCreate readings, as a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson). Returns a result per row.
+    """
+    return await ingest_vitals(iter_records(request))
 
-    occupied_beds = admission_collection.count_documents({"ward": ward})
+@router.post("/import/{kind}")
+async def bulk_import_rows(kind: str, request: Request):
+    """
+    Onboarding import: CSV (Content-Type: text/csv, header row), NDJSON or a
+    JSON array of PatientCreate / StaffCreate / UserMasterCreate /
+    MedicineCreate rows. Progress is visible on GET /admin/imports meanwhile.
+    """
+    if kind not in bulk_import.KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown import kind. Choose from {bulk_import.KINDS}")
+    job = await bulk_import.run_import(kind, iter_records(request))
+    return fast_response(job.summary())
 
-    available_beds = MAX_BEDS - occupied_beds
 
-    return {
-        "ward": ward,
-        "occupiedBeds": occupied_beds,
-        "availableBeds": available_beds,
-        "totalBeds": MAX_BEDS
-    }
-
-@router.get("/pending-discharges")
-def admin_get_pending_discharges():
-    # Fetch everyone who has a discharge_date but hasn't been finalized yet
-    cursor = db["appointments"].find({
-        "status": "Admitted",
-        "discharge_date": {"$ne": None}
-    })
-    
-    results = []
-    for doc in cursor.to_list(length=500):
-        results.append({
-            "id": str(doc["_id"]),
-            "patient_name": doc.get("patient_name"),
-            "doctor_name": doc.get("doctor_name"), # Ensure this is stored in appointment doc
-            "ward_no": doc.get("ward_no"),
-            "bed_no": doc.get("bed_no"),
-            "discharge_date": doc.get("discharge_date")
-        })
-    return results
\ No newline at end of file
+@router.get("/ward-bed-status/{ward}")
+async def ward_bed_status(ward: str):
+    return await beds.ward_occupancy(ward)
+
+
+@router.get("/wards/occupancy")
+async def all_wards_occupancy():
+    # Precomputed per-ward counters: one small read, O(wards)
+    return await beds.all_occupancy()
+
+
+@router.put("/wards/{ward}/capacity")
+async def set_ward_capacity(ward: str, data: WardCapacityUpdate):
+    if data.capacity < 0:
+        raise HTTPException(status_code=400, detail="Capacity must be positive")
+    await beds.set_capacity(ward, data.capacity)
+    return await beds.ward_occupancy(ward)
+
+@router.post("/exports/run")
+async def trigger_export(collections: Optional[List[str]] = None):
+    names = collections or list(exporter.EXPORTS)
+    unknown = set(names) - set(exporter.EXPORTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {sorted(unknown)}")
+    if not await exporter.start_export(names):
+        raise HTTPException(status_code=409, detail="An export is already running")
+    return {"message": "Export started", "collections": names}
+
+
+@router.get("/exports/status")
+async def export_status():
+    states = await exporter.export_state_collection.find({}, {"mark": 0}).to_list()
+    return {"running": exporter.is_running(), "collections": states}
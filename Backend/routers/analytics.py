@@ -0,0 +1,85 @@
+from datetime import date as Date
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+import rollups
+from serialization import fast_response
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# All answers come from the `rollups` buckets: one document per day
+# (or 24 hour documents), never a count over the raw collections.
+
+
+def _range(start, end, default_days=7):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    return rollups.day_range(start, end, default_days)
+
+
+# --- HOSPITAL TOTALS ---
+@router.get("/daily")
+async def get_daily(start: Optional[Date] = None, end: Optional[Date] = None):
+    # Appointments, emergency share, admissions, discharges, prescriptions per day
+    start, end = _range(start, end)
+    days = await rollups.days(start, end, {name: 1 for name in rollups.TOTALS})
+    return fast_response([{"date": day, **rollups.totals(doc)} for day, doc in days])
+
+
+@router.get("/hourly")
+async def get_hourly(date: Optional[Date] = None):
+    date = date or Date.today()
+    hours = await rollups.hours(date)
+    return fast_response([{"hour": hour, **rollups.totals(doc)} for hour, doc in hours])
+
+
+# --- PER DOCTOR ---
+@router.get("/doctors")
+async def get_doctors(start: Optional[Date] = None, end: Optional[Date] = None):
+    # Appointment count and emergency share per doctor over the range (default today)
+    start, end = _range(start, end, default_days=1)
+    days = await rollups.days(start, end, {"doctors": 1})
+    doctors = rollups.merge([doc for _, doc in days], "doctors")
+    return fast_response(sorted((
+        {
+            "doctorId": doctor_id,
+            "appointments": c.get("appointments", 0),
+            "emergency": c.get("emergency", 0),
+            "emergencyShare": round(c.get("emergency", 0) / c["appointments"], 3) if c.get("appointments") else 0.0,
+        }
+        for doctor_id, c in doctors.items()
+    ), key=lambda d: -d["appointments"]))
+
+
+@router.get("/doctors/{doctor_id}/daily")
+async def get_doctor_daily(doctor_id: str, start: Optional[Date] = None, end: Optional[Date] = None):
+    start, end = _range(start, end)
+    field = f"doctors.{rollups.key(doctor_id)}"
+    days = await rollups.days(start, end, {field: 1})
+    out = []
+    for day, doc in days:
+        c = doc.get("doctors", {}).get(rollups.key(doctor_id), {})
+        out.append({"date": day, "appointments": c.get("appointments", 0), "emergency": c.get("emergency", 0)})
+    return fast_response(out)
+
+
+# --- PER WARD / DEPARTMENT ---
+@router.get("/wards")
+async def get_wards(start: Optional[Date] = None, end: Optional[Date] = None):
+    start, end = _range(start, end)
+    days = await rollups.days(start, end, {"wards": 1})
+    wards = rollups.merge([doc for _, doc in days], "wards")
+    return fast_response([
+        {"ward": ward, "admissions": c.get("admissions", 0), "discharges": c.get("discharges", 0)}
+        for ward, c in sorted(wards.items())
+    ])
+
+
+@router.get("/departments")
+async def get_departments(start: Optional[Date] = None, end: Optional[Date] = None):
+    start, end = _range(start, end)
+    days = await rollups.days(start, end, {"departments": 1})
+    departments = rollups.merge([doc for _, doc in days], "departments")
+    return fast_response(sorted((
+        {"department": name, "prescriptions": c.get("prescriptions", 0)}
+        for name, c in departments.items()
+    ), key=lambda d: -d["prescriptions"]))
@@ -1,27 +1,32 @@
-from fastapi import APIRouter, HTTPException, Body
+import asyncio
+from fastapi import APIRouter, HTTPException, Body, Query, Response, WebSocket, WebSocketDisconnect
+from typing import Optional
 from datetime import datetime
 from database import appointments_collection
 from models import CreateAppointmentModel,DischargeUpdate
 from bson import ObjectId
+from pymongo import ReturnDocument
+import beds
+import discharge_queue
+import rollups
+from capacity import MAX_STANDARD, MAX_EMERGENCY, reserve_token, release_token, get_filled
+from pagination import set_next_cursor, DEFAULT_LIMIT, MAX_LIMIT
+from repositories import appointments as appointments_repo
+from serialization import fast_response, dumps
+from queue_events import bus as queue_events, Resync, PROJECTION as QUEUE_EVENT_PROJECTION
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
-MAX_STANDARD = 25
-MAX_EMERGENCY = 30 # Standard 25 + 5 Emergency
-
 
 # --- GET REGISTRATION STATUS ---
 @router.get("/doctor/{doctor_id}/registrations")
-def get_registration_status(doctor_id: str, date: str):
+async def get_registration_status(doctor_id: str, date: str):
     """
     Returns counts. We show the 'max' as 25 by default, 
     but the frontend handles the toggle logic.
     """
     try:
-        count = appointments_collection.count_documents({
-            "doctor_id": doctor_id,
-            "date": date
-        })
+        count = await get_filled(doctor_id, date)
 
         return {
             "doctor_id": doctor_id,
@@ -38,39 +43,42 @@ def get_registration_status(doctor_id: str, date: str):
 
 # --- CREATE APPOINTMENT ---
 @router.post("/create")
-def create_appointment(data: CreateAppointmentModel):
+async def create_appointment(data: CreateAppointmentModel):
     try:
-        # 1. Check current count for this doctor/date
-        count = appointments_collection.count_documents({
-            "doctor_id": data.doctor_id,
-            "date": data.date
-        })
-
-        # 2. Determine limit based on the incoming request type
+        # 1. Atomically take a token against the doctor/date ledger.
         # If it's an emergency booking, we allow up to 30.
         # If standard, we stop at 25.
-        current_limit = MAX_EMERGENCY if data.is_emergency else MAX_STANDARD
+        token_number = await reserve_token(data.doctor_id, data.date, data.is_emergency)
 
-        if count >= current_limit:
+        if token_number is None:
+            current_limit = MAX_EMERGENCY if data.is_emergency else MAX_STANDARD
             limit_type = "Emergency" if data.is_emergency else "Standard"
             raise HTTPException(
                 status_code=400,
                 detail=f"{limit_type} registration limit reached ({current_limit} slots)"
             )
 
-        # 3. Prepare data
+        # 2. Prepare data
         appointment = data.dict()
         appointment["created_at"] = datetime.now()
+        appointment["token_number"] = token_number
         
         # If it's an admin emergency booking, we might want to auto-confirm it
         if data.is_emergency:
             appointment["status"] = "Confirmed"
 
-        appointments_collection.insert_one(appointment)
+        try:
+            await appointments_collection.insert_one(appointment)
+        except Exception:
+            # Booking not saved: hand the slot back
+            await release_token(data.doctor_id, data.date, data.is_emergency)
+            raise
+        queue_events.publish(appointment)
+        await rollups.appointment_booked(appointment)
 
         return {
             "message": "Appointment registered successfully",
-            "token_number": count + 1,
+            "token_number": token_number,
             "type": "Emergency" if data.is_emergency else "Standard"
         }
 
@@ -82,38 +90,81 @@ def create_appointment(data: CreateAppointmentModel):
 
 # --- DOCTOR TODAY LIST ---
 @router.get("/doctor/{doctor_id}/today")
-def get_today_appointments(doctor_id: str):
+async def get_today_appointments(
+    doctor_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     today = datetime.now().strftime("%Y-%m-%d")
+    view = appointments_repo.TODAY
+    names = view.select(fields)
+
+    # Emergency FIRST, then by time of booking
+    docs, next_cursor = await appointments_repo.today_page(
+        doctor_id, today, limit, cursor, view.projection(names)
+    )
+    set_next_cursor(response, next_cursor)
+
+    appointments = [view.shape(doc, names) for doc in docs]
+
+    return fast_response(appointments, response)
+
+
+# --- DOCTOR TODAY LIST (LIVE) ---
+async def _send_snapshot(websocket: WebSocket, doctor_id: str, today: str):
+    view = appointments_repo.TODAY
+    docs, _ = await appointments_repo.today_page(doctor_id, today, MAX_LIMIT, None, view.projection())
+    await websocket.send_text(dumps({
+        "type": "snapshot",
+        "date": today,
+        "appointments": [view.shape(doc) for doc in docs],
+    }).decode())
+
+
+async def _wait_disconnect(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
 
-    # Change: Added .sort([("is_emergency", -1), ("created_at", 1)])
-    # This sorts by Emergency FIRST (True/1 comes before False/0), 
-    # then by time of booking.
-    cursor = appointments_collection.find({
-        "doctor_id": doctor_id,
-        "date": today
-    }).sort([
-        ("is_emergency", -1), 
-        ("created_at", 1)
-    ])
-
-    appointments = []
-
-    for doc in cursor:
-        appointments.append({
-            "id": str(doc["_id"]),
-            "patientId": doc.get("patient_id"),
-            "phone": doc.get("mobilenumber"),
-            "reason": doc.get("reason"),
-            "date": doc.get("date"),
-            "status": doc.get("status"),
-            "is_emergency": doc.get("is_emergency", False) # <--- Ensure this is returned
-        })
-
-    return appointments
+
+@router.websocket("/doctor/{doctor_id}/live")
+async def live_today_appointments(websocket: WebSocket, doctor_id: str):
+    """Snapshot of today's queue, then one event per booking / status change."""
+    await websocket.accept()
+    # Subscribe before the snapshot so no write falls between the two
+    subscription = queue_events.subscribe(doctor_id)
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        today = datetime.now().strftime("%Y-%m-%d")
+        await _send_snapshot(websocket, doctor_id, today)
+        while True:
+            next_event = asyncio.create_task(subscription.get())
+            await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_event.cancel()
+                break
+            today = datetime.now().strftime("%Y-%m-%d")
+            try:
+                event = next_event.result()
+            except Resync:
+                # Fell behind: replace the client's list instead of replaying
+                await _send_snapshot(websocket, doctor_id, today)
+                continue
+            if event["date"] == today:
+                await websocket.send_text(dumps(event).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+        disconnected.cancel()
 
 # --- UPDATE STATUS ---
 @router.put("/status")
-def update_status(payload: dict = Body(...)):
+async def update_status(payload: dict = Body(...)):
 
     appointment_id = payload.get("id")
     status = payload.get("status")
@@ -121,44 +172,43 @@ def update_status(payload: dict = Body(...)):
     if not appointment_id or not status:
         raise HTTPException(status_code=400, detail="Missing id or status")
 
-    result = appointments_collection.update_one(
+    result = await appointments_collection.find_one_and_update(
         {"_id": ObjectId(appointment_id)},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        projection=QUEUE_EVENT_PROJECTION,
+        return_document=ReturnDocument.AFTER,
     )
 
-    if result.matched_count == 0:
+    if result is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    queue_events.publish(result)
 
     return {"message": "Status updated"}
 
 @router.get("/doctor/{doctor_id}/ipd")
-def get_doctor_in_patients(doctor_id: str):
-    # Query for patients assigned to this doctor who are currently 'Admitted'
-    cursor = appointments_collection.find({
-        "doctor_id": doctor_id,
-        "is_ipd": True,
-        "status": "Admitted"
-    })
-    
-    patients = []
-    for doc in cursor.to_list(length=100):
-        patients.append({
-            "id": str(doc["_id"]),
-            "patient_name": doc.get("patient_name"),
-            "age": doc.get("age"),
-            "gender": doc.get("gender"),
-            "ward_no": doc.get("ward_no"),
-            "bed_no": doc.get("bed_no"),
-            "admission_date": doc.get("admission_date"),
-            "reason": doc.get("reason")
-        })
-    return patients
+async def get_doctor_in_patients(
+    doctor_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    view = appointments_repo.IPD
+    names = view.select(fields)
+    # Patients assigned to this doctor who are currently 'Admitted'
+    docs, next_cursor = await appointments_repo.ipd_page(
+        doctor_id, limit, cursor, view.projection(names)
+    )
+    set_next_cursor(response, next_cursor)
+
+    patients = [view.shape(doc, names) for doc in docs]
+    return fast_response(patients, response)
 
 @router.put("/{patient_id}/discharge")
-def discharge_patient(patient_id: str, data: DischargeUpdate):
+async def discharge_patient(patient_id: str, data: DischargeUpdate):
     try:
         # Update the document: Set status to Discharged and save the date
-        result = appointments_collection.update_one(
+        result = await appointments_collection.find_one_and_update(
             {"_id": ObjectId(patient_id)},
             {
                 "$set": {
@@ -166,24 +216,37 @@ def discharge_patient(patient_id: str, data: DischargeUpdate):
                     "discharge_date": data.discharge_date,
                     "is_ipd": False # Optional: Move them out of IPD active list
                 }
-            }
+            },
+            projection={"patient_id": 1, "patient_name": 1, "doctor_id": 1, "doctor_name": 1,
+                        "ward_no": 1, "bed_no": 1},
         )
         
-        if result.modified_count == 0:
+        if result is None:
             raise HTTPException(status_code=404, detail="Patient record not found")
+
+        # Bed stays occupied until an admin confirms the physical discharge
+        await discharge_queue.enqueue(result, data.discharge_date)
             
         return {"message": "Patient discharged successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _release_bed(appointment):
+    # Free the bed held by this in-patient (no-op if already released)
+    freed = await beds.release(appointment.get("ward_no"), appointment.get("bed_no"))
+    if freed is None and appointment.get("patient_id"):
+        await beds.release(patient_id=appointment["patient_id"])
+
 
 @router.put("/{patient_id}/finalize-discharge")
-def finalize_discharge(patient_id: str):
+async def finalize_discharge(patient_id: str):
     from datetime import datetime
     
-    result = appointments_collection.update_one(
+    result = await appointments_collection.find_one_and_update(
         {"_id": ObjectId(patient_id)},
         {
             "$set": {
@@ -191,6 +254,13 @@ def finalize_discharge(patient_id: str):
                 "is_ipd": False,
                 "admin_confirmed_at": datetime.now().strftime("%Y-%m-%d %H:%M")
             }
-        }
+        },
+        projection={"patient_id": 1, "ward_no": 1, "bed_no": 1, "admin_confirmed_at": 1},
     )
+    if result is not None:
+        await discharge_queue.remove(result["_id"])
+        await _release_bed(result)
+        if not result.get("admin_confirmed_at"):
+            # Count each discharge once, not on every repeated confirm
+            await rollups.patient_discharged(result.get("ward_no"), datetime.now())
     return {"message": "Patient records updated and bed cleared."}
\ No newline at end of file
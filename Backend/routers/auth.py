@@ -1,9 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from database import users_collection,doctors_collection
+from database import db, users_collection
 import random
 from models import RegisterRequest,LoginModel,RegisterRequest
 from bson import ObjectId
+from etags import bump
+from identities import claim as claim_identity, release as release_identity, resolve as resolve_identity, exists as identity_exists
+from pymongo.errors import DuplicateKeyError
+from passwords import hash_password, verify_password
+from patient_search import search_terms
+import asyncio
 
 router = APIRouter()
 
@@ -11,66 +17,88 @@ def generate_patient_id():
     return f"PID-{random.randint(100000, 999999)}"
 
 
+_rehash_tasks = set()
+
+
+async def _rehash(identity, old, password):
+    try:
+        hashed = await hash_password(password)
+        # Only replace what we verified against, never a newer password
+        await db[identity["collection"]].update_one(
+            {"_id": identity["ref"], "password": old}, {"$set": {"password": hashed}}
+        )
+    except Exception as e:
+        print("Password rehash failed:", e)
+
+
 # ----------- ROUTES -----------
 
 @router.post("/register")
-def register_user(data: RegisterRequest):
+async def register_user(data: RegisterRequest):
     # Validate passwords
     if data.password != data.confirmPassword:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
     # Check if phone already exists
-    if users_collection.find_one({"phone": data.phone}):
+    if await identity_exists(data.phone):
         raise HTTPException(status_code=400, detail="Phone already registered")
 
-    # Generate patient ID
-    user_id = generate_patient_id()
+    password = await hash_password(data.password)
+
+    # Generate patient ID and claim both login handles
+    ref = ObjectId()
+    for _ in range(5):
+        user_id = generate_patient_id()
+        try:
+            await claim_identity([user_id, data.phone], [], "patient", users_collection, ref, user_id)
+            break
+        except DuplicateKeyError:
+            if await identity_exists(data.phone):
+                raise HTTPException(status_code=400, detail="Phone already registered")
+    else:
+        raise HTTPException(status_code=500, detail="Could not allocate patient ID")
 
     # Save in DB
-    result = users_collection.insert_one({
-        "user_id": user_id,
-        "name": data.name,
-        "dob": data.dob,
-        "mobile": data.phone,
-        "password": data.password,  # 🔒 Ideally hash this!
-        "role": "patient"
-    })
+    try:
+        result = await users_collection.insert_one({
+            "_id": ref,
+            "user_id": user_id,
+            "name": data.name,
+            "dob": data.dob,
+            "mobile": data.phone,
+            "password": password,
+            "role": "patient",
+            "search_terms": search_terms(data.name, data.phone, user_id),
+        })
+    except Exception:
+        await release_identity(ref)
+        raise
+    await bump(f"patient:{user_id}", f"patient:{data.phone}")
     return {"message": "Registered successfully", "user_id": user_id}
 
 
 @router.post("/login")
-def login_user(data: LoginModel):
-    user = None
-    role = None
-
-    # 1️⃣ Try users collection first
-    user = users_collection.find_one({"user_id": data.phone})
-    if not user:
-        user = users_collection.find_one({"mobile": data.phone})
-
-    # 2️⃣ If not found, try doctors collection
-    if not user:
-        user = doctors_collection.find_one({"doctorId": data.phone})
-        if not user:
-            user = doctors_collection.find_one({"contact": data.phone})
-        if user:
-            role = "doctor"
-
-    # 3️⃣ If found in users collection
-    if user and not role:
-        role = user.get("role", "patient")
-
-    # 4️⃣ Validate password
-    if not user or user["password"] != data.password:
+async def login_user(data: LoginModel):
+    # One indexed lookup resolves user_id / mobile / doctorId / contact / adminId / staffId
+    identity, user = await resolve_identity(data.phone)
+
+    # Validate password (argon2 runs in the hashing process pool)
+    ok, needs_rehash = await verify_password(user and user.get("password"), data.password)
+    if not ok:
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials"
         )
 
+    # Upgrade plaintext / outdated hashes without holding up the response
+    if needs_rehash:
+        task = asyncio.create_task(_rehash(identity, user["password"], data.password))
+        _rehash_tasks.add(task)
+        task.add_done_callback(_rehash_tasks.discard)
+
     return {
         "message": "Login successful",
-        "user_id": user.get("user_id") or user.get("doctorId"),
+        "user_id": identity["principal_id"],
         "name": user["name"],
-        "role": role
+        "role": identity["role"]
     }
-
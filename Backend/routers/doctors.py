@@ -1,44 +1,86 @@
-from fastapi import APIRouter,HTTPException
-from typing import List
+from fastapi import APIRouter,HTTPException,Request,Response,Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
 from models import Doctor,PrescriptionPayload
 from database import doctors_collection,prescription_collection
 from datetime import datetime
+from etags import conditional, bump
+from doctor_photos import open_photo
+from pagination import set_next_cursor, DEFAULT_LIMIT, MAX_LIMIT
+from repositories import doctors as doctors_repo
+from serialization import fast_response
+import rollups
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
-@router.get("/", response_model=List[Doctor])
-def list_doctors():
-    docs = doctors_collection.find()  # Mongo cursor
-    doctors = []
-    for doc in docs:
-        doctors.append(
-            Doctor(
-                id=str(doc.get("doctorId")),
-                name=str(doc.get("name")),
-                specialty=str(doc.get("roleOrSpec")).strip(),
-                contact=str(doc.get("contact")),
-                status=str(doc.get("status")).strip(),
-                timeSlots=doc.get("timeSlots", [])
-            )
-        )
-    return doctors
+@router.get("/", response_model=List[Doctor], dependencies=[conditional("doctors")])
+async def list_doctors(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    view = doctors_repo.DIRECTORY
+    names = view.select(fields)
+    # Only the directory fields -- pictures live in GridFS
+    docs, next_cursor = await doctors_repo.page(limit, cursor, view.projection(names))
+    set_next_cursor(response, next_cursor)
+    # Already shaped like Doctor -- skip re-validation and jsonable_encoder
+    doctors = [view.shape(doc, names) for doc in docs]
+    return fast_response(doctors, response)
 
 @router.get("/{user_id}")
-def get_user(user_id: str):
-    user = doctors_collection.find_one({"doctorId": user_id}, {"_id": 0})
+async def get_user(user_id: str):
+    user = await doctors_repo.find_profile(user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    if user.pop("profile_pic_id", None):
+        user["profile_pic_url"] = f"/doctors/{user_id}/photo"
+        user["profile_thumb_url"] = f"/doctors/{user_id}/photo?size=thumb"
+
     return user
 
 
+@router.get("/{user_id}/photo")
+async def get_photo(user_id: str, request: Request, size: str = "full"):
+    doc = await doctors_collection.find_one(
+        {"doctorId": user_id}, {"profile_pic_id": 1, "profile_thumb_id": 1}
+    )
+    file_id = doc and doc.get("profile_thumb_id" if size == "thumb" else "profile_pic_id")
+    if not file_id:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    # A new upload gets a new file id, so the id is an immutable validator
+    headers = {"ETag": f'"{file_id}"', "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    stream = await open_photo(file_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    async def chunks():
+        try:
+            while chunk := await stream.readchunk():
+                yield chunk
+        finally:
+            await stream.close()
+
+    headers["Content-Length"] = str(stream.length)
+    media_type = (stream.metadata or {}).get("contentType", "image/jpeg")
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
+
+
 @router.post("/save-prescriptions")
-def create_prescription(payload: PrescriptionPayload):
+async def create_prescription(payload: PrescriptionPayload):
     data = payload.dict()
     data["timestamp"] = datetime.utcnow()
 
-    result = prescription_collection.insert_one(data)
+    result = await prescription_collection.insert_one(data)
+    await bump(f"prescriptions:{payload.patientId}")
+    await rollups.prescription_saved(payload.doctorDepartment, data["timestamp"])
 
     return {
         "message": "Prescription saved successfully",
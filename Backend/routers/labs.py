@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+import lab_trends
+from lab_analytes import ANALYTES
+from serialization import fast_response
+
+router = APIRouter(prefix="/labs", tags=["Labs"])
+
+
+def _check_code(code):
+    if code not in ANALYTES:
+        raise HTTPException(status_code=400, detail=f"Unknown analyte {code}. Available: {list(ANALYTES)}")
+
+
+# --- ANALYTE CATALOG ---
+@router.get("/analytes")
+async def list_analytes():
+    return [
+        {"code": code, "label": label, "unit": unit, "reference": [low, high]}
+        for code, (label, unit, low, high, _) in ANALYTES.items()
+    ]
+
+
+# --- COHORT RANGE QUERY ---
+@router.get("/results")
+async def search_results(
+    code: str,
+    min: Optional[float] = None,
+    max: Optional[float] = None,
+    days: Optional[int] = Query(None, ge=1, le=3650),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    # e.g. ?code=fasting_glucose&min=200&days=7
+    _check_code(code)
+    since = datetime.now() - timedelta(days=days) if days else None
+    return fast_response(await lab_trends.find_results(code, min, max, since, limit=limit))
+
+
+# --- TRENDS ---
+@router.get("/patient/{patient_id}/trend")
+async def get_patient_trend(
+    patient_id: str,
+    codes: Optional[str] = None,
+    days: int = Query(365, ge=1, le=3650),
+):
+    selected = [c.strip() for c in codes.split(",") if c.strip()] if codes else None
+    for code in selected or []:
+        _check_code(code)
+    return fast_response(await lab_trends.patient_trend(patient_id, selected, days))
+
+
+@router.get("/cohort/trend")
+async def get_cohort_trend(
+    code: str,
+    days: int = Query(90, ge=1, le=730),
+    bucket: str = Query("week", pattern="^(day|week|month)$"),
+):
+    _check_code(code)
+    return fast_response(await lab_trends.cohort_trend(code, days, bucket))
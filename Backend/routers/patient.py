@@ -1,118 +1,111 @@
-from fastapi import APIRouter, HTTPException
-from database import lab_report_collection, users_collection,prescription_collection,vitals_collection
+from fastapi import APIRouter, HTTPException, Query, Response
+from database import vitals_collection
 from models import PatientProfile,PrescriptionOut
-from typing import List
+from typing import List, Optional
+import asyncio
 from datetime import datetime
+from etags import conditional
+from pagination import set_next_cursor, DEFAULT_LIMIT, MAX_LIMIT
+from serialization import fast_response
+from vitals_store import RESOLUTIONS, NUMERIC_FIELDS, downsample_pipeline, shape_bucket, default_window
+import patient_search
+from repositories import patients, prescriptions as prescriptions_repo, lab_reports as lab_reports_repo, vitals as vitals_repo
 router = APIRouter(prefix="/patient", tags=["Lab Reports"])
 
-@router.get("/lab-reports/{patientId}")
-def get_lab_reports_by_patient(patientId: str):
+SUMMARY_SECTIONS = ["profile", "latest_vitals", "recent_vitals", "prescriptions", "lab_reports"]
+
+
+@router.get("/lab-reports/{patientId}", dependencies=[conditional("lab_reports:{patientId}")])
+async def get_lab_reports_by_patient(
+    patientId: str,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    view = lab_reports_repo.VIEW
+    names = view.select(fields)
 
     # Fetch patient
-    patient = users_collection.find_one(
-        {"user_id": patientId, "role": "patient"}
-    )
+    patient = await patients.find_patient(patientId, {"name": 1})
 
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    reports = list(lab_report_collection.find({"patientId": patientId}))
+    reports, next_cursor = await lab_reports_repo.page(patientId, limit, cursor, view.projection(names))
+    set_next_cursor(response, next_cursor)
 
-    if not reports:
+    if not reports and not cursor:
         raise HTTPException(status_code=404, detail="No lab reports found")
 
-    for r in reports:
-        r["_id"] = str(r["_id"])
-
-    return {
+    # ObjectId / datetime are encoded natively by the fast path
+    return fast_response({
         "patientId": patientId,
         "patientName": patient["name"],
-        "reports": reports
-    }
+        "reports": [view.shape(r, names) for r in reports],
+        "next_cursor": next_cursor
+    }, response)
 
 
-@router.get("/{patient_id}", response_model=PatientProfile)
-def get_patient_profile(patient_id: str):
-    try:
-        print("Patient ID:",patient_id)
-        patient = users_collection.find_one({
-            "$or": [
-                {"user_id": patient_id},
-                {"mobile": patient_id}
-            ]
-        })
-        print(patient)
-        if not patient:
-            raise HTTPException(status_code=404, detail="Patient not found")
-
-        return {
-            "id": str(patient["_id"]),
-            "user_id": patient["user_id"],
-            "role": patient["role"],
-            "name": patient["name"],
-            "dob": patient["dob"],
-            "mobile": patient["mobile"]
-        }
+# Declared before /{patient_id} so the path is not captured by it
+@router.get("/search")
+async def search_patients(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(patient_search.SEARCH_LIMIT, ge=1, le=100),
+):
+    # e.g. "ramesh k 4411": name / soundex / phone fragment / ID prefix, ranked
+    return fast_response(await patient_search.search(q, limit))
 
-    except HTTPException:
-        raise
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid patient_id")
-
-
-@router.get("/prescriptions/{patient_id}", response_model=List[PrescriptionOut])
-def get_prescriptions(patient_id: str):
-    prescriptions = []
-
-    cursor = prescription_collection.find({"patientId": patient_id})
-
-    for doc in cursor:
-        prescriptions.append({
-            "id": str(doc["_id"]),
-            "patientId": doc["patientId"],
-            "doctorName": doc["doctorName"],
-            "doctorRole": doc["doctorRole"],
-            "doctorDepartment": doc["doctorDepartment"],
-            "disease": doc.get("disease"),
-            "status": doc.get("status", "Current"),
-            "dateIssued": (
-                doc["timestamp"]
-                if isinstance(doc.get("timestamp"), datetime)
-                else None
-            ),
-            "medications": doc.get("medications", [])
-        })
-
-    if not prescriptions:
+
+@router.get("/{patient_id}", response_model=PatientProfile, dependencies=[conditional("patient:{patient_id}")])
+async def get_patient_profile(patient_id: str, response: Response, fields: Optional[str] = None):
+    view = patients.PROFILE
+    names = view.select(fields)
+    patient = await patients.find_by_handle(patient_id, view.projection(names))
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    return fast_response(view.shape(patient, names), response)
+
+
+@router.get("/prescriptions/{patient_id}", response_model=List[PrescriptionOut], dependencies=[conditional("prescriptions:{patient_id}")])
+async def get_prescriptions(
+    patient_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    view = prescriptions_repo.VIEW
+    names = view.select(fields)
+
+    docs, next_cursor = await prescriptions_repo.page(patient_id, limit, cursor, view.projection(names))
+    set_next_cursor(response, next_cursor)
+
+    prescriptions = [view.shape(doc, names) for doc in docs]
+
+    if not prescriptions and not cursor:
         raise HTTPException(
             status_code=404,
             detail="No prescriptions found for this patient"
         )
 
-    return prescriptions
+    return fast_response(prescriptions, response)
 
 
 
 @router.get("/vitals/{patient_id}")
-def get_latest_vitals(patient_id: str):
+async def get_latest_vitals(patient_id: str, fields: Optional[str] = None):
+    view = vitals_repo.LATEST
+    names = view.select(fields)
     try:
-        vitals = vitals_collection.find_one(
-            {"patient_id": patient_id},
-            sort=[("created_at", -1)]
-        )
+        vitals = await vitals_repo.latest(patient_id, view.projection(names))
 
         if not vitals:
             raise HTTPException(status_code=404, detail="No vitals found")
 
-        return {
-            "heart_rate": vitals.get("heart_rate"),
-            "blood_pressure": vitals.get("blood_pressure"),
-            "temperature": vitals.get("temperature"),
-            "spo2": vitals.get("spo2"),
-            "respiration_rate": vitals.get("respiration_rate"),
-            "blood_sugar": vitals.get("blood_sugar"),
-            "created_at": vitals.get("created_at")
-        }
+        return fast_response(view.shape(vitals, names))
 
     except HTTPException:
         raise
@@ -123,31 +116,26 @@ def get_latest_vitals(patient_id: str):
         )
 
 
-@router.get("/vitals/all/{patient_id}")
-def get_all_vitals(patient_id: str):
+@router.get("/vitals/all/{patient_id}", dependencies=[conditional("vitals:{patient_id}")])
+async def get_all_vitals(
+    patient_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    view = vitals_repo.READING
+    names = view.select(fields)
     try:
-        cursor = vitals_collection.find(
-            {"patient_id": patient_id}
-        ).sort("created_at", -1)
-
-        vitals_list = []
-
-        for vitals in cursor:
-            vitals_list.append({
-                "id": str(vitals["_id"]),
-                "heart_rate": vitals.get("heart_rate"),
-                "blood_pressure": vitals.get("blood_pressure"),
-                "temperature": vitals.get("temperature"),
-                "spo2": vitals.get("spo2"),
-                "respiration_rate": vitals.get("respiration_rate"),
-                "blood_sugar": vitals.get("blood_sugar"),
-                "created_at": vitals.get("created_at")
-            })
-
-        if not vitals_list:
+        docs, next_cursor = await vitals_repo.page(patient_id, limit, cursor, view.projection(names))
+        set_next_cursor(response, next_cursor)
+
+        vitals_list = [view.shape(v, names) for v in docs]
+
+        if not vitals_list and not cursor:
             raise HTTPException(status_code=404, detail="No vitals found")
 
-        return vitals_list
+        return fast_response(vitals_list, response)
 
     except HTTPException:
         raise
@@ -155,4 +143,98 @@ def get_all_vitals(patient_id: str):
         raise HTTPException(
             status_code=500,
             detail="Failed to fetch vitals history"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/vitals/series/{patient_id}")
+async def get_vitals_series(
+    patient_id: str,
+    resolution: str = "1h",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Vitals over a time window. resolution=raw returns readings, otherwise
+    min/max/avg/last per bucket (5m, 1h, 1d) computed in Mongo.
+    """
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(RESOLUTIONS)}")
+
+    start, end = default_window(start, end)
+
+    if resolution == "raw":
+        projection = {"_id": 0, "created_at": 1, "blood_pressure": 1, **{f: 1 for f in NUMERIC_FIELDS}}
+        cursor = vitals_collection.find(
+            {"patient_id": patient_id, "created_at": {"$gte": start, "$lt": end}},
+            projection,
+        ).sort("created_at", 1).limit(limit)
+        points = await cursor.to_list()
+    else:
+        pipeline = downsample_pipeline(patient_id, start, end, resolution) + [{"$limit": limit}]
+        cursor = await vitals_collection.aggregate(pipeline)
+        points = [shape_bucket(row) async for row in cursor]
+
+    return fast_response({
+        "patient_id": patient_id,
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+        "points": points,
+    })
+
+
+@router.get("/{patient_id}/summary")
+async def get_patient_summary(
+    patient_id: str,
+    include: Optional[str] = None,
+    recent: int = Query(20, ge=1, le=MAX_LIMIT),
+):
+    """
+    Everything a doctor screen needs for one patient in a single round trip.
+    The patient is resolved once, then the selected sections
+    (include=profile,latest_vitals,recent_vitals,prescriptions,lab_reports)
+    are fetched concurrently.
+    """
+    sections = SUMMARY_SECTIONS if not include else [s.strip() for s in include.split(",") if s.strip()]
+    unknown = set(sections) - set(SUMMARY_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {sorted(unknown)}")
+
+    patient = await patients.find_by_handle(patient_id, patients.PROFILE.projection())
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    # Readings and reports may have been filed under either handle
+    ids = list({i for i in (patient.get("user_id"), patient.get("mobile"), patient_id) if i})
+
+    async def profile():
+        return patients.PROFILE.shape(patient)
+
+    async def latest_vitals():
+        view = vitals_repo.LATEST
+        vitals = await vitals_repo.latest(ids, view.projection())
+        return view.shape(vitals) if vitals else None
+
+    async def recent_vitals():
+        view = vitals_repo.READING
+        return [view.shape(v) for v in await vitals_repo.recent(ids, recent, view.projection())]
+
+    async def prescriptions():
+        view = prescriptions_repo.VIEW
+        return [view.shape(d) for d in await prescriptions_repo.recent_active(ids, recent, view.projection())]
+
+    async def lab_reports():
+        view = lab_reports_repo.VIEW
+        return [view.shape(r) for r in await lab_reports_repo.recent(ids, recent, view.projection())]
+
+    fetchers = {
+        "profile": profile,
+        "latest_vitals": latest_vitals,
+        "recent_vitals": recent_vitals,
+        "prescriptions": prescriptions,
+        "lab_reports": lab_reports,
+    }
+    results = await asyncio.gather(*(fetchers[name]() for name in sections))
+
+    return fast_response({"patient_id": patient.get("user_id") or patient_id, **dict(zip(sections, results))})
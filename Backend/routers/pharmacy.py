@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from models import DispenseRequest, ReorderLevelUpdate
+import medicine_search
+import stock
+from serialization import fast_response
+
+router = APIRouter(prefix="/pharmacy", tags=["Pharmacy"])
+
+
+# --- MEDICINE TYPE-AHEAD ---
+@router.get("/search")
+async def search_medicines(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(medicine_search.SEARCH_LIMIT, ge=1, le=medicine_search.MAX_SEARCH_LIMIT),
+):
+    # Served from the in-memory index, no database round trip
+    return fast_response(medicine_search.index.search(q, limit))
+
+
+# --- STOCK LEDGER ---
+@router.post("/dispense")
+async def dispense_medicine(data: DispenseRequest):
+    if data.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    try:
+        issued = await stock.dispense(data.medicineName, data.quantity, data.reference)
+    except stock.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"medicineName": data.medicineName, "dispensed": issued}
+
+
+@router.get("/stock/{medicine_name}")
+async def get_medicine_stock(medicine_name: str):
+    doc = await stock.get_stock(medicine_name)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    return doc
+
+
+@router.put("/stock/{medicine_name}/reorder-level")
+async def update_reorder_level(medicine_name: str, data: ReorderLevelUpdate):
+    if data.reorderLevel < 0:
+        raise HTTPException(status_code=400, detail="Reorder level cannot be negative")
+    return stock.stock_out(await stock.set_reorder_level(medicine_name, data.reorderLevel))
+
+
+@router.get("/expiring")
+async def get_expiring_batches(days: int = Query(30, ge=0, le=3650)):
+    # Batches with stock left expiring within `days` (expired ones first)
+    until = datetime.now() + timedelta(days=days)
+    return fast_response(await stock.expiring(until))
+
+
+@router.get("/low-stock")
+async def get_low_stock():
+    return fast_response(await stock.low_stock())
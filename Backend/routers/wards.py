@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+import early_warning
+from serialization import fast_response
+
+router = APIRouter(prefix="/wards", tags=["Wards"])
+
+
+# --- EARLY-WARNING BOARD ---
+@router.post("/early-warning/recompute")
+async def recompute_early_warning():
+    # Rescore every snapshot after NEWS2_BANDS change
+    changed = await early_warning.recompute()
+    return {"message": "Early-warning scores recomputed", "changed": changed}
+
+
+@router.get("/{ward}/early-warning")
+async def get_early_warning(ward: str):
+    patients = await early_warning.ward_board(ward)
+    return fast_response({
+        "ward": ward,
+        "patients": patients,
+        "high": sum(1 for p in patients if p["risk"] == "high"),
+        "medium": sum(1 for p in patients if p["risk"] == "medium"),
+    })
@@ -0,0 +1,57 @@
+"""
+Fast-path JSON responses.
+
+ORJSONResponse encodes with orjson and understands ObjectId, datetime and
+the other BSON types directly, so Mongo documents can be returned as-is.
+It is the app-wide default response class (see main.py).
+
+Returning a plain dict from a handler still goes through FastAPI's
+jsonable_encoder (and response_model validation). Hot endpoints return
+fast_response(...) instead, which hands the content straight to orjson.
+"""
+import base64
+from decimal import Decimal
+import orjson
+from bson import ObjectId, Decimal128, Binary
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (Binary, bytes)):
+        return base64.b64encode(obj).decode()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def fast_response(content, response: Response = None, status_code=200):
+    """Serialize `content` directly, keeping headers set on the injected `response`
+    (ETag, X-Next-Cursor, ...)."""
+    headers = None
+    if response is not None:
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() not in ("content-length", "content-type")
+        }
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,285 @@
+"""Pharmacy stock: batch expiry dates, per-medicine totals in `medicine_stock`, FEFO dispensing and `stock_ledger`."""
+import calendar
+import os
+import time
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from database import db, pharmacy_collection
+
+REORDER_LEVEL = int(os.getenv("REORDER_LEVEL", "10"))
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+
+medicine_stock_collection = db["medicine_stock"]
+stock_ledger_collection = db["stock_ledger"]
+
+
+class InsufficientStock(Exception):
+    def __init__(self, medicine, requested, available):
+        super().__init__(f"Only {available} of {requested} units of {medicine} available")
+        self.available = available
+
+
+def parse_expiry(value):
+    """Expiry string -> datetime at the end of that day/month. Returns None if unparseable."""
+    value = (value or "").strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).replace(hour=23, minute=59, second=59)
+        except ValueError:
+            pass
+    for fmt in ("%m/%Y", "%m-%Y", "%Y-%m", "%m/%y"):
+        try:
+            month = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        last_day = calendar.monthrange(month.year, month.month)[1]
+        return month.replace(day=last_day, hour=23, minute=59, second=59)
+    return None
+
+
+def _adjust_total(delta, batches=0):
+    # Pipeline update so belowReorder is recomputed from the new total in the same write
+    return [
+        {"$set": {
+            "totalQty": {"$add": [{"$ifNull": ["$totalQty", 0]}, delta]},
+            "batches": {"$add": [{"$ifNull": ["$batches", 0]}, batches]},
+            "reorderLevel": {"$ifNull": ["$reorderLevel", REORDER_LEVEL]},
+        }},
+        {"$set": {"belowReorder": {"$lt": ["$totalQty", "$reorderLevel"]}}},
+    ]
+
+
+async def _ledger(entries):
+    if entries:
+        await stock_ledger_collection.insert_many(entries)
+
+
+async def record_receipt(batch):
+    """Call after inserting a pharmacy batch document."""
+    await record_receipts([batch])
+
+
+def in_total(expires_at, now=None):
+    """`inTotal` for a new batch: only unexpired stock counts toward totalQty."""
+    return expires_at > (now or datetime.now())
+
+
+async def record_receipts(batches):
+    """Batch form of record_receipt (bulk import): one bulk write plus one ledger insert."""
+    totals = {}
+    for batch in batches:
+        qty, count = totals.get(batch["medicineName"], (0, 0))
+        usable = batch["stockQty"] if batch.get("inTotal") else 0
+        totals[batch["medicineName"]] = (qty + usable, count + 1)
+    if not totals:
+        return
+    await medicine_stock_collection.bulk_write([
+        UpdateOne({"_id": name}, _adjust_total(qty, count), upsert=True)
+        for name, (qty, count) in totals.items()
+    ], ordered=False)
+    now = datetime.now()
+    await _ledger([{
+        "medicineName": batch["medicineName"],
+        "batchNumber": batch["batchNumber"],
+        "qty": batch["stockQty"],
+        "reason": "receipt",
+        "at": now,
+    } for batch in batches])
+
+
+async def _take_from_earliest(medicine, remaining, now):
+    """Atomically take up to `remaining` from the earliest-expiring usable batch."""
+    before = await pharmacy_collection.find_one_and_update(
+        {"medicineName": medicine, "stockQty": {"$gt": 0}, "expiresAt": {"$gt": now}, "inTotal": {"$ne": False}},
+        [{"$set": {"stockQty": {"$subtract": ["$stockQty", {"$min": ["$stockQty", remaining]}]}}}],
+        sort=[("expiresAt", 1)],
+        projection={"batchNumber": 1, "expiryDate": 1, "expiresAt": 1, "stockQty": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return None, 0
+    return before, min(before["stockQty"], remaining)
+
+
+async def dispense(medicine, quantity, reference=None):
+    """Issue `quantity` units FEFO. Returns [{batchNumber, expiryDate, qty}]; raises InsufficientStock."""
+    await _sweep_expired()
+    reserved = await medicine_stock_collection.find_one_and_update(
+        {"_id": medicine, "totalQty": {"$gte": quantity}},
+        _adjust_total(-quantity),
+        return_document=ReturnDocument.AFTER,
+    )
+    if reserved is None:
+        current = await medicine_stock_collection.find_one({"_id": medicine}, {"totalQty": 1})
+        raise InsufficientStock(medicine, quantity, current["totalQty"] if current else 0)
+
+    now = datetime.now()
+    taken = []
+    remaining = quantity
+    while remaining > 0:
+        batch, qty = await _take_from_earliest(medicine, remaining, now)
+        if batch is None:
+            break
+        taken.append((batch, qty))
+        remaining -= qty
+
+    if remaining > 0:
+        # Only expired stock left: put everything back
+        restored = quantity - sum(qty for _, qty in taken)
+        for batch, qty in taken:
+            after = await pharmacy_collection.find_one_and_update(
+                {"_id": batch["_id"]}, {"$inc": {"stockQty": qty}}, projection={"inTotal": 1},
+            )
+            # A batch swept as expired meanwhile no longer counts toward the total
+            if after is None or after.get("inTotal") is not False:
+                restored += qty
+        await medicine_stock_collection.update_one({"_id": medicine}, _adjust_total(restored))
+        raise InsufficientStock(medicine, quantity, quantity - remaining)
+
+    await _ledger([{
+        "medicineName": medicine,
+        "batchNumber": batch["batchNumber"],
+        "qty": -qty,
+        "reason": "dispense",
+        "reference": reference,
+        "at": now,
+    } for batch, qty in taken])
+    return [
+        {"batchNumber": batch["batchNumber"], "expiryDate": batch.get("expiryDate"), "qty": qty}
+        for batch, qty in taken
+    ]
+
+
+async def expire_batches(now=None):
+    """Take batches past their expiry out of the totals. Returns how many were expired."""
+    now = now or datetime.now()
+    expired = 0
+    while True:
+        # Clearing the flag and reading the remaining stock is one atomic step,
+        # and dispense never takes from a batch whose flag is cleared
+        batch = await pharmacy_collection.find_one_and_update(
+            {"inTotal": True, "expiresAt": {"$lte": now}},
+            {"$set": {"inTotal": False}},
+            projection={"medicineName": 1, "batchNumber": 1, "stockQty": 1},
+        )
+        if batch is None:
+            return expired
+        expired += 1
+        if batch.get("stockQty", 0) > 0:
+            await medicine_stock_collection.update_one(
+                {"_id": batch["medicineName"]}, _adjust_total(-batch["stockQty"])
+            )
+            await _ledger([{
+                "medicineName": batch["medicineName"],
+                "batchNumber": batch["batchNumber"],
+                "qty": -batch["stockQty"],
+                "reason": "expired",
+                "at": now,
+            }])
+
+
+_next_sweep = 0.0
+
+
+async def _sweep_expired():
+    global _next_sweep
+    if time.monotonic() < _next_sweep:
+        return
+    _next_sweep = time.monotonic() + EXPIRY_SWEEP_INTERVAL
+    await expire_batches()
+
+
+async def set_reorder_level(medicine, level):
+    return await medicine_stock_collection.find_one_and_update(
+        {"_id": medicine},
+        [
+            {"$set": {"reorderLevel": level, "totalQty": {"$ifNull": ["$totalQty", 0]}}},
+            {"$set": {"belowReorder": {"$lt": ["$totalQty", "$reorderLevel"]}}},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def stock_out(doc):
+    return {
+        "medicineName": doc["_id"],
+        "totalQty": doc.get("totalQty", 0),
+        "batches": doc.get("batches", 0),
+        "reorderLevel": doc.get("reorderLevel", REORDER_LEVEL),
+        "belowReorder": doc.get("belowReorder", False),
+    }
+
+
+async def get_stock(medicine):
+    await _sweep_expired()
+    doc = await medicine_stock_collection.find_one({"_id": medicine})
+    return stock_out(doc) if doc else None
+
+
+async def low_stock(limit=500):
+    await _sweep_expired()
+    cursor = medicine_stock_collection.find({"belowReorder": True}).sort("totalQty", 1).limit(limit)
+    return [stock_out(doc) async for doc in cursor]
+
+
+async def expiring(until, limit=500):
+    """Batches with stock left that expire before `until` (already expired included)."""
+    cursor = pharmacy_collection.find(
+        {"expiresAt": {"$lte": until}, "stockQty": {"$gt": 0}},
+        {"_id": 0, "medicineId": 1, "medicineName": 1, "batchNumber": 1,
+         "expiryDate": 1, "expiresAt": 1, "stockQty": 1},
+    ).sort("expiresAt", 1).limit(limit)
+    return await cursor.to_list()
+
+
+async def rebuild(batch_size=1000):
+    """Parse expiresAt for batches missing it, then recompute medicine_stock."""
+    parsed = 0
+    ops = []
+    async for doc in pharmacy_collection.find({"expiresAt": {"$exists": False}}, {"expiryDate": 1}):
+        expires_at = parse_expiry(doc.get("expiryDate"))
+        if expires_at is None:
+            print(f"⚠️ {doc['_id']}: unreadable expiryDate {doc.get('expiryDate')!r}")
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"expiresAt": expires_at}}))
+        if len(ops) >= batch_size:
+            parsed += (await pharmacy_collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        parsed += (await pharmacy_collection.bulk_write(ops, ordered=False)).modified_count
+
+    # Only unexpired batches count toward the totals
+    now = datetime.now()
+    await pharmacy_collection.update_many(
+        {}, [{"$set": {"inTotal": {"$gt": [{"$ifNull": ["$expiresAt", now]}, now]}}}]
+    )
+    await pharmacy_collection.aggregate([
+        {"$group": {
+            "_id": "$medicineName",
+            "totalQty": {"$sum": {"$cond": ["$inTotal", "$stockQty", 0]}},
+            "batches": {"$sum": 1},
+        }},
+        {"$merge": {
+            "into": "medicine_stock",
+            "on": "_id",
+            "whenMatched": [
+                {"$set": {
+                    "totalQty": "$$new.totalQty",
+                    "batches": "$$new.batches",
+                    "reorderLevel": {"$ifNull": ["$reorderLevel", REORDER_LEVEL]},
+                }},
+                {"$set": {"belowReorder": {"$lt": ["$totalQty", "$reorderLevel"]}}},
+            ],
+            "whenNotMatched": "insert",
+        }},
+    ])
+    # Newly inserted totals have no reorder level yet
+    await medicine_stock_collection.update_many(
+        {"reorderLevel": {"$exists": False}},
+        [
+            {"$set": {"reorderLevel": REORDER_LEVEL}},
+            {"$set": {"belowReorder": {"$lt": ["$totalQty", "$reorderLevel"]}}},
+        ],
+    )
+    return parsed
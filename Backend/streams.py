@@ -0,0 +1,74 @@
+"""
+Helpers for reading large request bodies without buffering them whole.
+"""
+import csv
+import json
+from fastapi import HTTPException
+
+
+async def iter_lines(request):
+    """Yield non-empty lines of a streamed request body as bytes."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def parse_ndjson(lines):
+    """Yield (row_number, dict or error message) from an async iterable of NDJSON lines."""
+    row = 0
+    async for line in lines:
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, f"Invalid JSON: {e}"
+        row += 1
+
+
+async def parse_csv(lines):
+    """Yield (row_number, dict or error message) from an async iterable of CSV lines.
+
+    The first line is the header. Empty cells are left out so model defaults
+    apply. Quoted values cannot span lines.
+    """
+    header = None
+    row = 0
+    async for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8-sig")
+        values = next(csv.reader([line.rstrip("\r\n")]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield row, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield row, {k: v for k, v in zip(header, values) if v != ""}
+        row += 1
+
+
+async def iter_records(request):
+    """Yield (row_number, dict or error message) from an NDJSON or CSV stream, or a JSON array body."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        async for record in parse_ndjson(iter_lines(request)):
+            yield record
+        return
+    if "csv" in content_type:
+        async for record in parse_csv(iter_lines(request)):
+            yield record
+        return
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array, NDJSON or CSV")
+    if not isinstance(body, list):
+        body = [body]
+    for row, item in enumerate(body):
+        yield row, item
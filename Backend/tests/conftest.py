@@ -0,0 +1,61 @@
+"""
+Run from Backend/:
+    pip install -r requirements.txt -r requirements-dev.txt
+    python -m pytest -q
+
+Tests marked by the `mongo` fixture need a MongoDB server. They use
+MONGO_URI (default mongodb://localhost:27017, never the .env database
+unless MONGO_URI is exported) and are skipped when it is unreachable.
+"""
+import asyncio
+import os
+import sys
+import pytest
+
+# Before database.py runs load_dotenv, which does not override set variables
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine on one loop shared by the whole session (the Mongo client is loop-bound)."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def mongo(run):
+    import database
+    try:
+        run(database.client.admin.command("ping"))
+    except Exception as e:
+        pytest.skip(f"MongoDB not reachable: {e}")
+    return database.db
+
+
+@pytest.fixture
+def swap_collections(mongo, run, monkeypatch):
+    """swap_collections(module, "x_collection", ...): point module attributes at empty test_* collections.
+
+    Pass module=None for plain scratch collections. Returns the collections;
+    all of them are dropped again after the test.
+    """
+    swapped = []
+
+    def swap(module, *names):
+        prefix = f"test_{module.__name__}" if module else "test"
+        collections = []
+        for name in names:
+            collection = mongo[f"{prefix}_{name}"]
+            run(collection.drop())
+            if module:
+                monkeypatch.setattr(module, name, collection)
+            collections.append(collection)
+        swapped.extend(collections)
+        return collections
+
+    yield swap
+    for collection in swapped:
+        run(collection.drop())
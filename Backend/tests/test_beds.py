@@ -0,0 +1,32 @@
+import pytest
+import beds
+import early_warning
+import identities
+
+
+@pytest.fixture
+def hospital(swap_collections):
+    swap_collections(identities, "identities_collection")
+    swap_collections(early_warning, "vitals_latest_collection")
+    return swap_collections(beds, "wards_collection", "beds_collection", "admission_collection", "appointments_collection")
+
+
+def test_rebuild_skips_legacy_admissions_without_an_open_stay(run, hospital):
+    wards, _, admissions, appointments = hospital
+    run(admissions.insert_many([
+        # Legacy rows: no status field
+        {"admissionId": "ADM-1", "patientId": "P1", "ward": "A", "bedNumber": "1"},
+        {"admissionId": "ADM-2", "patientId": "P2", "ward": "A", "bedNumber": "2"},
+        {"admissionId": "ADM-3", "patientId": "P2", "ward": "A", "bedNumber": "3"},
+        {"admissionId": "ADM-4", "patientId": "P3", "ward": "A", "bedNumber": "4", "status": "Admitted"},
+        {"admissionId": "ADM-5", "patientId": "P4", "ward": "A", "bedNumber": "5", "status": "Discharged"},
+    ]))
+    run(appointments.insert_many([
+        {"patient_id": "P1", "is_ipd": False, "status": "Discharged"},
+        {"patient_id": "P2", "is_ipd": True, "status": "Admitted"},
+    ]))
+
+    assert run(beds.rebuild()) == 2
+    occupied = run(beds.beds_collection.find({"state": "occupied"}).sort("_id", 1).to_list())
+    assert [b["admissionId"] for b in occupied] == ["ADM-3", "ADM-4"]
+    assert run(wards.find_one({"_id": "A"}))["occupied"] == 2
@@ -0,0 +1,38 @@
+import pytest
+import bulk_import
+import etags
+import identities
+
+
+@pytest.fixture
+def registry(swap_collections):
+    swap_collections(etags, "versions_collection")
+    swap_collections(identities, "identities_collection")
+    users, = swap_collections(bulk_import, "users_collection")
+    return users
+
+
+def _patient(patient_id, mobile):
+    return {"patientId": patient_id, "password": "secret", "name": "Asha Rao", "age": 40, "dob": "1986-01-01",
+            "gender": "F", "mobile": mobile, "address": "x", "disease": "x", "assignedDoctor": "d1"}
+
+
+async def _records(items):
+    for row, item in enumerate(items, 1):
+        yield row, item
+
+
+def test_import_rejects_mobiles_already_registered_or_repeated(run, registry):
+    job = run(bulk_import.run_import("patients", _records([_patient("P1", "9000000001")])))
+    assert job.inserted == 1
+
+    job = run(bulk_import.run_import("patients", _records([
+        _patient("P2", "9000000001"),  # P1's mobile
+        _patient("P3", "9000000003"),
+        _patient("P4", "9000000003"),  # repeated in the file
+    ])))
+    assert job.inserted == 1
+    assert [e["row"] for e in job.errors] == [1, 3]
+    assert sorted(d["user_id"] for d in run(registry.find({}).to_list())) == ["P1", "P3"]
+    identity, _ = run(identities.resolve("9000000003"))
+    assert identity["principal_id"] == "P3"
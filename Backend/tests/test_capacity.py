@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+import capacity
+from capacity import MAX_STANDARD, MAX_EMERGENCY, reserve_token, release_token
+
+DATE = "2000-01-01"
+
+
+@pytest.fixture
+def doctor(swap_collections, request):
+    swap_collections(capacity, "capacity_collection", "appointments_collection")
+    return f"test-{request.node.name}"
+
+
+@pytest.mark.parametrize("is_emergency, clients", [(False, 100), (True, 100), (False, 10)])
+def test_concurrent_first_bookings_issue_exactly_the_quota(run, doctor, is_emergency, clients):
+    async def book():
+        return await asyncio.gather(*(reserve_token(doctor, DATE, is_emergency) for _ in range(clients)))
+
+    issued = sorted(t for t in run(book()) if t is not None)
+    expected = min(clients, MAX_EMERGENCY if is_emergency else MAX_STANDARD)
+    assert issued == list(range(1, expected + 1))
+
+
+def test_released_slot_is_reusable_without_repeating_tokens(run, doctor):
+    first = run(reserve_token(doctor, DATE))
+    run(release_token(doctor, DATE))
+    second = run(reserve_token(doctor, DATE))
+    assert second != first
+    assert run(capacity.get_filled(doctor, DATE)) == 1
+
+
+def test_first_booking_on_a_day_with_older_appointments_continues_its_tokens(run, doctor):
+    run(capacity.appointments_collection.insert_many([
+        {"doctor_id": doctor, "date": DATE, "token_number": n, "is_emergency": n == 3} for n in (1, 2, 3)
+    ]))
+    assert run(capacity.get_filled(doctor, DATE)) == 3
+    assert run(reserve_token(doctor, DATE)) == 4
+    assert run(capacity.get_filled(doctor, DATE)) == 4
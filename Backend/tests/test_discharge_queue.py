@@ -0,0 +1,27 @@
+import pytest
+from bson import ObjectId
+import discharge_queue
+
+
+@pytest.fixture
+def queue(swap_collections):
+    swap_collections(discharge_queue, "discharge_queue_collection", "counters_collection")
+
+
+def test_token_stops_below_a_write_still_in_flight(run, queue):
+    slow = run(discharge_queue._next_seq())  # taken, entry not written yet
+    run(discharge_queue.enqueue({"_id": ObjectId(), "ward_no": "A"}, "2000-01-01"))
+    entries, token = run(discharge_queue.changes(0))
+    assert entries == [] and token == slow - 1 == run(discharge_queue.current_token())
+
+    run(discharge_queue._landed(slow))
+    entries, token = run(discharge_queue.changes(0))
+    assert len(entries) == 1 and token == run(discharge_queue.current_token()) == slow + 1
+
+
+def test_abandoned_seq_stops_holding_tokens_back(run, queue, monkeypatch):
+    run(discharge_queue._next_seq())  # writer died mid-write
+    monkeypatch.setattr(discharge_queue, "DISCHARGE_INFLIGHT_TIMEOUT_MS", 0)
+    run(discharge_queue.enqueue({"_id": ObjectId(), "ward_no": "A"}, "2000-01-01"))
+    entries, token = run(discharge_queue.changes(0))
+    assert len(entries) == 1 and token == 2
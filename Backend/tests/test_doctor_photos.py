@@ -0,0 +1,20 @@
+import base64
+import pytest
+from doctor_photos import InvalidPhoto, decode_base64, make_thumbnail
+
+
+def test_decode_accepts_data_uri():
+    raw, content_type = decode_base64("data:image/png;base64," + base64.b64encode(b"png").decode())
+    assert raw == b"png" and content_type == "image/png"
+
+
+@pytest.mark.parametrize("data", ["not base64!!", "", "data:text/plain;base64,aGk="])
+def test_decode_rejects_bad_pictures(data):
+    with pytest.raises(InvalidPhoto):
+        decode_base64(data)
+
+
+def test_thumbnail_rejects_non_images():
+    pytest.importorskip("PIL")
+    with pytest.raises(InvalidPhoto):
+        make_thumbnail(b"definitely not an image")
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+import pytest
+import early_warning
+import identities
+
+
+@pytest.fixture
+def board(swap_collections, run):
+    ids, = swap_collections(identities, "identities_collection")
+    run(ids.insert_one({"_id": "9000000001", "role": "patient", "principal_id": "P1"}))
+    snapshots, = swap_collections(early_warning, "vitals_latest_collection")
+    return snapshots
+
+
+def test_record_many_keys_snapshots_by_patient_id(run, board):
+    now = datetime.utcnow().replace(microsecond=0)
+    run(early_warning.set_ward("9000000001", "A", "A-1"))
+    run(early_warning.record_many([
+        {"patient_id": "9000000001", "created_at": now - timedelta(minutes=5), "heart_rate": 140},
+        {"patient_id": "P1", "created_at": now, "spo2": 90},
+        {"patient_id": "P2", "created_at": now, "heart_rate": 80},
+    ]))
+    # Older than the snapshot: ignored
+    run(early_warning.record_many([{"patient_id": "P1", "created_at": now - timedelta(hours=1), "heart_rate": 60}]))
+
+    snapshots = {doc["_id"]: doc for doc in run(board.find({}).to_list())}
+    assert set(snapshots) == {"P1", "P2"}
+    p1 = snapshots["P1"]
+    assert (p1["ward"], p1["heart_rate"], p1["spo2"], p1["created_at"]) == ("A", 140, 90, now)
+    assert p1["news2_parts"] == {"heart_rate": 3, "spo2": 3}
+    assert [e["patientId"] for e in run(early_warning.ward_board("A"))] == ["P1"]
@@ -0,0 +1,61 @@
+import asyncio
+import glob
+import os
+from datetime import datetime, timedelta
+import pyarrow.parquet as pq
+import pytest
+import exporter
+
+
+def test_rows_always_have_the_schema_columns():
+    schema = exporter.SCHEMAS["vitals"]
+    sparse = exporter.to_row({"_id": "a", "patient_id": "p1", "heart_rate": 80}, schema)
+    odd = exporter.to_row({"_id": "b", "patient_id": "p1", "heart_rate": "fast", "note": "x"}, schema)
+    table = exporter.pa.Table.from_pylist([sparse, odd], schema=schema)
+    assert table.schema == schema
+    assert table.column("heart_rate").to_pylist() == [80.0, None]
+    assert odd["extra"] == '{"heart_rate": "fast", "note": "x"}'
+
+
+@pytest.fixture
+def vitals_export(swap_collections, monkeypatch, tmp_path):
+    swap_collections(exporter, "export_state_collection")
+    collection, = swap_collections(None, "export_vitals")
+    monkeypatch.setitem(exporter.EXPORTS, "test_vitals", (collection, "created_at"))
+    monkeypatch.setitem(exporter.SCHEMAS, "test_vitals", exporter.SCHEMAS["vitals"])
+    monkeypatch.setattr(exporter, "EXPORT_DIR", str(tmp_path))
+    return collection
+
+
+def _exported(tmp_path):
+    files = glob.glob(os.path.join(tmp_path, "test_vitals", "*", "*.parquet"))
+    tables = [pq.read_table(f) for f in files]
+    assert len({t.schema for t in tables}) == 1, "files have different columns"
+    return sorted(i for t in tables for i in t.column("_id").to_pylist())
+
+
+def test_resume_exports_back_dated_and_same_millisecond_rows(run, vitals_export, tmp_path):
+    now = datetime.utcnow().replace(microsecond=0)
+    # Same created_at millisecond across the batch boundary, mixed field sets
+    run(vitals_export.insert_many([
+        {"patient_id": "p1", "created_at": now, "heart_rate": 70 + i} if i % 2 else
+        {"patient_id": "p1", "created_at": now, "spo2": 97}
+        for i in range(5)
+    ]))
+    assert run(exporter.export_collection("test_vitals", batch_size=2)) == 5
+
+    # A monitor uploads a reading taken yesterday, after the export ran
+    run(vitals_export.insert_one({"patient_id": "p1", "created_at": now - timedelta(days=1), "heart_rate": 90}))
+    assert run(exporter.export_collection("test_vitals", batch_size=2)) == 1
+
+    expected = sorted(str(d["_id"]) for d in run(vitals_export.find({}, {"_id": 1}).to_list()))
+    assert _exported(tmp_path) == expected
+    assert run(exporter.export_collection("test_vitals", batch_size=2)) == 0
+
+
+def test_second_export_is_refused_without_waiting(run):
+    async def while_running():
+        async with exporter._running:
+            return await asyncio.wait_for(exporter.start_export(["vitals"]), timeout=1)
+
+    assert run(while_running()) is False
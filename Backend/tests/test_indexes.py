@@ -0,0 +1,13 @@
+"""The `python manage.py indexes --check` explain gate, as a test."""
+import pytest
+import indexes
+
+
+@pytest.mark.parametrize("name, filter_, sort", indexes.ROUTER_QUERIES)
+def test_router_query_collection_declares_indexes(name, filter_, sort):
+    assert name in indexes.INDEXES, f"{name} has router queries but no declared indexes"
+
+
+def test_no_router_query_scans_a_collection(mongo, run):
+    run(indexes.sync_indexes())
+    assert run(indexes.find_collscans()) == []
@@ -0,0 +1,29 @@
+import pytest
+from lab_analytes import extract, parse_metrics
+
+
+def _temperature(report):
+    return next(a for a in extract(report) if a["code"] == "temperature")
+
+
+@pytest.mark.parametrize("text", [
+    "37.5 C (after fever)",
+    "37.5 (after fever)",
+    "37.5 °C, felt feverish",
+    "37.5 C - fluctuating",
+])
+def test_celsius_followed_by_free_text_stays_celsius(text):
+    temperature = _temperature({"temperature": text})
+    assert temperature["value"] == 37.5
+    assert temperature["flag"] == "H"
+
+
+@pytest.mark.parametrize("text", ["99.5 F", "99.5°F", "99.5 ° F", "99.5 fahrenheit", "99.5"])
+def test_fahrenheit_is_converted(text):
+    assert _temperature({"temperature": text})["value"] == 37.5
+
+
+def test_metrics_temperature_units():
+    by_code = {a["code"]: a for a in parse_metrics("Temp: 36.8 C, Hb 13.2 g/dL")}
+    assert by_code["temperature"]["value"] == 36.8
+    assert by_code["hemoglobin"]["value"] == 13.2
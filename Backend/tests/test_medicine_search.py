@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+import medicine_search
+
+
+def test_refresh_picks_up_late_commits_with_older_ids(run, swap_collections, monkeypatch):
+    pharmacy, = swap_collections(medicine_search, "pharmacy_collection")
+    monkeypatch.setattr(medicine_search, "index", medicine_search.MedicineIndex())
+    now = datetime.now(timezone.utc)
+    run(pharmacy.insert_one({"_id": ObjectId.from_datetime(now), "medicineName": "Paracetamol"}))
+    assert run(medicine_search.refresh()) == 1
+
+    # Another worker made its _id earlier but committed after that refresh
+    run(pharmacy.insert_one({"_id": ObjectId.from_datetime(now - timedelta(seconds=10)), "medicineName": "Pantoprazole"}))
+    assert run(medicine_search.refresh()) == 1
+    assert run(medicine_search.refresh()) == 0
+    assert [m["medicineName"] for m in medicine_search.index.search("pan")] == ["Pantoprazole"]
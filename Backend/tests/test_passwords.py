@@ -0,0 +1,11 @@
+import passwords
+
+
+def test_unknown_user_still_runs_an_argon2_verification(run):
+    before = passwords.metrics["verifications"]
+    try:
+        assert run(passwords.verify_password(None, "guess")) == (False, False)
+    finally:
+        passwords.shutdown()
+    assert passwords.metrics["verifications"] == before + 1
+    assert passwords.is_hashed(passwords._dummy_hash)
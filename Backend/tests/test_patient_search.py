@@ -0,0 +1,24 @@
+import pytest
+import patient_search
+from patient_search import search, search_terms
+
+
+@pytest.fixture
+def patients(swap_collections):
+    collection, = swap_collections(None, "patient_search")
+    return collection
+
+
+def _patient(user_id, name, mobile):
+    return {"user_id": user_id, "name": name, "mobile": mobile, "search_terms": search_terms(name, mobile, user_id)}
+
+
+def test_exact_match_ranks_first_behind_many_prefix_matches(run, patients):
+    run(patients.insert_many([
+        _patient(f"PID-{i:06d}", f"Ramakrishnan {i}", f"90000{i:05d}")
+        for i in range(patient_search.SEARCH_CANDIDATES + 50)
+    ]))
+    run(patients.insert_one(_patient("PID-999999", "Ram Prasad", "9123456789")))
+
+    results = run(search("ram", collection=patients))
+    assert results[0]["user_id"] == "PID-999999"
@@ -0,0 +1,24 @@
+"""Route ordering: fixed paths must not be captured by /{patient_id}-style routes."""
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from routers import admin
+
+# No `with`: the lifespan (database ping, index sync) is not started
+client = TestClient(app)
+
+
+def test_list_imports_is_not_captured_by_patient_route():
+    response = client.get("/admin/imports")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+@pytest.mark.parametrize("path", ["/admin/imports", "/admin/pending-discharges", "/admin/hash-metrics"])
+def test_fixed_admin_paths_resolve_before_patient_id(path):
+    # The router's own list keeps declaration order (app.routes may nest included routers)
+    for route in admin.router.routes:
+        if route.path == path:
+            return
+        assert route.path != "/admin/{patient_id}", f"{path} is declared after /admin/{{patient_id}}"
+    pytest.fail(f"{path} is not registered")
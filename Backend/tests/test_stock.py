@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+import pytest
+import stock
+
+
+@pytest.fixture
+def pharmacy(swap_collections):
+    swap_collections(stock, "pharmacy_collection", "medicine_stock_collection", "stock_ledger_collection")
+
+
+def _batch(number, qty, expires_at):
+    return {"medicineName": "Paracetamol", "batchNumber": number, "stockQty": qty,
+            "expiresAt": expires_at, "inTotal": stock.in_total(expires_at)}
+
+
+def test_expired_stock_does_not_count_toward_reorder_level(run, pharmacy):
+    soon = datetime.now() + timedelta(seconds=1)
+    batches = [_batch("A", 50, soon), _batch("B", 5, datetime.now() - timedelta(days=1))]
+    run(stock.pharmacy_collection.insert_many(batches))
+    run(stock.record_receipts(batches))
+    assert run(stock.medicine_stock_collection.find_one({"_id": "Paracetamol"}))["totalQty"] == 50
+
+    assert run(stock.expire_batches(now=soon)) == 1
+    doc = run(stock.medicine_stock_collection.find_one({"_id": "Paracetamol"}))
+    assert doc["totalQty"] == 0 and doc["belowReorder"] is True
+    with pytest.raises(stock.InsufficientStock):
+        run(stock.dispense("Paracetamol", 1))
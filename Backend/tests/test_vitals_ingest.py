@@ -0,0 +1,15 @@
+from vitals_ingest import PatientIdCache
+
+
+def test_patient_cache_drops_expired_handles():
+    cache = PatientIdCache(ttl=30, max_size=10)
+    cache._expires = {"old": 5.0, "fresh": 100.0}
+    cache._sweep(now=50.0)
+    assert cache._expires == {"fresh": 100.0}
+
+
+def test_patient_cache_is_bounded():
+    cache = PatientIdCache(ttl=30, max_size=10)
+    cache._expires = {f"p{i}": 100.0 for i in range(11)}
+    cache._sweep(now=50.0)
+    assert cache._expires == {}
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+import pytest
+import etags
+import vitals_store
+
+
+@pytest.fixture
+def stores(swap_collections):
+    swap_collections(etags, "versions_collection")
+    return swap_collections(vitals_store, "legacy_vitals_collection", "vitals_collection", "migration_state_collection")
+
+
+def test_migrate_copies_history_older_than_live_readings(run, stores):
+    legacy, vitals, state = stores
+    now = datetime.utcnow().replace(microsecond=0)
+    # Live writes switched over before the migration ran
+    run(vitals.insert_one({"patient_id": "p1", "created_at": now, "heart_rate": 80}))
+    run(legacy.insert_many([
+        {"patient_id": "p1", "created_at": now - timedelta(days=d), "blood_pressure": "120/80"}
+        for d in range(1, 6)
+    ]))
+
+    assert run(vitals_store.migrate(batch_size=2)) == 5
+    assert run(vitals.count_documents({})) == 6
+    assert run(vitals.count_documents({"bp_systolic": 120})) == 5
+    assert run(etags.current_etag("vitals:p1")) != 'W/"vitals:p1:0"'
+
+
+def test_migrate_rerun_after_lost_mark_does_not_duplicate(run, stores):
+    legacy, vitals, state = stores
+    now = datetime.utcnow().replace(microsecond=0)
+    run(legacy.insert_many([{"patient_id": "p1", "created_at": now - timedelta(minutes=m)} for m in range(3)]))
+    assert run(vitals_store.migrate()) == 3
+
+    # Interrupted before the mark was saved
+    run(state.delete_many({}))
+    assert run(vitals_store.migrate()) == 0
+    assert run(vitals.count_documents({})) == 3
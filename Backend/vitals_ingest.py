@@ -0,0 +1,124 @@
+"""
+Bulk vitals ingestion for bedside monitors.
+
+Readings are validated against VitalsCreate and grouped into batches.
+Each batch checks its patient IDs with one $in query, with results cached
+for PATIENT_CACHE_TTL seconds so a monitor posting every few seconds
+does not re-query the same beds. It then writes with one unordered
+insert_many. Every input row gets a result entry.
+"""
+import os
+import time
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from database import users_collection, vitals_collection
+from models import VitalsCreate
+from vitals_store import to_document
+from etags import bump
+import early_warning
+
+VITALS_BULK_BATCH_SIZE = int(os.getenv("VITALS_BULK_BATCH_SIZE", "1000"))
+PATIENT_CACHE_TTL = float(os.getenv("PATIENT_CACHE_TTL", "30"))
+PATIENT_CACHE_MAX = int(os.getenv("PATIENT_CACHE_MAX", "100000"))
+
+
+class PatientIdCache:
+    """Remembers patient handles (user_id or mobile) that exist, for a short TTL.
+
+    Expired handles are swept at most once per TTL, and the whole cache is
+    dropped past max_size, so memory stays bounded on a long-running server.
+    """
+
+    def __init__(self, ttl=PATIENT_CACHE_TTL, max_size=PATIENT_CACHE_MAX):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._expires = {}
+        self._next_sweep = 0
+
+    def _sweep(self, now):
+        self._expires = {h: t for h, t in self._expires.items() if t >= now}
+        if len(self._expires) > self.max_size:
+            self._expires.clear()
+        self._next_sweep = now + self.ttl
+
+    async def known(self, ids):
+        now = time.monotonic()
+        if now >= self._next_sweep or len(self._expires) > self.max_size:
+            self._sweep(now)
+        missing = [i for i in ids if self._expires.get(i, 0) < now]
+        if missing:
+            docs = await users_collection.find(
+                {"$or": [{"user_id": {"$in": missing}}, {"mobile": {"$in": missing}}]},
+                {"_id": 0, "user_id": 1, "mobile": 1},
+            ).to_list()
+            wanted = set(missing)
+            for doc in docs:
+                for handle in (doc.get("user_id"), doc.get("mobile")):
+                    if handle in wanted:
+                        self._expires[handle] = now + self.ttl
+        return {i for i in ids if self._expires.get(i, 0) >= now}
+
+
+patient_cache = PatientIdCache()
+
+
+def _error(row, detail):
+    return {"row": row, "status": "error", "detail": detail}
+
+
+async def _flush(batch, results):
+    known = await patient_cache.known({v.patient_id for _, v in batch})
+    rows, docs = [], []
+    for row, vitals in batch:
+        if vitals.patient_id not in known:
+            results.append(_error(row, "Patient not found"))
+            continue
+        rows.append(row)
+        docs.append(to_document(vitals))
+    if not docs:
+        return 0
+
+    failed = {}
+    try:
+        await vitals_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+
+    for i, row in enumerate(rows):
+        if i in failed:
+            results.append(_error(row, failed[i]))
+        else:
+            results.append({"row": row, "status": "ok"})
+    written = [d for i, d in enumerate(docs) if i not in failed]
+    await early_warning.record_many(written)
+    await bump(*{f"vitals:{d['patient_id']}" for d in written})
+    return len(docs) - len(failed)
+
+
+async def ingest(records, batch_size=VITALS_BULK_BATCH_SIZE):
+    """records: async iterable of (row, dict or error message). Returns the summary."""
+    results = []
+    batch = []
+    inserted = 0
+    async for row, item in records:
+        if isinstance(item, str):
+            results.append(_error(row, item))
+            continue
+        try:
+            batch.append((row, VitalsCreate(**item)))
+        except (ValidationError, TypeError) as e:
+            results.append(_error(row, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            inserted += await _flush(batch, results)
+            batch = []
+    if batch:
+        inserted += await _flush(batch, results)
+
+    results.sort(key=lambda r: r["row"])
+    return {
+        "received": len(results),
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results,
+    }
@@ -0,0 +1,129 @@
+"""Vitals time-series storage (`vitals_ts`, timeField=created_at, metaField=patient_id)."""
+from datetime import datetime, timedelta
+from database import db, vitals_collection, VITALS_COLLECTION
+from etags import bump
+
+legacy_vitals_collection = db["vitals"]
+migration_state_collection = db["migration_state"]
+
+NUMERIC_FIELDS = [
+    "heart_rate", "temperature", "spo2", "respiration_rate",
+    "blood_sugar", "bp_systolic", "bp_diastolic",
+]
+
+# resolution -> $dateTrunc arguments (None = raw readings)
+RESOLUTIONS = {
+    "raw": None,
+    "5m": {"unit": "minute", "binSize": 5},
+    "1h": {"unit": "hour", "binSize": 1},
+    "1d": {"unit": "day", "binSize": 1},
+}
+
+
+def parse_bp(value):
+    """'120/80' -> (120, 80); anything unparseable -> (None, None)."""
+    try:
+        systolic, diastolic = str(value).split("/", 1)
+        return int(systolic.strip()), int(diastolic.strip())
+    except (ValueError, AttributeError):
+        return None, None
+
+
+def to_document(vitals, created_at=None):
+    """Build the time-series document for one VitalsCreate reading."""
+    systolic, diastolic = parse_bp(vitals.blood_pressure)
+    return {
+        "patient_id": vitals.patient_id,
+        "heart_rate": vitals.heart_rate,
+        "blood_pressure": vitals.blood_pressure,
+        "bp_systolic": systolic,
+        "bp_diastolic": diastolic,
+        "temperature": vitals.temperature,
+        "spo2": vitals.spo2,
+        "respiration_rate": vitals.respiration_rate,
+        "blood_sugar": vitals.blood_sugar,
+        "created_at": created_at or vitals.recorded_at or datetime.utcnow(),
+    }
+
+
+async def ensure_collection():
+    """Create the time-series collection on first start."""
+    if VITALS_COLLECTION in await db.list_collection_names(filter={"name": VITALS_COLLECTION}):
+        return
+    await db.create_collection(
+        VITALS_COLLECTION,
+        timeseries={"timeField": "created_at", "metaField": "patient_id", "granularity": "minutes"},
+    )
+
+
+def downsample_pipeline(patient_id, start, end, resolution):
+    match = {"$match": {"patient_id": patient_id, "created_at": {"$gte": start, "$lt": end}}}
+    trunc = RESOLUTIONS[resolution]
+    group = {"_id": {"$dateTrunc": {"date": "$created_at", **trunc}}, "count": {"$sum": 1}}
+    for field in NUMERIC_FIELDS:
+        group[f"{field}_min"] = {"$min": f"${field}"}
+        group[f"{field}_max"] = {"$max": f"${field}"}
+        group[f"{field}_avg"] = {"$avg": f"${field}"}
+        group[f"{field}_last"] = {"$last": f"${field}"}
+    return [
+        match,
+        {"$sort": {"created_at": 1}},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def shape_bucket(row):
+    bucket = {"start": row["_id"], "count": row["count"]}
+    for field in NUMERIC_FIELDS:
+        bucket[field] = {
+            "min": row[f"{field}_min"],
+            "max": row[f"{field}_max"],
+            "avg": row[f"{field}_avg"],
+            "last": row[f"{field}_last"],
+        }
+    return bucket
+
+
+def default_window(start=None, end=None):
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=1)
+    return start, end
+
+
+async def _copy(batch):
+    """Insert a batch, skipping readings an interrupted run already copied (they keep the legacy _id)."""
+    # vitals_ts has no _id index: scope the lookup to the batch's patients and time range
+    done = await vitals_collection.find({
+        "patient_id": {"$in": list({d["patient_id"] for d in batch})},
+        "created_at": {"$gte": min(d["created_at"] for d in batch), "$lte": max(d["created_at"] for d in batch)},
+        "_id": {"$in": [d["_id"] for d in batch]},
+    }, {"_id": 1}).to_list()
+    done = {d["_id"] for d in done}
+    fresh = [d for d in batch if d["_id"] not in done]
+    if fresh:
+        await vitals_collection.insert_many(fresh, ordered=False)
+        await bump(*{f"vitals:{d['patient_id']}" for d in fresh})
+    await migration_state_collection.update_one(
+        {"_id": VITALS_COLLECTION}, {"$set": {"mark": batch[-1]["_id"]}}, upsert=True
+    )
+    return len(fresh)
+
+
+async def migrate(batch_size=1000):
+    """Copy legacy readings after the last legacy _id copied (readings already in vitals_ts don't matter)."""
+    state = await migration_state_collection.find_one({"_id": VITALS_COLLECTION}) or {}
+    query = {"_id": {"$gt": state["mark"]}} if state.get("mark") else {}
+    copied = 0
+    batch = []
+    async for doc in legacy_vitals_collection.find(query).sort("_id", 1):
+        if not doc.get("created_at") or not doc.get("patient_id"):
+            continue
+        doc["bp_systolic"], doc["bp_diastolic"] = parse_bp(doc.get("blood_pressure"))
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += await _copy(batch)
+            batch = []
+    if batch:
+        copied += await _copy(batch)
+    return copied
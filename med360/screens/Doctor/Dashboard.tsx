@@ -105,9 +105,9 @@ const DoctorDashboard = ({ navigation, route }: any) => {
             </View>
 
             <View style={styles.profilePicWrapper}>
-              {user.profile_pic ? (
+              {user.profile_pic_url ? (
                 <Image
-                  source={{ uri: `data:image/jpeg;base64,${user.profile_pic}` }}
+                  source={{ uri: `${SERVER_URL}${user.profile_pic_url}` }}
                   style={{ width: "100%", height: "100%" }}
                   resizeMode="cover"
                 />
@@ -128,6 +128,41 @@ const ViewAppointmentsScreen = () => {
     fetchAppointments();
   }, []);
 
+  // Live queue: snapshot on connect, then one event per booking / status change
+  useEffect(() => {
+    let socket: WebSocket | null = null;
+    let closed = false;
+
+    const connect = async () => {
+      const doctorId = await AsyncStorage.getItem("PATIENT_ID");
+      if (!doctorId || closed) return;
+
+      socket = new WebSocket(
+        `${SERVER_URL.replace(/^http/, "ws")}/appointments/doctor/${doctorId}/live`
+      );
+      socket.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.type === "snapshot") {
+          setAppointments(msg.appointments);
+        } else if (msg.type === "upsert") {
+          setAppointments(prev => {
+            const rest = prev.filter(a => a.id !== msg.appointment.id);
+            // Keep emergency bookings on top
+            return msg.appointment.is_emergency
+              ? [msg.appointment, ...rest]
+              : [...rest, msg.appointment];
+          });
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      socket?.close();
+    };
+  }, []);
+
   const handleApprove = useCallback(async (id: string) => {
     try {
       setAppointments(prev =>